@@ -5,34 +5,59 @@ FastAPI server for Qwen TTS - OpenAI-compatible API
 
 import io
 import os
+import re
+import json
+import shutil
+import hashlib
+import unicodedata
+import math
 import time
+import struct
+import queue
+import random
 import asyncio
+import bisect
+import itertools
 import threading
-from typing import Optional, List, Dict, Any, AsyncGenerator
+from collections import OrderedDict
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Any, AsyncGenerator, Callable, Tuple, Union
 
 import numpy as np
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import Response, JSONResponse, StreamingResponse
+from fastapi import FastAPI, HTTPException, Header, Request
+from fastapi.responses import Response, JSONResponse, StreamingResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 import uvicorn
 
+from model_setup import (
+    PRECISIONS,
+    get_device,
+    model_dtype,
+    optimize_model,
+    plan_worker_placement,
+)
+
 # Global model instance and lock
 _model = None
 _model_lock = threading.Lock()
 _model_loaded = False
 
 
-def get_device() -> str:
-    """Determine the best available device."""
-    import torch
+# Loading mode: TTS_PRECISION is "auto" (float16, float32 on the CPU
+# fallback), "fp32", "fp16", "bf16" or "int8" (dynamic int8 quantization of
+# linear layers, CPU only). TTS_COMPILE=1 wraps the talker's forward pass
+# in torch.compile (compiled lazily, on the first generation).
+MODEL_PRECISION = os.environ.get("TTS_PRECISION", "auto").lower()
+MODEL_COMPILE = os.environ.get("TTS_COMPILE", "0") == "1"
 
-    if torch.cuda.is_available():
-        return "cuda"
-    elif hasattr(torch.backends, "mps") and torch.backends.mps.is_available():
-        return "mps"
-    else:
-        return "cpu"
+
+def model_device() -> str:
+    """Device the model runs on; int8 quantized models always run on the CPU."""
+    return "cpu" if MODEL_PRECISION == "int8" else get_device()
 
 
 def load_model() -> Any:
@@ -50,17 +75,18 @@ def load_model() -> Any:
         start = time.time()
 
         try:
-            import torch
             from qwen_tts import Qwen3TTSModel
 
-            device = get_device()
-            print(f"Using device: {device}")
+            device = model_device()
+            print(f"Using device: {device} (precision {MODEL_PRECISION})")
 
             _model = Qwen3TTSModel.from_pretrained(
                 "Qwen/Qwen3-TTS-12Hz-1.7B-CustomVoice",
                 device_map=device,
-                dtype=torch.float16,
+                dtype=model_dtype(MODEL_PRECISION),
             )
+            optimize_model(_model, MODEL_PRECISION, MODEL_COMPILE)
+            install_cancellation_hook(_model)
             _model_loaded = True
             print(f"Model loaded in {time.time() - start:.2f}s")
 
@@ -68,14 +94,15 @@ def load_model() -> Any:
             print(f"Error loading model: {e}")
             print("Trying with CPU fallback...")
 
-            import torch
             from qwen_tts import Qwen3TTSModel
 
             _model = Qwen3TTSModel.from_pretrained(
                 "Qwen/Qwen3-TTS-12Hz-1.7B-CustomVoice",
                 device_map="cpu",
-                dtype=torch.float32,
+                dtype=model_dtype(MODEL_PRECISION, fallback=True),
             )
+            optimize_model(_model, MODEL_PRECISION, MODEL_COMPILE)
+            install_cancellation_hook(_model)
             _model_loaded = True
             print(f"Model loaded (CPU) in {time.time() - start:.2f}s")
 
@@ -109,156 +136,4085 @@ LANGUAGES = [
 ]
 
 
+# ============ Inference Executor ============
+
+# Number of threads allowed to run the model concurrently, and how many
+# requests may wait for a free worker before new ones are rejected.
+INFERENCE_WORKERS = int(os.environ.get("TTS_INFERENCE_WORKERS", "1"))
+INFERENCE_QUEUE_DEPTH = int(os.environ.get("TTS_INFERENCE_QUEUE_DEPTH", "16"))
+
+
+class InferenceQueueFull(Exception):
+    """Raised when the inference executor cannot accept more work."""
+
+
+class GenerationCancelled(Exception):
+    """Raised on a worker when the job it is running has been cancelled."""
+
+
+# Cancellation check of the job running on the current worker thread
+_generation_cancel = threading.local()
+
+
+def generation_cancelled() -> bool:
+    """Whether the job running on this thread has been cancelled."""
+    check = getattr(_generation_cancel, "check", None)
+    return check is not None and check()
+
+
+def _run_cancellable(
+    check: Callable[[], bool], fn: Callable[..., Any], args: tuple, kwargs: dict
+) -> Any:
+    """Run fn with check() visible to generation_cancelled() on this thread."""
+    if check():
+        raise GenerationCancelled("Cancelled before start")
+    _generation_cancel.check = check
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _generation_cancel.check = None
+
+
+def install_cancellation_hook(model: Any) -> None:
+    """
+    Let a running generation stop when its job is cancelled.
+
+    qwen_tts does not forward stopping_criteria to the talker, so the
+    talker's generate is wrapped on this instance to add a criterion that
+    ends every sequence once generation_cancelled() turns true. The check
+    runs once per decoding step.
+    """
+    talker = getattr(getattr(model, "model", None), "talker", None)
+    if talker is None or getattr(talker, "_cancellation_hook", False):
+        return
+    try:
+        import torch
+        from transformers import StoppingCriteria, StoppingCriteriaList
+    except ImportError:
+        return
+
+    class CancelledCriteria(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            return torch.full(
+                (input_ids.shape[0],),
+                generation_cancelled(),
+                dtype=torch.bool,
+                device=input_ids.device,
+            )
+
+    generate = talker.generate
+
+    def generate_with_cancellation(*args, **kwargs):
+        criteria = StoppingCriteriaList(kwargs.pop("stopping_criteria", None) or [])
+        criteria.append(CancelledCriteria())
+        return generate(*args, stopping_criteria=criteria, **kwargs)
+
+    talker.generate = generate_with_cancellation
+    talker._cancellation_hook = True
+
+
+class InferenceExecutor:
+    """
+    Bounded worker pool that owns the model and runs blocking synthesis.
+
+    Work is submitted from the event loop and handed back as asyncio futures,
+    so the loop keeps serving metadata endpoints while the model runs.
+    """
+
+    def __init__(self, workers: int, queue_depth: int):
+        self.workers = max(1, workers)
+        self.queue_depth = max(0, queue_depth)
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="tts-inference"
+        )
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs running or waiting for a worker."""
+        return self._pending
+
+    def _release(self, _future) -> None:
+        with self._pending_lock:
+            self._pending -= 1
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking callable on the worker pool and await its result."""
+        with self._pending_lock:
+            if self._pending >= self.workers + self.queue_depth:
+                raise InferenceQueueFull(
+                    f"Inference queue is full ({self._pending} pending)"
+                )
+            self._pending += 1
+
+        cancel = threading.Event()
+        try:
+            future = self._pool.submit(_run_cancellable, cancel.is_set, fn, args, kwargs)
+        except BaseException:
+            self._release(None)
+            raise
+        # Release the slot when the worker finishes, not when the caller stops
+        # waiting, so abandoned requests still count against the bound.
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Stop the generation if it is already running
+            cancel.set()
+            raise
+
+    @property
+    def model_loaded(self) -> bool:
+        """Whether the model behind this executor is loaded."""
+        return _model_loaded
+
+    @property
+    def unavailable_reason(self) -> Optional[str]:
+        """Why jobs cannot be served right now, or None when they can."""
+        return None
+
+    async def prepare(self, warmup_pairs: List[Tuple[str, str]]) -> None:
+        """Load the model and run warmup syntheses on a worker."""
+        await self.run(_warm_up_blocking, warmup_pairs)
+
+    def shutdown(self) -> None:
+        """Stop accepting work and wait for running jobs to finish."""
+        self._pool.shutdown(wait=True)
+
+
+# ============ Multi-Process Serving ============
+
+# Number of model-owning worker processes (0 = run the model in-process).
+# Devices are assigned round-robin from TTS_WORKER_DEVICES; CPU core sets
+# come from TTS_WORKER_CORES ("0-7;8-15") or are split evenly when unset.
+MODEL_WORKERS = int(os.environ.get("TTS_MODEL_WORKERS", "0"))
+WORKER_DEVICES = os.environ.get("TTS_WORKER_DEVICES", "")
+WORKER_CORES = os.environ.get("TTS_WORKER_CORES", "")
+
+
+def _export_arrays(value: Any) -> Any:
+    """Move numpy arrays in a result into shared memory blocks."""
+    from multiprocessing import shared_memory
+
+    if isinstance(value, np.ndarray):
+        shm = shared_memory.SharedMemory(create=True, size=max(1, value.nbytes))
+        np.ndarray(value.shape, dtype=value.dtype, buffer=shm.buf)[...] = value
+        ref = ("__shm__", shm.name, value.shape, value.dtype.str)
+        shm.close()
+        return ref
+    if isinstance(value, (list, tuple)):
+        return type(value)(_export_arrays(v) for v in value)
+    return value
+
+
+def _import_arrays(value: Any) -> Any:
+    """Copy arrays out of shared memory blocks and release them."""
+    from multiprocessing import shared_memory
+
+    if isinstance(value, tuple) and len(value) == 4 and value[0] == "__shm__":
+        _, name, shape, dtype = value
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            return np.ndarray(shape, dtype=dtype, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+    if isinstance(value, (list, tuple)):
+        return type(value)(_import_arrays(v) for v in value)
+    return value
+
+
+def _model_worker_main(
+    index: int,
+    device: Optional[str],
+    cores: List[int],
+    warmup_pairs: List[Tuple[str, str]],
+    jobs: Any,
+    results: Any,
+    cancel_flag: Any,
+) -> None:
+    """
+    Entry point of a model worker process: load, warm up, serve jobs.
+
+    The parent cancels the running job by writing its id to cancel_flag.
+    """
+    if device:
+        os.environ["TTS_DEVICE"] = device
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+        try:
+            import torch
+
+            torch.set_num_threads(len(cores))
+        except ImportError:
+            pass
+
+    try:
+        _warm_up_blocking(warmup_pairs)
+    except Exception as e:
+        results.put((None, "failed", (index, str(e))))
+        return
+    results.put((None, "ready", index))
+
+    while True:
+        item = jobs.get()
+        if item is None:
+            break
+        job_id, fn, args, kwargs = item
+        results.put((job_id, "taken", index))
+        try:
+            check = lambda: cancel_flag.value == job_id  # noqa: E731
+            value = _export_arrays(_run_cancellable(check, fn, args, kwargs))
+        except Exception as e:
+            results.put((job_id, "error", f"{type(e).__name__}: {e}"))
+        else:
+            results.put((job_id, "ok", value))
+
+
+class ProcessInferenceExecutor:
+    """
+    Inference executor backed by model-owning worker processes.
+
+    Every worker holds its own model replica, pinned to a device or CPU core
+    set, and pulls jobs from one shared admission queue, so load balances
+    across replicas on its own. Waveforms come back through shared memory
+    blocks instead of being pickled through the result pipe. Same interface
+    as InferenceExecutor; processes are started lazily so importing this
+    module from a worker does not spawn more workers.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        queue_depth: int,
+        placement: List[Tuple[Optional[str], List[int]]],
+    ):
+        self.workers = max(1, workers)
+        self.queue_depth = max(0, queue_depth)
+        self.placement = placement
+        self.warmup_pairs: List[Tuple[str, str]] = []
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._futures: Dict[int, Future] = {}
+        self._assigned: Dict[int, Optional[int]] = {}
+        self._cancelled: set = set()
+        self._cancel_flags: List[Any] = []
+        self._ids = itertools.count()
+        self._processes: List[Any] = []
+        self._ready: set = set()
+        self._ready_event = threading.Event()
+        self._start_error: Optional[str] = None
+        self._stopped: set = set()
+        self._started = False
+        self._closing = False
+        self._start_lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs running or waiting for a worker."""
+        return self._pending
+
+    @property
+    def model_loaded(self) -> bool:
+        """Whether every worker has loaded its model replica."""
+        return self._start_error is None and len(self._ready) == self.workers
+
+    @property
+    def unavailable_reason(self) -> Optional[str]:
+        """
+        Why jobs cannot be served right now, or None when they can.
+
+        Workers are not restarted after one failed to load its model, so a
+        start error or the loss of every worker is permanent.
+        """
+        if self._start_error is not None:
+            return self._start_error
+        if self._started and not any(p.is_alive() for p in self._processes):
+            return "No model worker is running"
+        return None
+
+    def _spawn(self, index: int) -> Any:
+        device, cores = self.placement[index]
+        process = self._ctx.Process(
+            target=_model_worker_main,
+            args=(
+                index,
+                device,
+                cores,
+                self.warmup_pairs,
+                self._jobs,
+                self._results,
+                self._cancel_flags[index],
+            ),
+            name=f"tts-model-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def start(self) -> None:
+        """Spawn the worker processes and the result collector thread."""
+        with self._start_lock:
+            if self._started:
+                return
+            import multiprocessing
+
+            self._ctx = multiprocessing.get_context("spawn")
+            self._jobs = self._ctx.Queue()
+            self._results = self._ctx.Queue()
+            self._cancel_flags = [
+                self._ctx.Value("q", -1, lock=False) for _ in range(self.workers)
+            ]
+            self._processes = [self._spawn(i) for i in range(self.workers)]
+            self._assigned = {i: None for i in range(self.workers)}
+            self._collector = threading.Thread(
+                target=self._collect, name="tts-result-collector", daemon=True
+            )
+            self._collector.start()
+            self._started = True
+
+    def _collect(self) -> None:
+        while not self._closing:
+            try:
+                job_id, status, payload = self._results.get(timeout=1.0)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            except (EOFError, OSError):
+                break
+
+            if status == "ready":
+                self._ready.add(payload)
+                if len(self._ready) == self.workers:
+                    self._ready_event.set()
+            elif status == "failed":
+                index, error = payload
+                if self._start_error is None:
+                    self._start_error = f"Worker {index} failed to start: {error}"
+                self._ready_event.set()
+                self._fail_pending(self._start_error)
+            elif status == "taken":
+                self._assigned[payload] = job_id
+                if job_id in self._cancelled:
+                    self._cancel_flags[payload].value = job_id
+            else:
+                value = _import_arrays(payload) if status == "ok" else None
+                for index, assigned in self._assigned.items():
+                    if assigned == job_id:
+                        self._assigned[index] = None
+                self._finish(job_id, value, None if status == "ok" else RuntimeError(payload))
+
+    def _check_workers(self) -> None:
+        """Fail the job of any crashed worker and replace the worker."""
+        for index, process in enumerate(self._processes):
+            if process.is_alive() or self._closing or index in self._stopped:
+                continue
+            job_id = self._assigned.get(index)
+            self._assigned[index] = None
+            self._ready.discard(index)
+            if job_id is not None:
+                self._finish(job_id, None, RuntimeError(f"Model worker {index} crashed"))
+            if self._start_error is None:
+                print(f"Model worker {index} exited ({process.exitcode}), restarting")
+                self._processes[index] = self._spawn(index)
+            else:
+                print(f"Model worker {index} exited ({process.exitcode})")
+                self._stopped.add(index)
+
+        reason = self.unavailable_reason
+        if reason is not None and not self._closing:
+            self._fail_pending(reason)
+
+    def _fail_pending(self, reason: str) -> None:
+        """Fail every unresolved job; no worker is left to report it back."""
+        for job_id in list(self._futures):
+            self._finish(job_id, None, RuntimeError(reason))
+
+    def _finish(self, job_id: int, value: Any, error: Optional[Exception]) -> None:
+        """Resolve a job that left its worker and free its slot."""
+        future = self._futures.pop(job_id, None)
+        if future is None:
+            return
+        self._cancelled.discard(job_id)
+        with self._pending_lock:
+            self._pending -= 1
+        # The caller may cancel the future while the job runs, or from the
+        # event loop between a done() check and the set call below
+        try:
+            if error is None:
+                future.set_result(value)
+            else:
+                future.set_exception(error)
+        except InvalidStateError:
+            pass
+
+    def _cancel(self, job_id: int) -> None:
+        """Ask the worker holding job_id, or the one that takes it, to stop."""
+        self._cancelled.add(job_id)
+        for index, assigned in self._assigned.items():
+            if assigned == job_id:
+                self._cancel_flags[index].value = job_id
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a module-level callable on a worker process and await it."""
+        self.start()
+        reason = self.unavailable_reason
+        if reason is not None:
+            raise RuntimeError(reason)
+        with self._pending_lock:
+            if self._pending >= self.workers + self.queue_depth:
+                raise InferenceQueueFull(
+                    f"Inference queue is full ({self._pending} pending)"
+                )
+            self._pending += 1
+
+        job_id = next(self._ids)
+        future: Future = Future()
+        # The slot is freed when the worker reports back (see _finish), not
+        # when the caller stops waiting.
+        self._futures[job_id] = future
+        self._jobs.put((job_id, fn, args, kwargs))
+        # The last worker may have gone between the check above and the put
+        if self.unavailable_reason is not None:
+            self._fail_pending(self.unavailable_reason)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            self._cancel(job_id)
+            raise
+
+    async def prepare(self, warmup_pairs: List[Tuple[str, str]]) -> None:
+        """Start the workers; each loads and warms up its own replica."""
+        self.warmup_pairs = warmup_pairs
+        self.start()
+        await asyncio.to_thread(self._ready_event.wait)
+        if self._start_error:
+            raise RuntimeError(self._start_error)
+
+    def shutdown(self) -> None:
+        """Stop the workers after the jobs already queued."""
+        if not self._started:
+            return
+        for _ in self._processes:
+            self._jobs.put(None)
+        for process in self._processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+        self._closing = True
+        self._collector.join(timeout=5)
+        self._jobs.close()
+        self._results.close()
+
+
+def _generate_batch_blocking(
+    texts: List[str],
+    speaker: str,
+    language: str,
+    instruct: Optional[str],
+) -> Tuple[List[np.ndarray], int]:
+    """
+    Generate a batch of utterances sharing speaker, language and instruct in
+    a single model call. Runs on an inference worker.
+    """
+    model = load_model()
+
+    wavs, sr = model.generate_custom_voice(
+        text=texts,
+        language=language,
+        speaker=speaker,
+        instruct=instruct,
+    )
+    # A cancelled generation stops early; its truncated audio is discarded
+    if generation_cancelled():
+        raise GenerationCancelled("Generation cancelled")
+    return list(wavs), sr
+
+
+def create_executor(model_workers: int) -> Any:
+    """Build the in-process executor, or a process pool when model_workers > 0."""
+    if model_workers > 0:
+        return ProcessInferenceExecutor(
+            model_workers,
+            INFERENCE_QUEUE_DEPTH,
+            plan_worker_placement(model_workers, WORKER_DEVICES, WORKER_CORES),
+        )
+    return InferenceExecutor(INFERENCE_WORKERS, INFERENCE_QUEUE_DEPTH)
+
+
+_executor = create_executor(MODEL_WORKERS)
+
+
+# ============ Metrics ============
+
+# Histogram buckets for stage latencies (seconds), response sizes (bytes) and
+# real-time factor (audio seconds per wall second).
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BYTES_BUCKETS = tuple(float(1 << n) for n in range(10, 26, 2))
+RTF_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0)
+
+# Labels of the request being served; set by each synthesis endpoint and
+# inherited by the tasks and threads it starts.
+_metric_labels: ContextVar[Dict[str, str]] = ContextVar(
+    "metric_labels", default={"endpoint": "other", "speaker": "", "language": ""}
+)
+
+
+def set_metric_labels(endpoint: str, speaker: str, language: str) -> None:
+    """Label the stage metrics recorded for the current request."""
+    _metric_labels.set({"endpoint": endpoint, "speaker": speaker, "language": language})
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape_label(str(value))}"' for name, value in labels.items())
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus text format."""
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...]):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series: Dict[Tuple[Tuple[str, str], ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts, then +Inf count and sum
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            labels = dict(key)
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                le = _format_labels({**labels, "le": repr(bound)})
+                lines.append(f"{self.name}_bucket{le} {_format_value(cumulative)}")
+            cumulative += values[len(self.buckets)]
+            le = _format_labels({**labels, "le": "+Inf"})
+            lines.append(f"{self.name}_bucket{le} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(values[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {_format_value(cumulative)}")
+        return lines
+
+
+# (labels, value) pair read by a callback metric
+Sample = Tuple[Dict[str, str], float]
+
+
+class CallbackMetric:
+    """Gauge or counter whose samples are read from server state at scrape time."""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        kind: str,
+        collect: Callable[[], List[Sample]],
+    ):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            samples = self.collect()
+        except Exception:
+            samples = []
+        for labels, value in samples:
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named metrics rendered together for GET /metrics."""
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+
+    def histogram(self, name: str, help: str, buckets: Tuple[float, ...]) -> Histogram:
+        metric = Histogram(name, help, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help: str, collect: Callable[[], List[Sample]]) -> None:
+        self._metrics.append(CallbackMetric(name, help, "gauge", collect))
+
+    def counter(self, name: str, help: str, collect: Callable[[], List[Sample]]) -> None:
+        self._metrics.append(CallbackMetric(name, help, "counter", collect))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+_metrics = MetricsRegistry()
+QUEUE_WAIT_SECONDS = _metrics.histogram(
+    "tts_queue_wait_seconds", "Time a segment waited in the batch scheduler", LATENCY_BUCKETS
+)
+GENERATE_SECONDS = _metrics.histogram(
+    "tts_generate_seconds", "Model generate time of the batch a segment ran in", LATENCY_BUCKETS
+)
+DSP_SECONDS = _metrics.histogram(
+    "tts_dsp_seconds", "Speed/pitch processing (process_audio) time", LATENCY_BUCKETS
+)
+ENCODE_SECONDS = _metrics.histogram(
+    "tts_encode_seconds", "Audio encoding time", LATENCY_BUCKETS
+)
+RESPONSE_BYTES = _metrics.histogram(
+    "tts_response_bytes", "Encoded audio bytes sent per response", BYTES_BUCKETS
+)
+REALTIME_FACTOR = _metrics.histogram(
+    "tts_realtime_factor", "Audio seconds produced per wall-clock second", RTF_BUCKETS
+)
+
+
+def _resident_memory(pid: Union[int, str] = "self") -> Optional[int]:
+    """Resident set size of a process in bytes (Linux /proc only)."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _tensor_bytes(value: Any) -> int:
+    """Bytes held by a tensor or a (nested) tuple of tensors, e.g. packed int8 weights."""
+    if isinstance(value, (tuple, list)):
+        return sum(_tensor_bytes(v) for v in value)
+    if hasattr(value, "element_size"):
+        return value.numel() * value.element_size()
+    return 0
+
+
+def _model_memory() -> List[Sample]:
+    """Accelerator memory held by the in-process model, or its weight size."""
+    if not _model_loaded or _model is None:
+        return []
+    import torch
+
+    device = model_device()
+    if device == "cuda":
+        value = torch.cuda.memory_allocated()
+    elif device == "mps":
+        value = torch.mps.current_allocated_memory()
+    else:
+        # state_dict rather than parameters(): quantized layers keep their
+        # weights as packed params
+        module = getattr(_model, "model", None)
+        value = sum(_tensor_bytes(v) for v in module.state_dict().values())
+    return [({"device": device, "precision": MODEL_PRECISION}, float(value))]
+
+
+def _process_memory() -> List[Sample]:
+    samples = []
+    rss = _resident_memory()
+    if rss is not None:
+        samples.append(({"process": "main"}, float(rss)))
+    for index, process in enumerate(getattr(_executor, "_processes", [])):
+        rss = _resident_memory(process.pid) if process.is_alive() else None
+        if rss is not None:
+            samples.append(({"process": f"worker-{index}"}, float(rss)))
+    return samples
+
+
+_metrics.gauge(
+    "tts_model_memory_bytes", "Memory held by the in-process model", _model_memory
+)
+_metrics.gauge(
+    "tts_process_resident_memory_bytes", "Resident memory per server process", _process_memory
+)
+_metrics.gauge(
+    "tts_admission_queued",
+    "Requests admitted and not finished, per priority class",
+    lambda: [({"class": k}, v["queued"]) for k, v in _admission.stats()["classes"].items()],
+)
+_metrics.gauge(
+    "tts_estimated_wait_seconds",
+    "Estimated queue wait for a new request, per priority class",
+    lambda: [({"class": k}, v["estimated_wait"]) for k, v in _admission.stats()["classes"].items()],
+)
+_metrics.gauge(
+    "tts_scheduler_pending",
+    "Segments waiting in the batch scheduler",
+    lambda: [({}, _scheduler.pending)],
+)
+_metrics.gauge(
+    "tts_scheduler_waiting",
+    "Segments of admitted requests waiting for room in the scheduler queue",
+    lambda: [({}, _scheduler.waiting)],
+)
+_metrics.gauge(
+    "tts_executor_pending",
+    "Batches running or waiting on the executor",
+    lambda: [({}, _executor.pending)],
+)
+_metrics.counter(
+    "tts_requests_shed_total",
+    "Requests refused by admission control",
+    lambda: [
+        ({"class": k, "status": str(status)}, v[f"rejected_{status}"])
+        for k, v in _admission.stats()["classes"].items()
+        for status in (429, 503)
+    ],
+)
+_metrics.counter(
+    "tts_cache_hits_total",
+    "Audio and segment cache hits",
+    lambda: [
+        ({"cache": "audio"}, _audio_cache.stats()["hits"]),
+        ({"cache": "segment"}, _segment_cache.stats()["hits"]),
+    ],
+)
+_metrics.counter(
+    "tts_cache_misses_total",
+    "Audio and segment cache misses",
+    lambda: [
+        ({"cache": "audio"}, _audio_cache.stats()["misses"]),
+        ({"cache": "segment"}, _segment_cache.stats()["misses"]),
+    ],
+)
+
+
+# ============ Tracing ============
+
+# Sampled request traces are appended to TTS_TRACE_FILE as JSON lines
+# (disabled unless set); TTS_TRACE_SAMPLE_RATE is the fraction kept.
+TRACE_FILE = os.environ.get("TTS_TRACE_FILE") or None
+TRACE_SAMPLE_RATE = float(os.environ.get("TTS_TRACE_SAMPLE_RATE", "0.1"))
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """
+    Stage spans of one request.
+
+    Spans are (name, start, end) in perf_counter time. A child trace (one
+    batch item) also forwards its spans to its parent. Stage times merge
+    overlapping spans, so segments generated in parallel count once.
+    """
+
+    def __init__(self, labels: Dict[str, str], parent: Optional["Trace"] = None):
+        self.id = os.urandom(8).hex()
+        self.labels = labels
+        self.parent = parent
+        self.started = time.perf_counter()
+        self.wall_started = time.time()
+        self.spans: List[Tuple[str, float, float]] = []
+
+    def add(self, name: str, start: float, end: float) -> None:
+        self.spans.append((name, start, end))
+        if self.parent is not None:
+            self.parent.add(name, start, end)
+
+    def stage_times(self) -> Dict[str, float]:
+        """Wall-clock seconds covered by each stage, in order of first use."""
+        intervals: Dict[str, List[Tuple[float, float]]] = {}
+        for name, start, end in sorted(self.spans, key=lambda span: span[1]):
+            intervals.setdefault(name, []).append((start, end))
+
+        times = {}
+        for name, spans in intervals.items():
+            total = 0.0
+            span_start, span_end = spans[0]
+            for start, end in spans[1:]:
+                if start > span_end:
+                    total += span_end - span_start
+                    span_start, span_end = start, end
+                else:
+                    span_end = max(span_end, end)
+            times[name] = total + span_end - span_start
+        times["total"] = time.perf_counter() - self.started
+        return times
+
+    def timings_ms(self) -> Dict[str, float]:
+        return {name: round(seconds * 1000, 2) for name, seconds in self.stage_times().items()}
+
+    def server_timing(self) -> str:
+        """Value of a Server-Timing header."""
+        return ", ".join(f"{name};dur={ms}" for name, ms in self.timings_ms().items())
+
+    def headers(self) -> Dict[str, str]:
+        return {"Server-Timing": self.server_timing(), "X-Trace-Id": self.id}
+
+    def to_record(self, status: int) -> Dict[str, Any]:
+        return {
+            "trace_id": self.id,
+            "time": self.wall_started,
+            **self.labels,
+            "status": status,
+            "stages_ms": self.timings_ms(),
+            "spans": [
+                {
+                    "name": name,
+                    "start_ms": round((start - self.started) * 1000, 2),
+                    "duration_ms": round((end - start) * 1000, 2),
+                }
+                for name, start, end in self.spans
+            ],
+        }
+
+
+def start_trace(parent: Optional[Trace] = None) -> Trace:
+    """Begin tracing the current request (labelled by set_metric_labels)."""
+    trace = Trace(_metric_labels.get(), parent)
+    _current_trace.set(trace)
+    return trace
+
+
+def trace_span(name: str, start: float, end: Optional[float] = None) -> None:
+    """Record a stage span on the current request's trace, if any."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, start, time.perf_counter() if end is None else end)
+
+
+class TraceWriter:
+    """Appends sampled trace records to a JSONL file from a background thread."""
+
+    def __init__(self, path: str, sample_rate: float):
+        self.path = path
+        self.sample_rate = sample_rate
+        self._queue: "queue.SimpleQueue[Dict[str, Any]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, record: Dict[str, Any]) -> None:
+        if random.random() >= self.sample_rate:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="tts-trace-writer", daemon=True
+                )
+                self._thread.start()
+        self._queue.put(record)
+
+    def _run(self) -> None:
+        while True:
+            records = [self._queue.get()]
+            while not self._queue.empty():
+                records.append(self._queue.get())
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    for record in records:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            except OSError as e:
+                print(f"Trace write failed: {e}")
+
+
+_trace_writer = TraceWriter(TRACE_FILE, TRACE_SAMPLE_RATE) if TRACE_FILE else None
+
+
+def finish_trace(trace: Trace, status: int) -> None:
+    """End a request's trace, dumping it if sampled."""
+    if _trace_writer is not None and trace.parent is None:
+        _trace_writer.submit(trace.to_record(status))
+
+
+# ============ Batch Scheduler ============
+
+# How long to wait for more jobs before dispatching a partial batch, the
+# largest batch passed to the model, and how many jobs may be queued before
+# further submissions wait for room.
+BATCH_WINDOW_MS = float(os.environ.get("TTS_BATCH_WINDOW_MS", "10"))
+BATCH_MAX_SIZE = int(os.environ.get("TTS_BATCH_MAX_SIZE", "8"))
+SCHEDULER_MAX_PENDING = int(os.environ.get("TTS_SCHEDULER_MAX_PENDING", "64"))
+
+# Request classes, most urgent first. A waiting job is promoted by one class
+# every TTS_PRIORITY_AGING_S seconds so lower classes are never starved.
+PRIORITY_CLASSES = {"stream": 0, "single": 1, "batch": 2, "job": 3}
+PRIORITY_AGING_S = float(os.environ.get("TTS_PRIORITY_AGING_S", "5"))
+
+# Initial model cost estimate in seconds per input character, refined from
+# measured batches as the server runs.
+SECONDS_PER_CHAR = float(os.environ.get("TTS_SECONDS_PER_CHAR", "0.05"))
+
+# A batch only mixes jobs whose estimated token counts are within a factor of
+# TTS_BATCH_LENGTH_RATIO of each other (0 disables), so short utterances
+# neither wait for nor get padded up to a long one.
+BATCH_LENGTH_RATIO = float(os.environ.get("TTS_BATCH_LENGTH_RATIO", "2.5"))
+
+# Typical speaking rate in characters per second; with the codec frame rate
+# this estimates how many tokens an utterance generates.
+CODEC_FRAME_RATE = 12.0
+CHARS_PER_SECOND = {
+    "English": 14.0,
+    "Chinese": 4.5,
+    "Japanese": 7.0,
+    "Korean": 6.0,
+    "German": 13.0,
+    "French": 14.0,
+    "Russian": 13.0,
+    "Portuguese": 14.0,
+    "Spanish": 14.0,
+    "Italian": 14.0,
+}
+
+
+def estimate_tokens(text: str, language: str) -> float:
+    """Estimated codec tokens generated for text: speaking time × frame rate."""
+    seconds = len(text) / CHARS_PER_SECOND.get(language, 12.0)
+    return max(1.0, seconds * CODEC_FRAME_RATE)
+
+
+@dataclass
+class SynthesisJob:
+    """A single utterance waiting to be fused into a model batch."""
+
+    text: str
+    speaker: str
+    language: str
+    instruct: Optional[str]
+    future: "asyncio.Future[Tuple[np.ndarray, int]]"
+    priority: int = PRIORITY_CLASSES["single"]
+    enqueued: float = field(default_factory=time.perf_counter)
+    labels: Dict[str, str] = field(default_factory=lambda: _metric_labels.get())
+    trace: Optional[Trace] = field(default_factory=lambda: _current_trace.get())
+
+    @property
+    def group_key(self) -> Tuple[str, str, str]:
+        """Jobs with the same key can share one generate_custom_voice call."""
+        return (self.speaker, self.language, self.instruct or "")
+
+    @property
+    def tokens(self) -> float:
+        return estimate_tokens(self.text, self.language)
+
+    def rank(self, now: float, aging: float) -> Tuple[float, float]:
+        """Sort key: priority class improved by time waited, then age."""
+        waited = (now - self.enqueued) / aging if aging > 0 else 0.0
+        return (self.priority - waited, self.enqueued)
+
+
+def similar_length_jobs(
+    anchor: SynthesisJob, jobs: List[SynthesisJob], limit: int, ratio: float
+) -> List[SynthesisJob]:
+    """
+    Up to limit jobs, anchor first, whose token estimates all lie within
+    ratio of each other, taking those closest in length to the anchor first.
+    """
+    nearest = sorted(jobs, key=lambda job: abs(math.log(job.tokens / anchor.tokens)))
+    batch: List[SynthesisJob] = []
+    low = high = anchor.tokens
+    for job in nearest:
+        new_low, new_high = min(low, job.tokens), max(high, job.tokens)
+        if new_high > new_low * ratio:
+            continue
+        batch.append(job)
+        low, high = new_low, new_high
+        if len(batch) == limit:
+            break
+    return batch
+
+
+class BatchScheduler:
+    """
+    Server-wide micro-batching scheduler.
+
+    Jobs from every endpoint are collected for up to `window` seconds (or
+    until `max_batch` are pending), grouped by speaker/language/instruct and
+    run as a single batched generation on the inference executor. At most one
+    batch per executor worker is in flight; everything else keeps waiting
+    here, so batches grow with load. The most urgent job (by priority class
+    and time waited) picks the next group and, within it, the jobs of similar
+    estimated length that share its batch. Measured batch times keep a
+    running seconds-per-character estimate for admission control.
+
+    At most max_pending jobs wait here; further submissions wait for room
+    instead of failing, so a request with many segments, or many such
+    requests together, slows down rather than losing the segments it has
+    already generated. Shedding load is left to admission control.
+    """
+
+    def __init__(
+        self,
+        executor: InferenceExecutor,
+        window: float,
+        max_batch: int,
+        max_pending: int,
+        length_ratio: float = BATCH_LENGTH_RATIO,
+    ):
+        self.executor = executor
+        self.window = max(0.0, window)
+        self.max_batch = max(1, max_batch)
+        self.max_pending = max(1, max_pending)
+        self.length_ratio = length_ratio
+        self._pending: List[SynthesisJob] = []
+        self._waiting = 0
+        self._running = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self.seconds_per_char = SECONDS_PER_CHAR
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs waiting to be dispatched."""
+        return len(self._pending)
+
+    @property
+    def waiting(self) -> int:
+        """Number of submissions waiting for room in a full queue."""
+        return self._waiting
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._task is not None and not self._task.done():
+            return
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        self._room = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.executor.workers)
+        self._task = loop.create_task(self._run())
+
+    async def submit(
+        self,
+        text: str,
+        speaker: str,
+        language: str,
+        instruct: Optional[str],
+        priority: str = "single",
+    ) -> Tuple[np.ndarray, int]:
+        """Queue one utterance, once there is room, and wait for its share of a batch."""
+        self._ensure_started()
+        self._waiting += 1
+        try:
+            while len(self._pending) >= self.max_pending:
+                self._room.clear()
+                await self._room.wait()
+        finally:
+            self._waiting -= 1
+
+        job = SynthesisJob(
+            text,
+            speaker,
+            language,
+            instruct,
+            self._loop.create_future(),
+            PRIORITY_CLASSES[priority],
+        )
+        self._pending.append(job)
+        self._wakeup.set()
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+
+        try:
+            return await job.future
+        finally:
+            # Drop jobs whose caller went away before they were dispatched
+            if job.future.cancelled() and job in self._pending:
+                self._pending.remove(job)
+                self._room.set()
+
+    def _take_batch(self, idle: int = 1) -> List[SynthesisJob]:
+        """
+        Take the most urgent job plus up to max_batch - 1 compatible ones of similar length.
+
+        With idle workers, a group is shared evenly between them instead of
+        filling one batch and leaving the others without work.
+        """
+        now = time.perf_counter()
+        ordered = sorted(self._pending, key=lambda job: job.rank(now, PRIORITY_AGING_S))
+        anchor = ordered[0]
+        batch = [job for job in ordered if job.group_key == anchor.group_key]
+        limit = min(self.max_batch, math.ceil(len(batch) / max(1, idle)))
+        if self.length_ratio > 0:
+            batch = similar_length_jobs(anchor, batch, limit, self.length_ratio)
+        batch = batch[:limit]
+        taken = set(map(id, batch))
+        rest = [job for job in self._pending if id(job) not in taken]
+        self._pending = rest
+        self._room.set()
+        if len(rest) < self.max_batch:
+            self._full.clear()
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            await self._slots.acquire()
+            while not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            if len(self._pending) < self.max_batch and self.window > 0:
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.window)
+                except asyncio.TimeoutError:
+                    pass
+
+            idle = self.executor.workers - self._running
+            batch = [job for job in self._take_batch(idle) if not job.future.done()]
+            if not batch:
+                self._slots.release()
+                continue
+            self._running += 1
+            self._loop.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch: List[SynthesisJob]) -> None:
+        first = batch[0]
+        now = time.perf_counter()
+        for job in batch:
+            QUEUE_WAIT_SECONDS.observe(now - job.enqueued, **job.labels)
+            if job.trace is not None:
+                job.trace.add("queue", job.enqueued, now)
+
+        run = self._loop.create_task(
+            self.executor.run(
+                _generate_batch_blocking,
+                [job.text for job in batch],
+                first.speaker,
+                first.language,
+                first.instruct,
+            )
+        )
+
+        # Stop the generation once every caller in the batch has gone away
+        def on_job_done(_future) -> None:
+            if all(job.future.cancelled() for job in batch):
+                run.cancel()
+
+        for job in batch:
+            job.future.add_done_callback(on_job_done)
+
+        start = time.perf_counter()
+        try:
+            await asyncio.wait([run])
+            if run.cancelled():
+                return
+            wavs, sr = run.result()
+            end = time.perf_counter()
+            elapsed = end - start
+            self._observe(sum(len(job.text) for job in batch), elapsed)
+            for job in batch:
+                GENERATE_SECONDS.observe(elapsed, **job.labels)
+                if job.trace is not None:
+                    job.trace.add("generate", start, end)
+        except Exception as e:
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_exception(e)
+        else:
+            for job, wav in zip(batch, wavs):
+                if not job.future.done():
+                    job.future.set_result((wav, sr))
+        finally:
+            self._running -= 1
+            self._slots.release()
+
+
+    def _observe(self, chars: int, elapsed: float) -> None:
+        """Fold a measured batch into the seconds-per-character estimate."""
+        if chars > 0:
+            self.seconds_per_char += 0.2 * (elapsed / chars - self.seconds_per_char)
+
+
+_scheduler = BatchScheduler(
+    _executor, BATCH_WINDOW_MS / 1000.0, BATCH_MAX_SIZE, SCHEDULER_MAX_PENDING
+)
+
+
+# ============ Admission Control ============
+
+# Requests admitted but not finished, across all classes, before new ones get
+# 503; and per-class latency SLOs in seconds of estimated queue wait beyond
+# which new requests get 429. Jobs are asynchronous and never shed on wait.
+ADMISSION_MAX_QUEUED = int(os.environ.get("TTS_ADMISSION_MAX_QUEUED", "64"))
+ADMISSION_SLO_S: Dict[str, Optional[float]] = {
+    "stream": float(os.environ.get("TTS_SLO_STREAM_S", "10")),
+    "single": float(os.environ.get("TTS_SLO_SINGLE_S", "30")),
+    "batch": float(os.environ.get("TTS_SLO_BATCH_S", "120")),
+    "job": None,
+}
+
+
+class AdmissionRejected(InferenceQueueFull):
+    """Raised when a request is shed; carries the status and Retry-After."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """An admitted request's share of the queue, returned with release()."""
+
+    def __init__(self, controller: "AdmissionController", klass: str, chars: int):
+        self.controller = controller
+        self.klass = klass
+        self.chars = chars
+        self._released = False
+
+    @property
+    def released(self) -> bool:
+        return self._released
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self.controller._release(self)
+
+
+class AdmissionController:
+    """
+    Decides whether a synthesis request may enter the queue.
+
+    Admitted requests are counted per class with their text length. The
+    estimated queue wait for a new request is the text of everything
+    admitted at its priority or above, times the scheduler's measured
+    seconds per character, spread over the executor workers. Requests are
+    refused with 503 when the queue is full and with 429 when the estimated
+    wait exceeds their class SLO; both carry a Retry-After hint.
+
+    This is the only place load is shed. Once admitted, a request's
+    segments never fail on a full scheduler queue: they wait for room
+    (see BatchScheduler.submit), so no generated segment is thrown away.
+    """
+
+    def __init__(
+        self,
+        scheduler: BatchScheduler,
+        max_queued: int,
+        slo: Dict[str, Optional[float]],
+    ):
+        self.scheduler = scheduler
+        self.max_queued = max(1, max_queued)
+        self.slo = slo
+        self._queued = {klass: 0 for klass in PRIORITY_CLASSES}
+        self._chars = {klass: 0 for klass in PRIORITY_CLASSES}
+        self._admitted = {klass: 0 for klass in PRIORITY_CLASSES}
+        self._rejected = {klass: {429: 0, 503: 0} for klass in PRIORITY_CLASSES}
+
+    @property
+    def queued(self) -> int:
+        """Requests admitted and not yet finished."""
+        return sum(self._queued.values())
+
+    def estimate_wait(self, klass: str) -> float:
+        """Seconds of work queued ahead of a new request of this class."""
+        rank = PRIORITY_CLASSES[klass]
+        chars = sum(n for other, n in self._chars.items() if PRIORITY_CLASSES[other] <= rank)
+        return chars * self.scheduler.seconds_per_char / self.scheduler.executor.workers
+
+    def admit(self, klass: str, chars: int) -> AdmissionTicket:
+        """Admit a request of `chars` characters or raise AdmissionRejected."""
+        wait = self.estimate_wait(klass)
+        if self.queued >= self.max_queued:
+            self._rejected[klass][503] += 1
+            raise AdmissionRejected(
+                503,
+                f"Server is at capacity ({self.queued} requests queued)",
+                # Roughly when the next admitted request finishes
+                max(1, math.ceil(wait / self.queued)),
+            )
+        slo = self.slo.get(klass)
+        if slo is not None and wait > slo:
+            self._rejected[klass][429] += 1
+            raise AdmissionRejected(
+                429,
+                f"Estimated wait {wait:.1f}s exceeds the {slo:g}s limit for {klass} requests",
+                max(1, math.ceil(wait - slo)),
+            )
+
+        self._queued[klass] += 1
+        self._chars[klass] += chars
+        self._admitted[klass] += 1
+        return AdmissionTicket(self, klass, chars)
+
+    def _release(self, ticket: AdmissionTicket) -> None:
+        self._queued[ticket.klass] -= 1
+        self._chars[ticket.klass] -= ticket.chars
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "scheduler_pending": self.scheduler.pending,
+            "scheduler_waiting": self.scheduler.waiting,
+            "executor_pending": self.scheduler.executor.pending,
+            "seconds_per_char": self.scheduler.seconds_per_char,
+            "classes": {
+                klass: {
+                    "queued": self._queued[klass],
+                    "queued_chars": self._chars[klass],
+                    "estimated_wait": self.estimate_wait(klass),
+                    "slo": self.slo.get(klass),
+                    "admitted": self._admitted[klass],
+                    "rejected_429": self._rejected[klass][429],
+                    "rejected_503": self._rejected[klass][503],
+                }
+                for klass in PRIORITY_CLASSES
+            },
+        }
+
+
+_admission = AdmissionController(_scheduler, ADMISSION_MAX_QUEUED, ADMISSION_SLO_S)
+
+
+def overload_error(e: InferenceQueueFull) -> HTTPException:
+    """HTTP error for a shed or queue-full request, with a Retry-After hint."""
+    if isinstance(e, AdmissionRejected):
+        return HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+
+# ============ Audio Cache ============
+
+# In-memory LRU size, and an optional on-disk tier that receives entries
+# evicted from memory (disabled unless TTS_CACHE_DIR is set).
+AUDIO_CACHE_MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_BYTES", str(256 << 20)))
+AUDIO_CACHE_DIR = os.environ.get("TTS_CACHE_DIR") or None
+AUDIO_CACHE_DISK_MAX_BYTES = int(
+    os.environ.get("TTS_CACHE_DISK_MAX_BYTES", str(2 << 30))
+)
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text for cache keys: NFC form, collapsed whitespace."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def audio_cache_key(
+    text: str,
+    speaker: str,
+    language: str,
+    instruct: Optional[str],
+    speed: float,
+    pitch: float,
+    response_format: str,
+) -> str:
+    """Content address of a synthesized response."""
+    payload = json.dumps(
+        [
+            normalize_text(text),
+            speaker,
+            language,
+            normalize_text(instruct or ""),
+            round(float(speed), 4),
+            round(float(pitch), 4),
+            response_format.lower(),
+        ],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """
+    Content-addressed cache of encoded audio.
+
+    Entries live in an LRU bounded by total bytes. When a disk directory is
+    configured, entries evicted from memory spill to disk (itself bounded by
+    bytes, oldest first) and are promoted back to memory on a hit. Async code
+    uses fetch/store, which move the disk tier's file I/O off the event loop.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = 0,
+    ):
+        self.max_bytes = max(0, max_bytes)
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = max(0, disk_max_bytes)
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._disk_entries: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            # Rebuild the disk index oldest-first so eviction order survives restarts
+            files = []
+            for name in os.listdir(self.disk_dir):
+                path = os.path.join(self.disk_dir, name)
+                if name.endswith(".bin") and os.path.isfile(path):
+                    stat = os.stat(path)
+                    files.append((stat.st_mtime, name[:-4], stat.st_size))
+            for _, key, size in sorted(files):
+                self._disk_entries[key] = size
+                self._disk_bytes += size
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.bin")
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return cached audio for key, or None."""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+
+            if self.disk_dir and key in self._disk_entries:
+                try:
+                    with open(self._disk_path(key), "rb") as f:
+                        data = f.read()
+                except OSError:
+                    self._disk_bytes -= self._disk_entries.pop(key)
+                else:
+                    self.disk_hits += 1
+                    self._disk_bytes -= self._disk_entries.pop(key)
+                    os.remove(self._disk_path(key))
+                    self._insert(key, data)
+                    return data
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store audio under key, evicting least recently used entries."""
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            self._insert(key, data)
+
+    async def fetch(self, key: str) -> Optional[bytes]:
+        """get() for the event loop; runs on a thread when it may touch disk."""
+        if not self.disk_dir:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def store(self, key: str, data: bytes) -> None:
+        """put() for the event loop; runs on a thread when it may spill to disk."""
+        if not self.disk_dir:
+            self.put(key, data)
+        else:
+            await asyncio.to_thread(self.put, key, data)
+
+    def _insert(self, key: str, data: bytes) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._entries[key] = data
+        self._bytes += len(data)
+
+        while self._bytes > self.max_bytes and self._entries:
+            old_key, old_data = self._entries.popitem(last=False)
+            self._bytes -= len(old_data)
+            self.evictions += 1
+            self._spill(old_key, old_data)
+
+    def _spill(self, key: str, data: bytes) -> None:
+        if not self.disk_dir or len(data) > self.disk_max_bytes:
+            return
+        if key in self._disk_entries:
+            self._disk_entries.move_to_end(key)
+            return
+
+        while self._disk_entries and self._disk_bytes + len(data) > self.disk_max_bytes:
+            old_key, size = self._disk_entries.popitem(last=False)
+            self._disk_bytes -= size
+            try:
+                os.remove(self._disk_path(old_key))
+            except OSError:
+                pass
+
+        try:
+            tmp_path = self._disk_path(key) + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._disk_path(key))
+        except OSError as e:
+            print(f"Audio cache spill failed: {e}")
+            return
+        self._disk_entries[key] = len(data)
+        self._disk_bytes += len(data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current sizes."""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "disk_entries": len(self._disk_entries),
+            "disk_bytes": self._disk_bytes,
+            "disk_max_bytes": self.disk_max_bytes if self.disk_dir else 0,
+        }
+
+
+_audio_cache = AudioCache(
+    AUDIO_CACHE_MAX_BYTES, AUDIO_CACHE_DIR, AUDIO_CACHE_DISK_MAX_BYTES
+)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header value against a strong ETag.
+
+    "*" is not honoured: on these POST endpoints it would answer 304 for
+    audio that was never synthesized or sent.
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        if candidate.strip().removeprefix("W/") == etag:
+            return True
+    return False
+
+
+# ============ Synthesis Pipeline ============
+
+# Per-segment waveform cache (raw model output, before speed/pitch), and the
+# crossfade applied where segments are joined.
+SEGMENT_CACHE_MAX_BYTES = int(
+    os.environ.get("TTS_SEGMENT_CACHE_MAX_BYTES", str(128 << 20))
+)
+SEGMENT_CACHE_DIR = os.environ.get("TTS_SEGMENT_CACHE_DIR") or None
+CROSSFADE_MS = float(os.environ.get("TTS_CROSSFADE_MS", "10"))
+
+# Segments are generated independently, so their levels drift; each one is
+# scaled toward the request's median speech level by at most this much
+# (0 disables).
+LOUDNESS_MAX_GAIN_DB = float(os.environ.get("TTS_LOUDNESS_MAX_GAIN_DB", "6"))
+
+# Segments of one request in flight at once. 0 means as many as the workers
+# can run together (a full batch per worker). The rest wait their turn here,
+# so one long request does not fill the shared scheduler queue ahead of
+# everyone else; the queue itself bounds all requests together.
+SEGMENT_PARALLELISM = int(os.environ.get("TTS_SEGMENT_PARALLELISM", "0"))
+
+_segment_cache = AudioCache(
+    SEGMENT_CACHE_MAX_BYTES, SEGMENT_CACHE_DIR, AUDIO_CACHE_DISK_MAX_BYTES
+)
+
+
+def _pack_segment(wav: np.ndarray, sr: int) -> bytes:
+    return struct.pack("<I", sr) + np.asarray(wav, dtype="<f4").tobytes()
+
+
+def _unpack_segment(data: bytes) -> Tuple[np.ndarray, int]:
+    (sr,) = struct.unpack_from("<I", data)
+    return np.frombuffer(data, dtype="<f4", offset=4), sr
+
+
+def concat_with_crossfade(wavs: List[np.ndarray], sr: int, crossfade_ms: float) -> np.ndarray:
+    """Join segments in order, linearly crossfading across each boundary."""
+    if len(wavs) == 1:
+        return wavs[0]
+
+    fade = int(sr * crossfade_ms / 1000.0)
+    overlaps = [
+        min(fade, len(a), len(b)) for a, b in zip(wavs[:-1], wavs[1:])
+    ]
+    out = np.empty(sum(len(w) for w in wavs) - sum(overlaps), dtype=np.float32)
+
+    pos = 0
+    for i, wav in enumerate(wavs):
+        head = overlaps[i - 1] if i > 0 else 0
+        if head:
+            ramp = np.linspace(0.0, 1.0, head, endpoint=False, dtype=np.float32)
+            out[pos - head : pos] *= 1.0 - ramp
+            out[pos - head : pos] += wav[:head] * ramp
+        out[pos : pos + len(wav) - head] = wav[head:]
+        pos += len(wav) - head
+
+    return out
+
+
+def speech_level(wav: np.ndarray, sr: int) -> Optional[float]:
+    """
+    RMS of the voiced part of wav, or None if it is silent.
+
+    Voiced means 20 ms frames within 30 dB of the loudest one, so pauses
+    and trailing silence do not pull the level of a segment down.
+    """
+    frame = max(1, int(sr * 0.02))
+    frames = len(wav) // frame
+    if frames == 0:
+        return None
+    energy = np.mean(
+        np.square(wav[: frames * frame].reshape(frames, frame), dtype=np.float64), axis=1
+    )
+    peak = energy.max()
+    if peak <= 1e-10:
+        return None
+    return float(np.sqrt(energy[energy >= peak * 1e-3].mean()))
+
+
+def level_gain(wav: np.ndarray, level: Optional[float], target: Optional[float]) -> np.ndarray:
+    """Scale wav from level toward target, within LOUDNESS_MAX_GAIN_DB and without clipping."""
+    if level is None or target is None or LOUDNESS_MAX_GAIN_DB <= 0:
+        return wav
+    limit = 10 ** (LOUDNESS_MAX_GAIN_DB / 20)
+    gain = min(max(target / level, 1 / limit), limit)
+    if gain > 1:
+        peak = float(np.abs(wav).max())
+        gain = min(gain, 0.99 / peak) if peak > 0 else 1.0
+    if abs(gain - 1) < 1e-3:
+        return wav
+    return (wav * np.float32(gain)).astype(np.float32, copy=False)
+
+
+def match_loudness(wavs: List[np.ndarray], sr: int) -> List[np.ndarray]:
+    """Scale segments toward their median speech level."""
+    if len(wavs) < 2 or LOUDNESS_MAX_GAIN_DB <= 0:
+        return wavs
+    levels = [speech_level(wav, sr) for wav in wavs]
+    measured = [level for level in levels if level is not None]
+    if not measured:
+        return wavs
+    target = float(np.median(measured))
+    return [level_gain(wav, level, target) for wav, level in zip(wavs, levels)]
+
+
+def segment_parallelism() -> int:
+    """Segments of one request to keep in flight."""
+    if SEGMENT_PARALLELISM > 0:
+        return SEGMENT_PARALLELISM
+    return _scheduler.max_batch * _scheduler.executor.workers
+
+
+async def synthesize_segment(
+    text: str,
+    speaker: str,
+    language: str,
+    instruct: Optional[str] = None,
+    priority: str = "single",
+) -> Tuple[np.ndarray, int]:
+    """Synthesize one segment, reusing a cached waveform when available."""
+    key = audio_cache_key(text, speaker, language, instruct, 1.0, 1.0, "segment")
+    cached = await _segment_cache.fetch(key)
+    if cached is not None:
+        return _unpack_segment(cached)
+
+    wav, sr = await _scheduler.submit(text, speaker, language, instruct, priority)
+    await _segment_cache.store(key, _pack_segment(wav, sr))
+    return wav, sr
+
+
+async def postprocess(
+    wav: np.ndarray, sr: int, speed: float, pitch: float
+) -> Tuple[np.ndarray, int]:
+    """Apply speed and pitch processing off the event loop."""
+    if speed == 1.0 and pitch == 1.0:
+        return wav, sr
+    start = time.perf_counter()
+    result = await asyncio.to_thread(process_audio, wav, sr, speed, pitch)
+    DSP_SECONDS.observe(time.perf_counter() - start, **_metric_labels.get())
+    trace_span("dsp", start)
+    return result
+
+
+async def synthesize(
+    text: str,
+    speaker: str,
+    language: str,
+    instruct: Optional[str] = None,
+    speed: float = 1.0,
+    pitch: float = 1.0,
+    progress: Optional[Callable[[int, int], None]] = None,
+    priority: str = "single",
+) -> Tuple[np.ndarray, int]:
+    """
+    Synthesize text without blocking the loop.
+
+    The text goes through the text front-end; only segments missing from the
+    segment cache go to the batch scheduler, up to segment_parallelism() at
+    a time so they fill batches and workers together. The results are
+    loudness-matched and joined in order with short crossfades before speed
+    and pitch processing. progress(done, total) is called as each segment
+    finishes.
+    """
+    start = time.perf_counter()
+    segments = text_segments(text, language) or [text]
+    slots = asyncio.Semaphore(segment_parallelism())
+    done = 0
+
+    async def run_segment(segment: str) -> Tuple[np.ndarray, int]:
+        nonlocal done
+        async with slots:
+            result = await synthesize_segment(segment, speaker, language, instruct, priority)
+        done += 1
+        if progress is not None:
+            progress(done, len(segments))
+        return result
+
+    results = await asyncio.gather(*[run_segment(seg) for seg in segments])
+
+    sr = results[0][1]
+    wavs = match_loudness([wav for wav, _ in results], sr)
+    wav = concat_with_crossfade(wavs, sr, CROSSFADE_MS)
+    wav, sr = await postprocess(wav, sr, speed, pitch)
+    REALTIME_FACTOR.observe(
+        len(wav) / sr / max(time.perf_counter() - start, 1e-9), **_metric_labels.get()
+    )
+    return wav, sr
+
+
+# How often a request waiting for audio checks that its client is still there.
+# 499 is the conventional status for "client closed request"; nobody reads it.
+DISCONNECT_POLL_INTERVAL = 0.25
+CLIENT_CLOSED_REQUEST = 499
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client went away while its audio was being generated."""
+
+
+async def unless_disconnected(http_request: Request, awaitable: Any) -> Any:
+    """
+    Await awaitable, cancelling it as soon as the client disconnects.
+
+    Cancellation drops the request's queued segments from the batch
+    scheduler, and a running generation stops at its next decoding step once
+    no caller in its batch is left.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait([task], timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+            # Collect the cancellation, or a cancelled gather logs
+            # "exception was never retrieved"
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+
+# ============ Startup Lifecycle ============
+
+# Load the model and run warmup syntheses at startup instead of on the first
+# request. TTS_WARMUP is a comma-separated list of Speaker:Language pairs.
+PRELOAD_MODEL = os.environ.get("TTS_PRELOAD", "1") != "0"
+WARMUP_PAIRS = os.environ.get("TTS_WARMUP", "Ryan:English")
+
+WARMUP_TEXTS = {
+    "English": "Hello, this is a warmup sentence.",
+    "Chinese": "你好，这是一个预热句子。",
+    "Japanese": "こんにちは、これはウォームアップの文です。",
+    "Korean": "안녕하세요, 이것은 준비 문장입니다.",
+    "German": "Hallo, das ist ein Aufwärmsatz.",
+    "French": "Bonjour, ceci est une phrase d'échauffement.",
+    "Russian": "Привет, это разминочное предложение.",
+    "Portuguese": "Olá, esta é uma frase de aquecimento.",
+    "Spanish": "Hola, esta es una frase de calentamiento.",
+    "Italian": "Ciao, questa è una frase di riscaldamento.",
+}
+
+# Readiness: "starting" -> "loading" (load + warmup) -> "ready" (or "failed")
+_startup_state = "starting" if PRELOAD_MODEL else "ready"
+_startup_error: Optional[str] = None
+
+
+def parse_warmup_pairs(spec: str) -> List[Tuple[str, str]]:
+    """Parse "Speaker:Language,..." into validated (speaker, language) pairs."""
+    pairs = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        speaker, _, language = item.partition(":")
+        speaker = speaker.strip()
+        language = language.strip() or "English"
+        if speaker not in SPEAKERS or language not in LANGUAGES:
+            print(f"Skipping invalid warmup pair: {item}")
+            continue
+        pairs.append((speaker, language))
+    return pairs
+
+
+def _warm_up_blocking(pairs: List[Tuple[str, str]]) -> None:
+    """Load the model and run one warmup synthesis per pair. Runs on a worker."""
+    load_model()
+    for speaker, language in pairs:
+        start = time.time()
+        _generate_batch_blocking([WARMUP_TEXTS[language]], speaker, language, None)
+        print(f"Warmup {speaker}/{language} in {time.time() - start:.2f}s")
+
+
+async def warm_up_model() -> None:
+    """Load the model on the inference workers and prime it with warmup runs."""
+    global _startup_state, _startup_error
+
+    try:
+        _startup_state = "loading"
+        await _executor.prepare(parse_warmup_pairs(WARMUP_PAIRS))
+
+        _startup_state = "ready"
+        print("Server ready")
+
+    except Exception as e:
+        _startup_state = "failed"
+        _startup_error = str(e)
+        print(f"Startup failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Preload and warm up the model in the background while serving liveness."""
+    check_num2words()
+    startup_task = None
+    if PRELOAD_MODEL:
+        startup_task = asyncio.create_task(warm_up_model())
+    _job_queue.resume()
+    _bulk_runner.resume()
+
+    yield
+
+    if startup_task is not None and not startup_task.done():
+        startup_task.cancel()
+    _job_queue.shutdown()
+    _bulk_runner.shutdown()
+    _executor.shutdown()
+    _encoder_pool.shutdown()
+
+
 # ============ FastAPI App ============
 
 app = FastAPI(
     title="Qwen TTS API",
     description="OpenAI-compatible Text-to-Speech API using Qwen3-TTS",
     version="1.0.0",
+    lifespan=lifespan,
+)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
 )
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
+# ============ Models ============
+
+
+class TTSStreamRequest(BaseModel):
+    """TTS streaming request."""
+
+    text: str = Field(..., max_length=5000, description="Text to synthesize")
+    speaker: str = Field(default="Ryan", description="Speaker name")
+    language: str = Field(default="English", description="Language")
+    speed: float = Field(default=1.0, ge=0.25, le=4.0, description="Speech speed")
+    pitch: float = Field(default=1.0, ge=0.5, le=2.0, description="Voice pitch")
+    instruct: Optional[str] = Field(default=None, description="Style instruction")
+    response_format: str = Field(default="wav", description="Audio format")
+
+
+class BatchTTSRequest(BaseModel):
+    """Batch TTS request."""
+
+    requests: List[TTSStreamRequest] = Field(
+        ..., max_length=10, description="List of TTS requests"
+    )
+
+
+class BatchTTSResult(BaseModel):
+    """Result for a single batch item."""
+
+    success: bool
+    audio: Optional[str] = None  # base64 encoded
+    error: Optional[str] = None
+    sample_rate: Optional[int] = None
+    format: Optional[str] = None
+    timings: Optional[Dict[str, float]] = None
+
+
+class BatchTTSResponse(BaseModel):
+    """Batch TTS response."""
+
+    results: List[BatchTTSResult]
+    completed_count: int
+    failed_count: int
+
+
+class SpeechRequest(BaseModel):
+    """OpenAI-compatible /v1/audio/speech request."""
+
+    model: str = Field(default="qwen-tts", description="Model identifier")
+    input: str = Field(..., description="Text to synthesize")
+    voice: str = Field(default="alloy", description="Voice (speaker) to use")
+    response_format: str = Field(default="wav", description="Audio format")
+    speed: float = Field(default=1.0, ge=0.25, le=4.0, description="Speech speed")
+    pitch: float = Field(default=1.0, ge=0.5, le=2.0, description="Voice pitch")
+
+
+class TTSRequest(BaseModel):
+    """Extended TTS request with more options."""
+
+    text: str = Field(..., description="Text to synthesize")
+    speaker: str = Field(default="Ryan", description="Speaker name")
+    language: str = Field(default="English", description="Language")
+    speed: float = Field(default=1.0, ge=0.25, le=4.0, description="Speech speed")
+    pitch: float = Field(default=1.0, ge=0.5, le=2.0, description="Voice pitch")
+    instruct: Optional[str] = Field(default=None, description="Style instruction")
+    response_format: str = Field(default="wav", description="Audio format")
+
+
+class JobRequest(TTSRequest):
+    """Asynchronous synthesis job request."""
+
+    priority: int = Field(default=0, ge=-10, le=10, description="Higher runs first")
+    callback_url: Optional[str] = Field(
+        default=None, description="Local URL that receives the final job status"
+    )
+
+
+class VoiceItem(BaseModel):
+    """Voice item for listing."""
+
+    id: str
+    name: str
+    description: str
+
+
+# ============ Helper Functions ============
+
+
+def map_voice_to_speaker(voice: str) -> str:
+    """Map OpenAI voice names to Qwen speakers."""
+    # OpenAI voice names: alloy, echo, fable, onyx, nova, shimmer
+    voice_map = {
+        "alloy": "Ryan",
+        "echo": "Vivian",
+        "fable": "Serena",
+        "onyx": "Dylan",
+        "nova": "Eric",
+        "shimmer": "Aiden",
+    }
+    return voice_map.get(voice.lower(), "Ryan")
+
+
+# Phase vocoder frame size and hop (75% overlap) used by time_stretch
+STRETCH_N_FFT = 1024
+STRETCH_HOP = STRETCH_N_FFT // 4
+
+
+def _overlap_add(frames: np.ndarray, hop: int) -> np.ndarray:
+    """Overlap-add frames whose length is a multiple of hop, without a Python loop per frame."""
+    n_frames, n_fft = frames.shape
+    parts = n_fft // hop
+    out = np.zeros((n_frames + parts - 1) * hop, dtype=frames.dtype)
+    for k in range(parts):
+        out[k * hop : k * hop + n_frames * hop] += frames[:, k * hop : (k + 1) * hop].reshape(-1)
+    return out
+
+
+def time_stretch(
+    wav: np.ndarray, rate: float, n_fft: int = STRETCH_N_FFT, hop: int = STRETCH_HOP
+) -> np.ndarray:
+    """
+    Change duration by 1/rate without changing pitch (phase vocoder).
+
+    All frames are analysed, phase-advanced and resynthesized as 2-D arrays
+    (one FFT call for the whole signal in each direction), in float32.
+    """
+    from scipy import fft
+
+    wav = np.asarray(wav, dtype=np.float32)
+    if rate == 1.0 or len(wav) == 0:
+        return wav.copy()
+
+    out_length = int(round(len(wav) / rate))
+    window = np.hanning(n_fft + 1)[:-1].astype(np.float32)
+
+    # Centre the first frame on sample 0 and make sure there are >= 2 frames
+    padded = np.pad(wav, (n_fft // 2, n_fft + hop))
+    frames = np.lib.stride_tricks.sliding_window_view(padded, n_fft)[::hop]
+    spec = fft.rfft(frames * window, axis=-1, workers=-1)
+
+    # Output frame j reads analysis position steps[j] (fractional frames)
+    steps = np.arange(0, len(spec) - 1, rate, dtype=np.float64)
+    base = steps.astype(np.int64)
+    frac = (steps - base).astype(np.float32)[:, None]
+
+    magnitude = np.abs(spec)
+    out_mag = (1.0 - frac) * magnitude[base] + frac * magnitude[base + 1]
+
+    # Phase advance per bin, corrected by each frame pair's measured deviation
+    phase = np.angle(spec)
+    omega = (2.0 * np.pi * hop / n_fft) * np.arange(spec.shape[1], dtype=np.float32)
+    deviation = phase[1:] - phase[:-1] - omega
+    deviation -= 2.0 * np.pi * np.round(deviation / (2.0 * np.pi))
+    advance = (omega + deviation)[base]
+    out_phase = np.empty_like(advance)
+    out_phase[0] = phase[0]
+    np.cumsum(advance[:-1], axis=0, out=out_phase[1:])
+    out_phase[1:] += phase[0]
+
+    out_spec = out_mag * np.exp(1j * out_phase).astype(np.complex64)
+    out_frames = fft.irfft(out_spec, n=n_fft, axis=-1, workers=-1).astype(np.float32)
+    out_frames *= window
+
+    audio = _overlap_add(out_frames, hop)
+    norm = _overlap_add(np.broadcast_to(window * window, out_frames.shape), hop)
+    np.divide(audio, norm, out=audio, where=norm > 1e-6)
+
+    audio = audio[n_fft // 2 : n_fft // 2 + out_length]
+    if len(audio) < out_length:
+        audio = np.pad(audio, (0, out_length - len(audio)))
+    return audio
+
+
+def resample(wav: np.ndarray, factor: float) -> np.ndarray:
+    """Resample to len(wav) / factor samples with a polyphase anti-aliasing filter."""
+    from fractions import Fraction
+
+    from scipy import signal
+
+    if factor == 1.0:
+        return wav
+    ratio = Fraction(factor).limit_denominator(100)
+    return signal.resample_poly(wav, ratio.denominator, ratio.numerator).astype(
+        np.float32, copy=False
+    )
+
+
+def process_audio(wav_data: np.ndarray, sr: int, speed: float, pitch: float) -> tuple:
+    """
+    Process audio with speed and pitch adjustments.
+
+    Speed changes duration without changing pitch; pitch shifts without
+    changing duration. Both are done with a single phase-vocoder stretch by
+    speed / pitch followed by one anti-aliased resample by pitch.
+
+    Args:
+        wav_data: Audio waveform data
+        sr: Sample rate
+        speed: Speed factor (0.25 to 4.0)
+        pitch: Pitch factor (0.5 to 2.0)
+
+    Returns:
+        Processed audio data and sample rate
+    """
+    processed = np.asarray(wav_data, dtype=np.float32)
+
+    if speed == 1.0 and pitch == 1.0:
+        return processed.copy(), sr
+
+    # Stretch so that the pitch resample below lands on len / speed samples
+    processed = time_stretch(processed, speed / pitch)
+
+    # Higher pitch = play the stretched audio faster
+    if pitch != 1.0:
+        processed = resample(processed, pitch)
+
+    return processed, sr
+
+
+WAV_HEADER_SIZE = 44
+
+# Samples converted per step; bounds the float32 scratch buffer of a conversion.
+PCM_CONVERT_BLOCK = 65536
+
+
+def wav_header_into(
+    buf, sr: int, data_bytes: Optional[int] = None, channels: int = 1, bits: int = 16
+) -> None:
+    """
+    Write a 44-byte PCM WAV header at the start of buf.
+
+    With data_bytes=None the RIFF and data sizes are set to 0xFFFFFFFF, which
+    players treat as "read until end of stream".
+    """
+    block_align = channels * bits // 8
+    riff_size = 0xFFFFFFFF if data_bytes is None else WAV_HEADER_SIZE - 8 + data_bytes
+    struct.pack_into(
+        "<4sI4s4sIHHIIHH4sI",
+        buf,
+        0,
+        b"RIFF",
+        riff_size,
+        b"WAVE",
+        b"fmt ",
+        16,
+        1,  # PCM
+        channels,
+        sr,
+        sr * block_align,
+        block_align,
+        bits,
+        b"data",
+        0xFFFFFFFF if data_bytes is None else data_bytes,
+    )
+
+
+def wav_stream_header(sr: int, channels: int = 1, bits: int = 16) -> bytes:
+    """Build a 44-byte PCM WAV header for a stream of unknown length."""
+    header = bytearray(WAV_HEADER_SIZE)
+    wav_header_into(header, sr, None, channels, bits)
+    return bytes(header)
+
+
+def pcm16_into(wav: np.ndarray, out: np.ndarray) -> None:
+    """
+    Convert a float waveform in [-1, 1] into the int16 array out.
+
+    Works block by block through one small float32 scratch buffer, so the
+    only full-size allocation is out itself.
+    """
+    wav = np.asarray(wav).reshape(-1)
+    scratch = np.empty(min(len(wav), PCM_CONVERT_BLOCK), dtype=np.float32)
+    for start in range(0, len(wav), PCM_CONVERT_BLOCK):
+        block = wav[start : start + PCM_CONVERT_BLOCK]
+        tmp = scratch[: len(block)]
+        np.clip(block, -1.0, 1.0, out=tmp)
+        tmp *= 32767.0
+        np.copyto(out[start : start + len(block)], tmp, casting="unsafe")
+
+
+def float_to_pcm16(wav: np.ndarray) -> memoryview:
+    """Convert a float waveform in [-1, 1] to little-endian 16-bit PCM."""
+    buf = bytearray(2 * len(wav))
+    pcm16_into(wav, np.frombuffer(buf, dtype="<i2"))
+    return memoryview(buf)
+
+
+def encode_wav(wav: np.ndarray, sr: int, streaming: bool = False) -> memoryview:
+    """
+    Serialize a waveform as 16-bit PCM WAV into one preallocated buffer.
+
+    The header is packed in place and samples are converted straight into
+    the buffer behind it; the returned memoryview can be sliced and sent
+    without further copies. streaming=True writes an unknown-length header.
+    """
+    data_bytes = 2 * len(wav)
+    buf = bytearray(WAV_HEADER_SIZE + data_bytes)
+    wav_header_into(buf, sr, None if streaming else data_bytes)
+    pcm16_into(wav, np.frombuffer(buf, dtype="<i2", offset=WAV_HEADER_SIZE))
+    return memoryview(buf)
+
+
+# ============ Text Front-End ============
+
+# Text is rewritten the way it is spoken before it is segmented: known
+# abbreviations, dates and numbers are expanded with per-language rules, so
+# segment lengths reflect the audio they produce and equal utterances share
+# segment cache entries. TTS_TEXT_NORMALIZE=0 sends the text as written.
+TEXT_NORMALIZE = os.environ.get("TTS_TEXT_NORMALIZE", "1").lower() not in ("0", "false", "no")
+
+# Letters of space-delimited scripts; a number touching one is part of a
+# word ("MP3", "4K") and is left alone. CJK text has no spaces around numbers.
+_WORD_CHARS = "0-9A-Za-zÀ-ɏЀ-ӿ"
+# Amounts keep their digits: the currency word goes after the spoken number
+_CURRENCY_SIGNS = "$€£¥₩₽"
+
+
+@dataclass
+class LanguageRules:
+    """How one language writes and speaks abbreviations, numbers, dates and times."""
+
+    code: str
+    decimal: str
+    group: str
+    date_order: str
+    months: Tuple[str, ...]
+    date_format: str
+    percent: Optional[str] = None
+    first_day: Optional[str] = None
+    minus: Optional[str] = None
+    range_format: Optional[str] = None
+    time_format: Optional[str] = None
+    hour_format: Optional[str] = None
+    abbreviations: Dict[str, str] = field(default_factory=dict)
+    # Abbreviations that can end a sentence; there they keep its period
+    sentence_final: Tuple[str, ...] = ()
+
+    def __post_init__(self):
+        # Longest first so "p. ex." wins over a shorter overlapping entry.
+        # Entries written without a period ("Dr", "Mme") also take in one
+        # that follows, or "Dr. Who" would keep a false sentence break.
+        names = sorted(self.abbreviations, key=len, reverse=True)
+        self.abbreviation_re = (
+            re.compile(
+                r"(?<![\w.])(?:%s)(?!\w)"
+                % "|".join(re.escape(n) + ("" if n.endswith(".") else r"\.?") for n in names)
+            )
+            if names
+            else None
+        )
+        group = re.escape(self.group)
+        decimal = re.escape(self.decimal)
+        self.number_re = re.compile(
+            rf"(?<![{_WORD_CHARS}{_CURRENCY_SIGNS}.,:/-])(\d{{1,3}}(?:[{group}]\d{{3}})+|\d+)"
+            rf"(?:{decimal}(\d+))?(\s?%)?(?![{_WORD_CHARS}]|[-:/]\d)"
+        )
+        # ISO dates everywhere, plus the language's own numeric order
+        local = {
+            "mdy": r"(?P<m2>\d{1,2})/(?P<d2>\d{1,2})/(?P<y2>\d{4})",
+            "dmy": r"(?P<d2>\d{1,2})[./](?P<m2>\d{1,2})[./](?P<y2>\d{4})",
+            "ymd": r"(?P<y2>\d{4})/(?P<m2>\d{1,2})/(?P<d2>\d{1,2})",
+        }[self.date_order]
+        self.date_re = re.compile(
+            rf"(?<![\d/-])(?<!\d\.)(?:(?P<y>\d{{4}})-(?P<m>\d{{1,2}})-(?P<d>\d{{1,2}})|{local})"
+            r"(?![\d/-]|\.\d)"
+        )
+
+
+# Thousands separators written as spaces: plain, no-break and narrow no-break
+_GROUP_SPACES = " \u00a0\u202f"
+
+LANGUAGE_RULES: Dict[str, LanguageRules] = {
+    "English": LanguageRules(
+        code="en",
+        decimal=".",
+        group=",",
+        date_order="mdy",
+        months=(
+            "January", "February", "March", "April", "May", "June", "July",
+            "August", "September", "October", "November", "December",
+        ),
+        date_format="{month} {day}, {year}",
+        percent=" percent",
+        minus="minus ",
+        range_format="{start} to {end}",
+        abbreviations={
+            "Mr.": "Mister",
+            "Mrs.": "Missus",
+            "Dr.": "Doctor",
+            "Prof.": "Professor",
+            "Jr.": "Junior",
+            "Sr.": "Senior",
+            "vs.": "versus",
+            "etc.": "et cetera",
+            "e.g.": "for example",
+            "i.e.": "that is",
+            "approx.": "approximately",
+        },
+        sentence_final=("etc.",),
+    ),
+    "Chinese": LanguageRules(
+        code="zh",
+        decimal=".",
+        group=",",
+        date_order="ymd",
+        months=tuple(f"{m}月" for m in "一二三四五六七八九十") + ("十一月", "十二月"),
+        date_format="{year}年{month}{day}日",
+        percent="百分之",
+        minus="负",
+        range_format="{start}到{end}",
+        time_format="{hour}点{minute}分",
+        hour_format="{hour}点",
+    ),
+    "Japanese": LanguageRules(
+        code="ja",
+        decimal=".",
+        group=",",
+        date_order="ymd",
+        months=tuple(f"{m}月" for m in "一二三四五六七八九十") + ("十一月", "十二月"),
+        date_format="{year}年{month}{day}日",
+        percent="パーセント",
+        minus="マイナス",
+        range_format="{start}から{end}",
+        time_format="{hour}時{minute}分",
+        hour_format="{hour}時",
+    ),
+    "Korean": LanguageRules(
+        code="ko",
+        decimal=".",
+        group=",",
+        date_order="ymd",
+        months=(
+            "일월", "이월", "삼월", "사월", "오월", "유월",
+            "칠월", "팔월", "구월", "시월", "십일월", "십이월",
+        ),
+        date_format="{year}년 {month} {day}일",
+        percent=" 퍼센트",
+        minus="마이너스 ",
+        range_format="{start}에서 {end}",
+        time_format="{hour} 시 {minute} 분",
+        hour_format="{hour} 시",
+    ),
+    "German": LanguageRules(
+        code="de",
+        decimal=",",
+        group=".",
+        date_order="dmy",
+        months=(
+            "Januar", "Februar", "März", "April", "Mai", "Juni", "Juli",
+            "August", "September", "Oktober", "November", "Dezember",
+        ),
+        date_format="{day} {month} {year}",
+        percent=" Prozent",
+        minus="minus ",
+        range_format="{start} bis {end}",
+        time_format="{hour} Uhr {minute}",
+        hour_format="{hour} Uhr",
+        abbreviations={
+            "z. B.": "zum Beispiel",
+            "z.B.": "zum Beispiel",
+            "d. h.": "das heißt",
+            "d.h.": "das heißt",
+            "usw.": "und so weiter",
+            "bzw.": "beziehungsweise",
+            "ca.": "circa",
+            "Dr.": "Doktor",
+            "Prof.": "Professor",
+            "Nr.": "Nummer",
+        },
+        sentence_final=("usw.",),
+    ),
+    "French": LanguageRules(
+        code="fr",
+        decimal=",",
+        group=_GROUP_SPACES,
+        date_order="dmy",
+        months=(
+            "janvier", "février", "mars", "avril", "mai", "juin", "juillet",
+            "août", "septembre", "octobre", "novembre", "décembre",
+        ),
+        date_format="{day} {month} {year}",
+        percent=" pour cent",
+        first_day="premier",
+        minus="moins ",
+        range_format="{start} à {end}",
+        time_format="{hour} heures {minute}",
+        hour_format="{hour} heures",
+        abbreviations={
+            "M.": "Monsieur",
+            "Mme": "Madame",
+            "Mlle": "Mademoiselle",
+            "Dr": "Docteur",
+            "p. ex.": "par exemple",
+            "etc.": "et cetera",
+        },
+        sentence_final=("etc.",),
+    ),
+    "Russian": LanguageRules(
+        code="ru",
+        decimal=",",
+        group=_GROUP_SPACES,
+        date_order="dmy",
+        months=(
+            "января", "февраля", "марта", "апреля", "мая", "июня", "июля",
+            "августа", "сентября", "октября", "ноября", "декабря",
+        ),
+        # Day and year numerals inflect for case; they stay digits
+        date_format="{day} {month} {year} года",
+        minus="минус ",
+        abbreviations={
+            "т. е.": "то есть",
+            "т.е.": "то есть",
+            "т. д.": "так далее",
+            "т.д.": "так далее",
+            "т. п.": "тому подобное",
+            "т.п.": "тому подобное",
+        },
+        sentence_final=("т. д.", "т.д.", "т. п.", "т.п."),
+    ),
+    "Portuguese": LanguageRules(
+        code="pt",
+        decimal=",",
+        group=".",
+        date_order="dmy",
+        months=(
+            "janeiro", "fevereiro", "março", "abril", "maio", "junho", "julho",
+            "agosto", "setembro", "outubro", "novembro", "dezembro",
+        ),
+        date_format="{day} de {month} de {year}",
+        percent=" por cento",
+        first_day="primeiro",
+        minus="menos ",
+        range_format="{start} a {end}",
+        time_format="{hour} e {minute}",
+        hour_format="{hour} horas",
+        abbreviations={
+            "Sr.": "Senhor",
+            "Sra.": "Senhora",
+            "Dr.": "Doutor",
+            "Dra.": "Doutora",
+            "Prof.": "Professor",
+            "p. ex.": "por exemplo",
+            "etc.": "etcétera",
+        },
+        sentence_final=("etc.",),
+    ),
+    "Spanish": LanguageRules(
+        code="es",
+        decimal=",",
+        group=".",
+        date_order="dmy",
+        months=(
+            "enero", "febrero", "marzo", "abril", "mayo", "junio", "julio",
+            "agosto", "septiembre", "octubre", "noviembre", "diciembre",
+        ),
+        date_format="{day} de {month} de {year}",
+        percent=" por ciento",
+        minus="menos ",
+        range_format="{start} a {end}",
+        time_format="{hour} y {minute}",
+        hour_format="{hour} en punto",
+        abbreviations={
+            "Sr.": "Señor",
+            "Sra.": "Señora",
+            "Srta.": "Señorita",
+            "Dr.": "Doctor",
+            "Dra.": "Doctora",
+            "Ud.": "usted",
+            "Uds.": "ustedes",
+            "p. ej.": "por ejemplo",
+            "etc.": "etcétera",
+        },
+        sentence_final=("etc.",),
+    ),
+    "Italian": LanguageRules(
+        code="it",
+        decimal=",",
+        group=".",
+        date_order="dmy",
+        months=(
+            "gennaio", "febbraio", "marzo", "aprile", "maggio", "giugno", "luglio",
+            "agosto", "settembre", "ottobre", "novembre", "dicembre",
+        ),
+        date_format="{day} {month} {year}",
+        percent=" per cento",
+        first_day="primo",
+        minus="meno ",
+        range_format="{start} a {end}",
+        time_format="{hour} e {minute}",
+        hour_format="{hour} in punto",
+        abbreviations={
+            "Sig.ra": "Signora",
+            "Sig.": "Signor",
+            "Dott.": "Dottor",
+            "Prof.": "Professor",
+            "ecc.": "eccetera",
+            "ad es.": "ad esempio",
+        },
+        sentence_final=("ecc.",),
+    ),
+}
+
+_EN_ONES = (
+    "zero one two three four five six seven eight nine ten eleven twelve "
+    "thirteen fourteen fifteen sixteen seventeen eighteen nineteen"
+).split()
+_EN_TENS = "- - twenty thirty forty fifty sixty seventy eighty ninety".split()
+_EN_SCALES = ((10**12, "trillion"), (10**9, "billion"), (10**6, "million"), (1000, "thousand"))
+_EN_ORDINALS = {
+    "one": "first",
+    "two": "second",
+    "three": "third",
+    "five": "fifth",
+    "eight": "eighth",
+    "nine": "ninth",
+    "twelve": "twelfth",
+}
+_EN_ORDINAL_RE = re.compile(rf"(?<![{_WORD_CHARS}])(\d+)(st|nd|rd|th)(?![{_WORD_CHARS}])")
+
+# Numbers above this are left as digits
+MAX_SPELLED_NUMBER = 10**15 - 1
+
+
+def english_cardinal(n: int) -> str:
+    """Spell a non-negative integer in English: 1234 -> one thousand two hundred thirty-four."""
+    if n < 20:
+        return _EN_ONES[n]
+    if n < 100:
+        tens, ones = divmod(n, 10)
+        return _EN_TENS[tens] + (f"-{_EN_ONES[ones]}" if ones else "")
+    if n < 1000:
+        hundreds, rest = divmod(n, 100)
+        return f"{_EN_ONES[hundreds]} hundred" + (f" {english_cardinal(rest)}" if rest else "")
+    for scale, name in _EN_SCALES:
+        if n >= scale:
+            head, rest = divmod(n, scale)
+            return f"{english_cardinal(head)} {name}" + (
+                f" {english_cardinal(rest)}" if rest else ""
+            )
+    raise ValueError(n)
+
+
+def english_ordinal(n: int) -> str:
+    """Spell an English ordinal: 21 -> twenty-first."""
+    words = english_cardinal(n)
+    cut = max(words.rfind(" "), words.rfind("-")) + 1
+    last = words[cut:]
+    if last in _EN_ORDINALS:
+        last = _EN_ORDINALS[last]
+    elif last.endswith("y"):
+        last = last[:-1] + "ieth"
+    else:
+        last += "th"
+    return words[:cut] + last
+
+
+def english_year(n: int) -> str:
+    """Read a year the English way: 1999 -> nineteen ninety-nine, 2005 -> two thousand five."""
+    if not 1000 <= n <= 9999 or 2000 <= n <= 2009:
+        return english_cardinal(n)
+    high, low = divmod(n, 100)
+    if low == 0:
+        return f"{english_cardinal(high)} hundred"
+    if low < 10:
+        return f"{english_cardinal(high)} oh {english_cardinal(low)}"
+    return f"{english_cardinal(high)} {english_cardinal(low)}"
+
+
+# Sino-Chinese, Sino-Japanese and Sino-Korean numerals share one structure:
+# digits with 10/100/1000 units inside groups of four, and 10^4 group names.
+_CJK_NUMERALS = {
+    "Chinese": ("零一二三四五六七八九", "十百千", ("", "万", "亿", "万亿"), "点"),
+    "Japanese": ("〇一二三四五六七八九", "十百千", ("", "万", "億", "兆"), "点"),
+    "Korean": ("영일이삼사오육칠팔구", "십백천", ("", "만", "억", "조"), "점"),
+}
+
+
+def _cjk_group(value: int, language: str, leading: bool) -> str:
+    """Spell one group of four digits (1-9999)."""
+    digits, units, _, _ = _CJK_NUMERALS[language]
+    out = ""
+    gap = False
+    for power, unit in ((3, units[2]), (2, units[1]), (1, units[0]), (0, "")):
+        d = value // 10**power % 10
+        if d == 0:
+            gap = bool(out)
+            continue
+        if gap and language == "Chinese":
+            out += digits[0]
+        gap = False
+        # "十", "百", "千" stand alone for 1 except in Chinese, which keeps
+        # the 一 everywhere but a leading 十 (十五, but 一百一十五)
+        if d == 1 and unit and (language != "Chinese" or (power == 1 and leading and not out)):
+            out += unit
+        else:
+            out += digits[d] + unit
+    return out
+
+
+def cjk_cardinal(n: int, language: str) -> str:
+    """Spell a non-negative integer with Chinese, Japanese or Korean numerals."""
+    digits, _, myriads, _ = _CJK_NUMERALS[language]
+    if n == 0:
+        return digits[0]
+    groups = []
+    while n:
+        n, group = divmod(n, 10000)
+        groups.append(group)
+    if len(groups) > len(myriads):
+        raise ValueError(n)
+
+    out = ""
+    gap = False
+    for i in reversed(range(len(groups))):
+        group = groups[i]
+        if group == 0:
+            gap = bool(out)
+            continue
+        # Chinese marks a missing place with 零: 一万零五十
+        if language == "Chinese" and out and (gap or group < 1000):
+            out += digits[0]
+        if language == "Korean" and group == 1 and i == 1:
+            out += myriads[i]  # 만, not 일만
+        else:
+            out += _cjk_group(group, language, leading=not out) + myriads[i]
+        gap = False
+    return out
+
+
+# num2words spells numbers for the languages not built in here (see
+# spell_number); without it their numbers stay as digits.
+try:
+    from num2words import num2words as _num2words_lib
+except ImportError:
+    _num2words_lib = None
+
+
+def check_num2words() -> None:
+    """Report once at startup when number spelling is degraded."""
+    if not TEXT_NORMALIZE or _num2words_lib is not None:
+        return
+    languages = [
+        name for name in LANGUAGE_RULES if name != "English" and name not in _CJK_NUMERALS
+    ]
+    print(f"num2words is not installed; numbers stay as digits in {', '.join(languages)}")
+
+
+def _num2words(value: Union[int, float], rules: LanguageRules, to: str = "cardinal") -> Optional[str]:
+    """Spell value with num2words when it is installed."""
+    if _num2words_lib is None:
+        return None
+    try:
+        return _num2words_lib(value, lang=rules.code, to=to)
+    except (NotImplementedError, OverflowError, ValueError):
+        return None
+
+
+def spell_number(integer: str, fraction: Optional[str], language: str) -> Optional[str]:
+    """
+    Spell a number given its digit strings, or None to leave it as written.
+
+    English and the CJK languages are spelled here; the other languages use
+    num2words when it is installed.
+    """
+    value = int(integer)
+    if value > MAX_SPELLED_NUMBER:
+        return None
+    if language == "English":
+        words = english_cardinal(value)
+        if fraction:
+            words += " point " + " ".join(_EN_ONES[int(d)] for d in fraction)
+        return words
+    if language in _CJK_NUMERALS:
+        digits, _, _, point = _CJK_NUMERALS[language]
+        words = cjk_cardinal(value, language)
+        if fraction:
+            words += point + "".join(digits[int(d)] for d in fraction)
+        return words
+    rules = LANGUAGE_RULES[language]
+    if fraction:
+        return _num2words(float(f"{value}.{fraction}"), rules)
+    return _num2words(value, rules)
+
+
+def spell_digits(digits: str, language: str) -> Optional[str]:
+    """Read a digit string one digit at a time, or None if it cannot be spelled."""
+    if language == "English":
+        return " ".join(_EN_ONES[int(d)] for d in digits)
+    if language in _CJK_NUMERALS:
+        return "".join(_CJK_NUMERALS[language][0][int(d)] for d in digits)
+    words = [_num2words(int(d), LANGUAGE_RULES[language]) for d in digits]
+    return None if None in words else " ".join(words)
+
+
+def spell_date(year: int, month: int, day: int, language: str) -> Optional[str]:
+    """Spell a date in the language's usual order, or None if it is not a date."""
+    if not (1 <= month <= 12 and 1 <= day <= 31):
+        return None
+    rules = LANGUAGE_RULES[language]
+    if language == "English":
+        day_words, year_words = english_ordinal(day), english_year(year)
+    elif language == "Chinese":
+        # Years are read digit by digit: 二零二四年
+        day_words = cjk_cardinal(day, language)
+        year_words = spell_digits(str(year), language)
+    elif language in _CJK_NUMERALS:
+        day_words, year_words = cjk_cardinal(day, language), cjk_cardinal(year, language)
+    elif language == "Russian":
+        day_words, year_words = str(day), str(year)
+    else:
+        if day == 1 and rules.first_day:
+            day_words = rules.first_day
+        elif language == "German":
+            day_words = _num2words(day, rules, "ordinal") or f"{day}."
+        else:
+            day_words = _num2words(day, rules) or str(day)
+        year_words = _num2words(year, rules, "year") or str(year)
+    return rules.date_format.format(
+        day=day_words, month=rules.months[month - 1], year=year_words
+    )
+
+
+# Counting words (classifiers) after a number. Chinese counts two of
+# something as 两, not 二; Korean counts with native numerals below 100
+# ("3개" is 세 개), but months (개월) take Sino-Korean ones.
+_ZH_CLASSIFIERS = "个只本张条件次天位台辆块种点斤岁周年小分家间双对杯瓶层份句首部片门名栋架颗"
+_KO_COUNTERS = "개(?!월)|명|마리|시|살|잔|병|권|번|사람|대|장|그릇|켤레|송이|달|군데|가지"
+_KO_NATIVE_TENS = ("", "열", "스물", "서른", "마흔", "쉰", "예순", "일흔", "여든", "아흔")
+# Before a counter, 1-4 and 20 take their short forms (한 개, 스무 살)
+_KO_NATIVE_ONES = ("", "한", "두", "세", "네", "다섯", "여섯", "일곱", "여덟", "아홉")
+
+
+def korean_native(n: int) -> str:
+    """Native Korean numeral for 1-99 as used before a counter."""
+    if n == 20:
+        return "스무"
+    tens, ones = divmod(n, 10)
+    return _KO_NATIVE_TENS[tens] + _KO_NATIVE_ONES[ones]
+
+
+def spell_time(hour: int, minute: int, language: str) -> Optional[str]:
+    """Spell a clock time, or None to leave it as written."""
+    if language == "English":
+        if minute == 0:
+            return f"{english_cardinal(hour)} o'clock"
+        minutes = f"oh {english_cardinal(minute)}" if minute < 10 else english_cardinal(minute)
+        return f"{english_cardinal(hour)} {minutes}"
+    rules = LANGUAGE_RULES[language]
+    if rules.time_format is None:
+        return None
+    if language == "Korean" and hour > 0:
+        hour_words = korean_native(hour)
+    elif language == "Chinese" and hour == 2:
+        hour_words = "两"
+    else:
+        hour_words = spell_number(str(hour), None, language) or str(hour)
+    if minute == 0:
+        return rules.hour_format.format(hour=hour_words)
+    minute_words = spell_number(str(minute), None, language) or f"{minute:02d}"
+    if language == "Chinese" and minute < 10:
+        minute_words = "零" + minute_words
+    return rules.time_format.format(hour=hour_words, minute=minute_words)
+
+
+def _is_range(start: str, end: str) -> bool:
+    """Whether "start-end" reads as a range rather than a phone or code number."""
+    if any(len(part) > 1 and part.startswith("0") for part in (start, end)):
+        return False
+    if int(start) >= int(end):
+        return False
+    # 555-1234 is a phone number, 1990-1995 and 100-200 are ranges
+    return len(start) == len(end) or len(start) + len(end) < 7
+
+
+def _english_decade(match: re.Match) -> str:
+    words = english_year(int(match.group(1)))
+    return words[:-1] + "ies" if words.endswith("y") else words + "s"
+
+
+_SENTENCE_START_RE = re.compile(r"\s*$|\s+[\"'“‘«(]?[A-ZÀ-ÖØ-ÞА-ЯЁ]")
+_TIME_RE = re.compile(r"(?<![\d:.])([01]?\d|2[0-3]):([0-5]\d)(?![\d:])")
+# Digit groups joined by dashes: ranges ("1-10", "1990–1995") or phone and
+# code numbers ("555-1234"), read digit by digit.
+_NUMBER_RUN_RE = re.compile(
+    rf"(?<![{_WORD_CHARS}{_CURRENCY_SIGNS}.,:/-])(\d+(?:[-–—]\d+)+)(?![{_WORD_CHARS}]|[-.,:/]\d)"
+)
+# A sign, not a hyphen: nothing word-like or closing right before it
+_MINUS_RE = re.compile(rf"(?<![{_WORD_CHARS})\]−-])[-−](?=\d)")
+# Four-digit numbers after these words are years: "in 1999", "since 2010"
+_EN_YEAR_RE = re.compile(
+    r"\b(in|since|from|until|till|by|before|after|during|year|circa|around|born)"
+    r"\s+(1[1-9]\d\d|20\d\d)(?![\w%]|[.,]\d)",
+    re.IGNORECASE,
+)
+_EN_DECADE_RE = re.compile(rf"(?<![{_WORD_CHARS}])(1[1-9]\d0|20\d0)s(?![{_WORD_CHARS}])")
+_ZH_YEAR_RE = re.compile(r"(?<![\d.,])(\d{4})(?=年)")
+_ZH_TWO_RE = re.compile(rf"(?<![\d.,])2(?=[{_ZH_CLASSIFIERS}])")
+_KO_COUNT_RE = re.compile(rf"(?<![\d.,])([1-9]\d?)\s?(?={_KO_COUNTERS})")
+
+
+def normalize_for_speech(text: str, language: str) -> str:
+    """
+    Rewrite text the way it is read aloud in language.
+
+    Passes run from the most to the least specific pattern, so digits that
+    belong to a larger construct are spelled as part of it: abbreviations,
+    dates (ISO and the language's numeric order), clock times, dashed ranges
+    and phone numbers, then per-language readings (English years, decades
+    and ordinals; Chinese years and 两; Korean native counting numbers),
+    minus signs, and finally percentages and plain numbers with the
+    language's decimal and grouping separators. Anything that cannot be
+    spelled is left as written.
+    """
+    text = normalize_text(text)
+    rules = LANGUAGE_RULES.get(language)
+    if rules is None:
+        return text
+
+    if rules.abbreviation_re is not None:
+        source = text
+
+        def abbreviation(match: re.Match) -> str:
+            written = match.group(0)
+            words = rules.abbreviations.get(written) or rules.abbreviations[written[:-1]]
+            # "etc." closing a sentence also carries its full stop
+            if written in rules.sentence_final and _SENTENCE_START_RE.match(
+                source, match.end()
+            ):
+                words += "."
+            return words
+
+        text = rules.abbreviation_re.sub(abbreviation, text)
+
+    def date(match: re.Match) -> str:
+        year, month, day = (
+            match.group("y", "m", "d") if match.group("y") else match.group("y2", "m2", "d2")
+        )
+        return spell_date(int(year), int(month), int(day), language) or match.group(0)
+
+    text = rules.date_re.sub(date, text)
+    text = _TIME_RE.sub(
+        lambda m: spell_time(int(m.group(1)), int(m.group(2)), language) or m.group(0), text
+    )
+
+    def number_run(match: re.Match) -> str:
+        parts = re.split(r"([-–—])", match.group(0))
+        numbers, dashes = parts[::2], parts[1::2]
+        if len(numbers) == 2 and (dashes[0] != "-" or _is_range(*numbers)):
+            if rules.range_format is None:
+                return match.group(0)
+            if language == "English" and all(1100 <= int(n) <= 2099 for n in numbers):
+                start, end = (english_year(int(n)) for n in numbers)
+            else:
+                start, end = (spell_number(n, None, language) for n in numbers)
+            if start is None or end is None:
+                return match.group(0)
+            return rules.range_format.format(start=start, end=end)
+        groups = [spell_digits(n, language) for n in numbers]
+        if None in groups:
+            return match.group(0)
+        return (" " if language in _CJK_NUMERALS else ", ").join(groups)
+
+    text = _NUMBER_RUN_RE.sub(number_run, text)
+
+    if language == "English":
+        text = _EN_DECADE_RE.sub(_english_decade, text)
+        text = _EN_YEAR_RE.sub(lambda m: f"{m.group(1)} {english_year(int(m.group(2)))}", text)
+        text = _EN_ORDINAL_RE.sub(
+            lambda m: english_ordinal(int(m.group(1)))
+            if int(m.group(1)) <= MAX_SPELLED_NUMBER
+            else m.group(0),
+            text,
+        )
+    elif language == "Chinese":
+        text = _ZH_YEAR_RE.sub(lambda m: spell_digits(m.group(1), language), text)
+        text = _ZH_TWO_RE.sub("两", text)
+    elif language == "Korean":
+        text = _KO_COUNT_RE.sub(lambda m: korean_native(int(m.group(1))) + " ", text)
+
+    if rules.minus is not None:
+        text = _MINUS_RE.sub(rules.minus, text)
+
+    def number(match: re.Match) -> str:
+        integer, fraction, percent = match.groups()
+        words = spell_number(re.sub(r"\D", "", integer), fraction, language)
+        if words is None:
+            return match.group(0)
+        if percent:
+            if rules.percent is None:
+                return words + percent
+            if language == "Chinese":
+                return rules.percent + words
+            return words + rules.percent
+        return words
+
+    return rules.number_re.sub(number, text)
+
+
+# Segments longer than this are split at clause boundaries, then at words.
+# The limit is for English; other languages get the same speaking time, so a
+# Chinese segment holds about a third as many characters.
+SEGMENT_MAX_CHARS = int(os.environ.get("TTS_SEGMENT_MAX_CHARS", "200"))
+
+# Sentence ends: Latin punctuation needs trailing whitespace, CJK does not.
+# Closing quotes and brackets stay with their sentence. A single capital
+# before the period is an initial ("J. Smith", "U.S. Army") and one or two
+# digits are an ordinal ("am 3. Oktober"), not a sentence end; neither is a
+# title before a name when the text was not normalized.
+_SENTENCE_END_RE = re.compile(
+    r"(?<=[.!?;…])(?<!\b[A-Z]\.)(?<!\b\d\.)(?<!\b\d\d\.)"
+    r"(?<!\bMr\.)(?<!\bMs\.)(?<!\bMrs\.)(?<!\bDr\.)(?<!\bSt\.)\s+"
+    r"|(?<=[.!?…][\"')\]”’»])\s+"
+    r"|(?<=[。！？；．])(?![」』）】”’])\s*"
+    r"|(?<=[。！？；．][」』）】”’])\s*"
+)
+_CLAUSE_END_RE = re.compile(r"(?<=[,:])\s+|(?<=[，、：])\s*")
+
+
+def _wrap_words(text: str, max_chars: int) -> List[str]:
+    """Hard-wrap text to max_chars, on whitespace when there is any."""
+    words = text.split()
+    if len(words) <= 1:
+        return [text[i : i + max_chars] for i in range(0, len(text), max_chars)]
+
+    lines = []
+    current = ""
+    for word in words:
+        candidate = f"{current} {word}" if current else word
+        if len(candidate) <= max_chars or not current:
+            current = candidate
+        else:
+            lines.append(current)
+            current = word
+    if current:
+        lines.append(current)
+    return lines
+
+
+def split_text_segments(text: str, max_chars: int = SEGMENT_MAX_CHARS) -> List[str]:
+    """
+    Split text into sentence/clause segments for incremental synthesis.
+
+    Sentences are kept whole when they fit in max_chars; longer sentences
+    are packed clause by clause and, as a last resort, wrapped on words.
+    """
+    segments = []
+    for sentence in _SENTENCE_END_RE.split(text.strip()):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if len(sentence) <= max_chars:
+            segments.append(sentence)
+            continue
+
+        current = ""
+        for clause in _CLAUSE_END_RE.split(sentence):
+            clause = clause.strip()
+            if not clause:
+                continue
+            sep = "" if current.endswith(("，", "、", "：")) else " "
+            candidate = f"{current}{sep}{clause}" if current else clause
+            if len(candidate) <= max_chars:
+                current = candidate
+                continue
+            if current:
+                segments.append(current)
+            if len(clause) <= max_chars:
+                current = clause
+            else:
+                *full, current = _wrap_words(clause, max_chars)
+                segments.extend(full)
+        if current:
+            segments.append(current)
+
+    return segments
+
+
+def segment_max_chars(language: str) -> int:
+    """SEGMENT_MAX_CHARS scaled to the speaking rate of language."""
+    rate = CHARS_PER_SECOND.get(language, CHARS_PER_SECOND["English"])
+    return max(1, int(SEGMENT_MAX_CHARS * rate / CHARS_PER_SECOND["English"]))
+
+
+def text_segments(text: str, language: str) -> List[str]:
+    """
+    Text front-end: normalize text for speech and split it into segments.
+
+    Each segment is bounded in speaking time, so it is generated, cached and
+    streamed as one unit; requests of any length cost at most one bounded
+    generation per segment.
+    """
+    if TEXT_NORMALIZE:
+        text = normalize_for_speech(text, language)
+    return split_text_segments(text, segment_max_chars(language))
+
+
+# ============ Audio Encoding ============
+
+# Pre-started ffmpeg processes kept ready per (format, sample rate); only
+# formats libsndfile cannot write (AAC) go through ffmpeg.
+ENCODER_POOL_SIZE = int(os.environ.get("TTS_ENCODER_POOL_SIZE", "2"))
+FFMPEG_PATH = os.environ.get("TTS_FFMPEG") or shutil.which("ffmpeg")
+
+
+class UnsupportedFormat(Exception):
+    """Raised for a response_format this server cannot encode."""
+
+
+class _StreamSink(io.RawIOBase):
+    """
+    Write-only file object that lets libsndfile encode incrementally.
+
+    Bytes are handed out by drain() as soon as they are written. libsndfile
+    may seek back to patch headers on close; patches that land in bytes not
+    yet drained are applied, earlier ones are dropped (streamed formats
+    treat those header fields as "unknown").
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._drained = 0
+        self._pos = 0
+        self._end = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readable(self) -> bool:
+        return False
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._end
+        self._pos = max(0, offset)
+        return self._pos
+
+    def write(self, data) -> int:
+        data = memoryview(data).cast("B")
+        n = len(data)
+        start = self._pos - self._drained
+        if start < 0:
+            data = data[-start:]
+            start = 0
+        if data:
+            if start > len(self._buffer):
+                self._buffer.extend(bytes(start - len(self._buffer)))
+            self._buffer[start : start + len(data)] = data
+        self._pos += n
+        self._end = max(self._end, self._pos)
+        return n
+
+    def drain(self) -> bytes:
+        out = bytes(self._buffer)
+        self._drained += len(self._buffer)
+        self._buffer.clear()
+        return out
+
+
+class AudioEncoder:
+    """Incremental encoder: feed float32 chunks, collect encoded bytes."""
+
+    def write(self, wav: np.ndarray) -> bytes:
+        raise NotImplementedError
+
+    def close(self) -> bytes:
+        return b""
+
+
+class PCMEncoder(AudioEncoder):
+    """Headerless 16-bit little-endian PCM."""
+
+    def write(self, wav: np.ndarray) -> bytes:
+        return float_to_pcm16(wav)
+
+
+class WAVStreamEncoder(PCMEncoder):
+    """16-bit PCM WAV with an unknown-length header, for streaming."""
+
+    def __init__(self, sr: int):
+        self._sr = sr
+        self._started = False
+
+    def write(self, wav: np.ndarray) -> bytes:
+        if self._started:
+            return float_to_pcm16(wav)
+        self._started = True
+        return encode_wav(wav, self._sr, streaming=True)
+
+
+class SoundFileEncoder(AudioEncoder):
+    """MP3, Ogg/Opus and FLAC through libsndfile, encoded incrementally."""
+
+    def __init__(self, sr: int, format: str, subtype: str):
+        import soundfile as sf
+
+        self._sink = _StreamSink()
+        self._file = sf.SoundFile(
+            self._sink, "w", samplerate=sr, channels=1, format=format, subtype=subtype
+        )
+
+    def write(self, wav: np.ndarray) -> bytes:
+        self._file.write(np.asarray(wav, dtype=np.float32))
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._file.close()
+        return self._sink.drain()
+
+
+class FFmpegEncoder(AudioEncoder):
+    """AAC (ADTS) through an ffmpeg subprocess fed raw PCM on stdin."""
+
+    def __init__(self, sr: int, codec_args: List[str]):
+        import subprocess
+
+        self._process = subprocess.Popen(
+            [FFMPEG_PATH, "-hide_banner", "-loglevel", "error",
+             "-f", "s16le", "-ar", str(sr), "-ac", "1", "-i", "pipe:0",
+             *codec_args, "pipe:1"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        self._chunks: List[bytes] = []
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self) -> None:
+        while True:
+            chunk = self._process.stdout.read1(65536)
+            if not chunk:
+                break
+            with self._lock:
+                self._chunks.append(chunk)
+
+    def _take(self) -> bytes:
+        with self._lock:
+            out = b"".join(self._chunks)
+            self._chunks.clear()
+        return out
+
+    def write(self, wav: np.ndarray) -> bytes:
+        self._process.stdin.write(float_to_pcm16(wav))
+        self._process.stdin.flush()
+        return self._take()
+
+    def close(self) -> bytes:
+        self._process.stdin.close()
+        self._process.wait()
+        self._reader.join()
+        if self._process.returncode != 0:
+            raise RuntimeError(f"ffmpeg exited with code {self._process.returncode}")
+        return self._take()
+
+    def abort(self) -> None:
+        self._process.kill()
+
+
+# libsndfile (format, subtype) for the formats it can write
+SOUNDFILE_FORMATS = {
+    "mp3": ("MP3", "MPEG_LAYER_III"),
+    "opus": ("OGG", "OPUS"),
+    "flac": ("FLAC", "PCM_16"),
+}
+
+# response_format -> (media type, streaming encoder factory(sr), needs ffmpeg)
+AUDIO_FORMATS: Dict[str, Tuple[str, Callable[[int], AudioEncoder], bool]] = {
+    "wav": ("audio/wav", WAVStreamEncoder, False),
+    "pcm": ("audio/pcm", lambda sr: PCMEncoder(), False),
+    "mp3": ("audio/mpeg", lambda sr: SoundFileEncoder(sr, *SOUNDFILE_FORMATS["mp3"]), False),
+    "opus": ("audio/ogg", lambda sr: SoundFileEncoder(sr, *SOUNDFILE_FORMATS["opus"]), False),
+    "flac": ("audio/flac", lambda sr: SoundFileEncoder(sr, *SOUNDFILE_FORMATS["flac"]), False),
+    "aac": (
+        "audio/aac",
+        lambda sr: FFmpegEncoder(sr, ["-c:a", "aac", "-b:a", "64k", "-f", "adts"]),
+        True,
+    ),
+}
+
+
+class EncoderPool:
+    """
+    Hands out encoders, keeping pre-started ffmpeg processes ready.
+
+    An ffmpeg encoder costs a process start (tens of milliseconds), so up to
+    `size` idle ones are kept per (format, sample rate) and replaced in the
+    background as they are taken. libsndfile encoders are cheap to create
+    and are built on demand.
+    """
+
+    def __init__(self, size: int):
+        self.size = max(0, size)
+        self._idle: Dict[Tuple[str, int], List[AudioEncoder]] = {}
+        self._lock = threading.Lock()
+
+    def _refill(self, fmt: str, sr: int) -> None:
+        _, factory, _ = AUDIO_FORMATS[fmt]
+        while True:
+            with self._lock:
+                idle = self._idle.setdefault((fmt, sr), [])
+                if len(idle) >= self.size:
+                    return
+            encoder = factory(sr)
+            with self._lock:
+                idle.append(encoder)
+
+    def acquire(self, fmt: str, sr: int) -> AudioEncoder:
+        """Get a fresh encoder for fmt at sample rate sr."""
+        fmt = check_format(fmt)
+        _, factory, pooled = AUDIO_FORMATS[fmt]
+        if not pooled or self.size == 0:
+            return factory(sr)
+
+        with self._lock:
+            idle = self._idle.get((fmt, sr))
+            encoder = idle.pop() if idle else None
+        threading.Thread(target=self._refill, args=(fmt, sr), daemon=True).start()
+        return encoder if encoder is not None else factory(sr)
+
+    def shutdown(self) -> None:
+        """Kill idle pre-started encoders."""
+        with self._lock:
+            idle = [e for encoders in self._idle.values() for e in encoders]
+            self._idle.clear()
+        for encoder in idle:
+            if isinstance(encoder, FFmpegEncoder):
+                encoder.abort()
+
+
+_encoder_pool = EncoderPool(ENCODER_POOL_SIZE)
+
+
+def check_format(fmt: str) -> str:
+    """Normalize a response_format, raising UnsupportedFormat if unusable."""
+    fmt = (fmt or "wav").lower()
+    if fmt not in AUDIO_FORMATS:
+        raise UnsupportedFormat(
+            f"Unsupported response_format '{fmt}'. Available: {', '.join(AUDIO_FORMATS)}"
+        )
+    if AUDIO_FORMATS[fmt][2] and not FFMPEG_PATH:
+        raise UnsupportedFormat(f"response_format '{fmt}' requires ffmpeg on the server")
+    return fmt
+
+
+def media_type_for(fmt: str) -> str:
+    """HTTP media type of a response_format."""
+    return AUDIO_FORMATS[fmt][0]
+
+
+def encode_audio(wav: np.ndarray, sr: int, fmt: str) -> Union[bytes, memoryview]:
+    """Encode a complete waveform in response_format fmt, recording its time."""
+    start = time.perf_counter()
+    try:
+        return _encode_audio(wav, sr, fmt)
+    finally:
+        ENCODE_SECONDS.observe(
+            time.perf_counter() - start, format=fmt, **_metric_labels.get()
+        )
+        trace_span("encode", start)
+
+
+def _encode_audio(wav: np.ndarray, sr: int, fmt: str) -> Union[bytes, memoryview]:
+    """
+    Encode a complete waveform in response_format fmt.
+
+    WAV and PCM are serialized directly into one buffer and returned as a
+    memoryview. libsndfile formats are written to a seekable buffer so their
+    headers carry the final length; the streaming encoders are used otherwise.
+    """
+    if fmt == "wav":
+        return encode_wav(wav, sr)
+    if fmt == "pcm":
+        return float_to_pcm16(wav)
+    if fmt in SOUNDFILE_FORMATS:
+        import soundfile as sf
+
+        format, subtype = SOUNDFILE_FORMATS[fmt]
+        audio_buffer = io.BytesIO()
+        sf.write(audio_buffer, wav, sr, format=format, subtype=subtype)
+        audio_buffer.seek(0)
+        return audio_buffer.read()
+
+    encoder = _encoder_pool.acquire(fmt, sr)
+    return encoder.write(wav) + encoder.close()
+
+
+# ============ Job Queue ============
+
+# Long syntheses can run as jobs: POST /v1/jobs returns an id at once and the
+# job runs from a SQLite-backed priority queue that survives restarts, so the
+# work no longer depends on the client keeping a connection open. Finished
+# audio is kept on disk for TTS_JOB_TTL seconds.
+JOBS_DIR = os.environ.get(
+    "TTS_JOBS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs")
+)
+JOB_WORKERS = int(os.environ.get("TTS_JOB_WORKERS", "1"))
+JOB_RESULT_TTL = float(os.environ.get("TTS_JOB_TTL", "3600"))
+JOB_PURGE_INTERVAL = 60.0
+
+# Completion callbacks are only delivered to the local machine.
+JOB_CALLBACK_HOSTS = {"localhost", "127.0.0.1", "::1"}
+
+
+class JobStore:
+    """
+    Jobs table and result files in one directory.
+
+    Rows hold the request, state and progress; finished audio lives next to
+    the database as <id>.<format>. Calls block on sqlite (commits fsync), so
+    JobQueue makes them on its database thread; the lock keeps the shared
+    connection safe for any other caller.
+    """
+
+    def __init__(self, directory: str):
+        import sqlite3
+
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(directory, "jobs.db"),
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                request TEXT NOT NULL,
+                created REAL NOT NULL,
+                started REAL,
+                finished REAL,
+                expires REAL,
+                segments_done INTEGER NOT NULL DEFAULT 0,
+                segments_total INTEGER NOT NULL,
+                duration REAL,
+                sample_rate INTEGER,
+                error TEXT
+            )"""
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created)"
+        )
+
+    def create(self, request: Dict[str, Any], priority: int, segments_total: int) -> str:
+        job_id = os.urandom(12).hex()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, status, priority, request, created, segments_total)"
+                " VALUES (?, 'queued', ?, ?, ?, ?)",
+                (job_id, priority, json.dumps(request), time.time(), segments_total),
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Mark the highest-priority, oldest queued job running and return it."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM jobs WHERE status = 'queued'"
+                " ORDER BY priority DESC, created LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            self._db.execute(
+                "UPDATE jobs SET status = 'running', started = ? WHERE id = ?",
+                (now, row["id"]),
+            )
+        job = dict(row)
+        job.update(status="running", started=now)
+        return job
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._db.execute(
+                f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id)
+            )
+
+    def requeue_running(self) -> int:
+        """Put jobs interrupted by a restart back in the queue."""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = 'queued', started = NULL, segments_done = 0"
+                " WHERE status = 'running'"
+            )
+        return cursor.rowcount
+
+    def result_path(self, job_id: str, fmt: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.{fmt}")
+
+    def delete(self, job_id: str) -> bool:
+        """Remove a job that is not running, with its audio."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT request FROM jobs WHERE id = ? AND status != 'running'", (job_id,)
+            ).fetchone()
+            if row is None:
+                return False
+            self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        fmt = json.loads(row["request"])["response_format"]
+        try:
+            os.remove(self.result_path(job_id, fmt))
+        except FileNotFoundError:
+            pass
+        return True
+
+    def purge_expired(self, now: float) -> int:
+        """Drop finished jobs (and their audio) whose retention has passed."""
+        with self._lock:
+            expired = [
+                row["id"]
+                for row in self._db.execute(
+                    "SELECT id FROM jobs WHERE expires IS NOT NULL AND expires < ?", (now,)
+                )
+            ]
+        for job_id in expired:
+            self.delete(job_id)
+        return len(expired)
+
+
+class JobQueue:
+    """
+    Runs jobs from a JobStore on the event loop.
+
+    `workers` jobs run at once; their segments still go through the batch
+    scheduler like any other request. The store is opened on first use, or
+    at startup when a previous run left jobs behind, and jobs interrupted by
+    a restart are queued again. Store calls run in order on one database
+    thread, so a slow commit never stalls the event loop.
+    """
+
+    def __init__(self, directory: str, workers: int, ttl: float):
+        self.directory = directory
+        self.workers = max(1, workers)
+        self.ttl = ttl
+        self.store: Optional[JobStore] = None
+        self._db = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts-jobs-db")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List["asyncio.Task[None]"] = []
+        self._last_purge = 0.0
+
+    async def _call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking store call on the database thread and await it."""
+        return await asyncio.wrap_future(self._db.submit(fn, *args, **kwargs))
+
+    def _load_store(self) -> JobStore:
+        """Open the store, requeueing interrupted jobs. Runs on the database thread."""
+        if self.store is None:
+            store = JobStore(self.directory)
+            requeued = store.requeue_running()
+            if requeued:
+                print(f"Requeued {requeued} interrupted job(s)")
+            self.store = store
+        return self.store
+
+    async def _open(self) -> JobStore:
+        if self.store is None:
+            await self._call(self._load_store)
+        return self.store
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and any(not task.done() for task in self._tasks):
+            return
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    def resume(self) -> None:
+        """Start workers if a previous run left a job database behind."""
+        if os.path.exists(os.path.join(self.directory, "jobs.db")):
+            self._ensure_started()
+
+    async def submit(self, request: Dict[str, Any], priority: int, segments_total: int) -> str:
+        store = await self._open()
+        self._ensure_started()
+        job_id = await self._call(store.create, request, priority, segments_total)
+        self._wakeup.set()
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job row, or None if unknown or past its retention."""
+        if self.store is None and not os.path.exists(os.path.join(self.directory, "jobs.db")):
+            return None
+        store = await self._open()
+        job = await self._call(store.get, job_id)
+        if job is None or (job["expires"] is not None and job["expires"] < time.time()):
+            return None
+        return job
+
+    async def delete(self, job_id: str) -> bool:
+        store = await self._open()
+        return await self._call(store.delete, job_id)
+
+    async def _worker(self) -> None:
+        store = await self._open()
+        while True:
+            now = time.time()
+            if now - self._last_purge >= JOB_PURGE_INTERVAL:
+                self._last_purge = now
+                await self._call(store.purge_expired, now)
+
+            # Clear before claiming so a submit in between is not missed
+            self._wakeup.clear()
+            job = await self._call(store.claim)
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), JOB_PURGE_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+        request = json.loads(job["request"])
+        fmt = request["response_format"]
+
+        def progress(done: int, total: int) -> None:
+            # Not awaited: the database thread applies updates in order
+            self._db.submit(
+                self.store.update, job_id, segments_done=done, segments_total=total
+            )
 
-# ============ Models ============
+        set_metric_labels("/v1/jobs", request["speaker"], request["language"])
+        trace = start_trace()
+        status = 500
 
+        try:
+            ticket = _admission.admit("job", len(request["text"]))
+            try:
+                wav, sr = await synthesize(
+                    request["text"],
+                    request["speaker"],
+                    request["language"],
+                    request["instruct"],
+                    request["speed"],
+                    request["pitch"],
+                    progress=progress,
+                    priority="job",
+                )
+            finally:
+                ticket.release()
+            audio = await asyncio.to_thread(encode_audio, wav, sr, fmt)
+
+            def write_result() -> None:
+                path = self.store.result_path(job_id, fmt)
+                with open(path + ".tmp", "wb") as f:
+                    f.write(audio)
+                os.replace(path + ".tmp", path)
+
+            await asyncio.to_thread(write_result)
+            now = time.time()
+            await self._call(
+                self.store.update,
+                job_id,
+                status="completed",
+                finished=now,
+                expires=now + self.ttl,
+                duration=len(wav) / sr,
+                sample_rate=sr,
+            )
+            status = 200
+        except InferenceQueueFull:
+            # Server is saturated; retry the job shortly
+            await self._call(
+                self.store.update, job_id, status="queued", started=None, segments_done=0
+            )
+            status = 503
+            await asyncio.sleep(1.0)
+            return
+        except Exception as e:
+            now = time.time()
+            await self._call(
+                self.store.update,
+                job_id,
+                status="failed",
+                finished=now,
+                expires=now + self.ttl,
+                error=str(e),
+            )
+        finally:
+            finish_trace(trace, status)
 
-class TTSStreamRequest(BaseModel):
-    """TTS streaming request."""
+        callback_url = request.get("callback_url")
+        if callback_url:
+            job = await self._call(self.store.get, job_id)
+            asyncio.create_task(self._notify(callback_url, job))
 
-    text: str = Field(..., max_length=5000, description="Text to synthesize")
-    speaker: str = Field(default="Ryan", description="Speaker name")
-    language: str = Field(default="English", description="Language")
-    speed: float = Field(default=1.0, ge=0.25, le=4.0, description="Speech speed")
-    pitch: float = Field(default=1.0, ge=0.5, le=2.0, description="Voice pitch")
-    instruct: Optional[str] = Field(default=None, description="Style instruction")
+    async def _notify(self, url: str, job: Dict[str, Any]) -> None:
+        """POST the final job status to the job's callback URL."""
+        import urllib.request
 
+        body = json.dumps(job_status(job)).encode("utf-8")
+        req = urllib.request.Request(
+            url, data=body, headers={"Content-Type": "application/json"}, method="POST"
+        )
+        try:
+            await asyncio.to_thread(urllib.request.urlopen, req, timeout=5)
+        except Exception as e:
+            print(f"Job {job['id']} callback failed: {e}")
 
-class BatchTTSRequest(BaseModel):
-    """Batch TTS request."""
+    def shutdown(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
 
-    requests: List[TTSStreamRequest] = Field(
-        ..., max_length=10, description="List of TTS requests"
-    )
 
+_job_queue = JobQueue(JOBS_DIR, JOB_WORKERS, JOB_RESULT_TTL)
 
-class BatchTTSResult(BaseModel):
-    """Result for a single batch item."""
 
-    success: bool
-    audio: Optional[str] = None  # base64 encoded
-    error: Optional[str] = None
-    sample_rate: Optional[int] = None
+def check_callback_url(url: str) -> None:
+    """Reject callback URLs that do not point at this machine."""
+    from urllib.parse import urlparse
 
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or parsed.hostname not in JOB_CALLBACK_HOSTS:
+        raise ValueError(
+            f"callback_url must be an http(s) URL on {', '.join(sorted(JOB_CALLBACK_HOSTS))}"
+        )
 
-class BatchTTSResponse(BaseModel):
-    """Batch TTS response."""
 
-    results: List[BatchTTSResult]
-    completed_count: int
-    failed_count: int
+def job_status(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Public view of a job row."""
+    request = json.loads(job["request"])
+    total = job["segments_total"]
+    done = total if job["status"] == "completed" else job["segments_done"]
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "priority": job["priority"],
+        "segments_done": done,
+        "segments_total": total,
+        "progress": done / total if total else 0.0,
+        "created_at": job["created"],
+        "started_at": job["started"],
+        "finished_at": job["finished"],
+        "expires_at": job["expires"],
+        "format": request["response_format"],
+        "duration": job["duration"],
+        "sample_rate": job["sample_rate"],
+        "error": job["error"],
+        "audio_url": f"/v1/jobs/{job['id']}/audio" if job["status"] == "completed" else None,
+    }
 
 
-class SpeechRequest(BaseModel):
-    """OpenAI-compatible /v1/audio/speech request."""
+# ============ Bulk Ingest ============
 
-    model: str = Field(default="qwen-tts", description="Model identifier")
-    input: str = Field(..., description="Text to synthesize")
-    voice: str = Field(default="alloy", description="Voice (speaker) to use")
-    response_format: str = Field(default="wav", description="Audio format")
-    speed: float = Field(default=1.0, ge=0.25, le=4.0, description="Speech speed")
-    pitch: float = Field(default=1.0, ge=0.5, le=2.0, description="Voice pitch")
+# POST /v1/bulk takes an NDJSON upload of any number of items. The upload is
+# spooled to TTS_BULK_DIR/<id>/items.jsonl as it arrives; items then go to
+# the scheduler in length order per voice, so the requests batched together
+# are of similar length, with at most TTS_BULK_CONCURRENCY in flight. Audio
+# is written to <id>/results/ and packed into <id>/results.zip at the end.
+# A bulk interrupted by a restart resumes, skipping items already rendered.
+# Lines longer than TTS_BULK_MAX_LINE_BYTES reject the upload (413).
+BULK_DIR = os.environ.get(
+    "TTS_BULK_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "bulk")
+)
+BULK_CONCURRENCY = int(os.environ.get("TTS_BULK_CONCURRENCY", "16"))
+BULK_MAX_ITEMS = int(os.environ.get("TTS_BULK_MAX_ITEMS", "100000"))
+BULK_MAX_LINE_BYTES = int(os.environ.get("TTS_BULK_MAX_LINE_BYTES", str(64 << 10)))
+BULK_RESULT_TTL = float(os.environ.get("TTS_BULK_TTL", "86400"))
+BULK_MAX_ERRORS = 100  # item errors kept in the status
+BULK_STATUS_INTERVAL = 1.0  # seconds between status file writes while running
 
 
-class TTSRequest(BaseModel):
-    """Extended TTS request with more options."""
+def check_tts_item(request: TTSStreamRequest) -> None:
+    """Validate one synthesis item, raising ValueError (or UnsupportedFormat)."""
+    if not request.text:
+        raise ValueError("Text is required")
+    if request.speaker not in SPEAKERS:
+        raise ValueError(
+            f"Invalid speaker '{request.speaker}'. Available: {', '.join(SPEAKERS)}"
+        )
+    if request.language not in LANGUAGES:
+        raise ValueError(
+            f"Invalid language '{request.language}'. Available: {', '.join(LANGUAGES)}"
+        )
+    check_format(request.response_format)
 
-    text: str = Field(..., description="Text to synthesize")
-    speaker: str = Field(default="Ryan", description="Speaker name")
-    language: str = Field(default="English", description="Language")
-    speed: float = Field(default=1.0, ge=0.25, le=4.0, description="Speech speed")
-    pitch: float = Field(default=1.0, ge=0.5, le=2.0, description="Voice pitch")
-    instruct: Optional[str] = Field(default=None, description="Style instruction")
 
+def bulk_item_name(name: Any, index: int, seen: set) -> str:
+    """Archive file stem of an item: its sanitized "id", else its line number."""
+    stem = re.sub(r"[^A-Za-z0-9._-]", "_", str(name))[:100] if name else ""
+    if not stem or stem in seen:
+        stem = f"{index:06d}" if not stem else f"{stem}-{index:06d}"
+    seen.add(stem)
+    return stem
 
-class VoiceItem(BaseModel):
-    """Voice item for listing."""
 
-    id: str
-    name: str
-    description: str
+def length_bucket(text: str) -> int:
+    """Power-of-two length class of a text."""
+    return max(0, len(text) - 1).bit_length()
 
 
-# ============ Helper Functions ============
+class BulkStore:
+    """
+    One directory per bulk: items.jsonl (validated upload, with lines that
+    failed validation kept as error records), status.json, results/ while
+    running and results.zip when done.
+    """
 
+    def __init__(self, directory: str):
+        self.directory = directory
 
-def map_voice_to_speaker(voice: str) -> str:
-    """Map OpenAI voice names to Qwen speakers."""
-    # OpenAI voice names: alloy, echo, fable, onyx, nova, shimmer
-    voice_map = {
-        "alloy": "Ryan",
-        "echo": "Vivian",
-        "fable": "Serena",
-        "onyx": "Dylan",
-        "nova": "Eric",
-        "shimmer": "Aiden",
-    }
-    return voice_map.get(voice.lower(), "Ryan")
+    def path(self, bulk_id: str, *parts: str) -> str:
+        return os.path.join(self.directory, bulk_id, *parts)
 
+    def create(self) -> str:
+        bulk_id = os.urandom(12).hex()
+        os.makedirs(self.path(bulk_id, "results"))
+        return bulk_id
 
-def process_audio(wav_data: np.ndarray, sr: int, speed: float, pitch: float) -> tuple:
+    def load(self, bulk_id: str) -> Optional[Dict[str, Any]]:
+        if not re.fullmatch(r"[0-9a-f]{24}", bulk_id):
+            return None
+        try:
+            with open(self.path(bulk_id, "status.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save(self, status: Dict[str, Any]) -> None:
+        path = self.path(status["id"], "status.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(status, f)
+        os.replace(path + ".tmp", path)
+
+    def items(self, bulk_id: str) -> List[Dict[str, Any]]:
+        with open(self.path(bulk_id, "items.jsonl"), encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def all(self) -> List[Dict[str, Any]]:
+        if not os.path.isdir(self.directory):
+            return []
+        statuses = (self.load(bulk_id) for bulk_id in os.listdir(self.directory))
+        return [status for status in statuses if status is not None]
+
+    def delete(self, bulk_id: str) -> None:
+        shutil.rmtree(self.path(bulk_id), ignore_errors=True)
+
+    def purge_expired(self, now: float) -> int:
+        expired = [
+            status["id"]
+            for status in self.all()
+            if status.get("expires") is not None and status["expires"] < now
+        ]
+        for bulk_id in expired:
+            self.delete(bulk_id)
+        return len(expired)
+
+    def pack(self, bulk_id: str, manifest: List[Dict[str, Any]]) -> None:
+        """Zip the results directory (audio stored as is) and drop it."""
+        import zipfile
+
+        results = self.path(bulk_id, "results")
+        archive = self.path(bulk_id, "results.zip")
+        with zipfile.ZipFile(archive + ".tmp", "w", zipfile.ZIP_STORED) as zf:
+            for entry in manifest:
+                if entry.get("file"):
+                    zf.write(os.path.join(results, entry["file"]), entry["file"])
+            zf.writestr("manifest.jsonl", "".join(json.dumps(e) + "\n" for e in manifest))
+        os.replace(archive + ".tmp", archive)
+        shutil.rmtree(results, ignore_errors=True)
+
+
+class BulkRunner:
     """
-    Process audio with speed and pitch adjustments.
-
-    Args:
-        wav_data: Audio waveform data
-        sr: Sample rate
-        speed: Speed factor (0.25 to 4.0)
-        pitch: Pitch factor (0.5 to 2.0)
+    Renders bulks one at a time on the event loop.
 
-    Returns:
-        Processed audio data and sample rate
+    Items of the running bulk go through admission ("job" class) and the
+    batch scheduler like any other request.
     """
-    import numpy as np
-    from scipy import signal
 
-    processed = wav_data.copy()
+    def __init__(self, directory: str, concurrency: int, ttl: float):
+        self.store = BulkStore(directory)
+        self.concurrency = max(1, concurrency)
+        self.ttl = ttl
+        self._tasks: Dict[str, "asyncio.Task[None]"] = {}
+        self._lock: Optional[asyncio.Lock] = None
+
+    def resume(self) -> None:
+        """Restart bulks a previous run left queued or running."""
+        self.store.purge_expired(time.time())
+        for status in sorted(self.store.all(), key=lambda s: s["created"]):
+            if status["status"] in ("queued", "running"):
+                print(f"Resuming bulk {status['id']}")
+                self.start(status["id"])
+
+    def start(self, bulk_id: str) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        self._tasks[bulk_id] = asyncio.get_running_loop().create_task(self._run(bulk_id))
+
+    async def ingest(self, lines: AsyncGenerator[bytes, None]) -> Dict[str, Any]:
+        """
+        Validate and spool an NDJSON upload, then queue it. Invalid lines are
+        recorded as failed items; the rest are rendered.
+        """
+        self.store.purge_expired(time.time())
+        bulk_id = self.store.create()
+        status = {
+            "id": bulk_id,
+            "status": "receiving",
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+            "expires": None,
+            "items_total": 0,
+            "items_done": 0,
+            "items_failed": 0,
+            "audio_seconds": 0.0,
+            "input_chars": 0,
+            "errors": [],
+        }
+        seen: set = set()
+        try:
+            with open(self.store.path(bulk_id, "items.jsonl"), "w", encoding="utf-8") as f:
+                index = 0
+                async for line in lines:
+                    if not line.strip():
+                        continue
+                    if index >= BULK_MAX_ITEMS:
+                        raise HTTPException(
+                            status_code=413,
+                            detail=f"Bulk uploads are limited to {BULK_MAX_ITEMS} items",
+                        )
+                    name = None
+                    try:
+                        data = json.loads(line)
+                        if not isinstance(data, dict):
+                            raise ValueError("Item must be a JSON object")
+                        name = data.pop("id", None)
+                        item = TTSStreamRequest.model_validate(data)
+                        check_tts_item(item)
+                    except Exception as e:
+                        self._fail(status, index, str(e))
+                        # Kept in items.jsonl so a resumed run counts it once
+                        record = {
+                            "index": index,
+                            "name": bulk_item_name(name, index, seen),
+                            "error": str(e),
+                        }
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    else:
+                        record = item.model_dump()
+                        record["response_format"] = check_format(item.response_format)
+                        record["index"] = index
+                        record["name"] = bulk_item_name(name, index, seen)
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                        status["input_chars"] += len(item.text)
+                    index += 1
+                status["items_total"] = index
+        except BaseException:
+            self.store.delete(bulk_id)
+            raise
+
+        if status["items_total"] == 0:
+            self.store.delete(bulk_id)
+            raise HTTPException(status_code=400, detail="At least one item is required")
+
+        status["status"] = "queued"
+        self.store.save(status)
+        self.start(bulk_id)
+        return status
+
+    def _fail(self, status: Dict[str, Any], index: int, error: str) -> None:
+        status["items_failed"] += 1
+        if len(status["errors"]) < BULK_MAX_ERRORS:
+            status["errors"].append({"index": index, "error": error})
+
+    def get(self, bulk_id: str) -> Optional[Dict[str, Any]]:
+        status = self.store.load(bulk_id)
+        if status is None or (status["expires"] is not None and status["expires"] < time.time()):
+            return None
+        return status
+
+    def delete(self, bulk_id: str) -> None:
+        task = self._tasks.pop(bulk_id, None)
+        if task is not None:
+            task.cancel()
+        self.store.delete(bulk_id)
+
+    async def _run(self, bulk_id: str) -> None:
+        async with self._lock:
+            status = self.store.load(bulk_id)
+            if status is None:
+                return
+            try:
+                await self._render(status)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                status["status"] = "failed"
+                status["error"] = str(e)
+                status["finished"] = time.time()
+                status["expires"] = status["finished"] + self.ttl
+                self.store.save(status)
+            finally:
+                self._tasks.pop(bulk_id, None)
+
+    async def _render(self, status: Dict[str, Any]) -> None:
+        bulk_id = status["id"]
+        items = await asyncio.to_thread(self.store.items, bulk_id)
+        results = self.store.path(bulk_id, "results")
+        manifest: Dict[int, Dict[str, Any]] = {}
+
+        # Counts are rebuilt on every run: lines rejected at upload fail
+        # again here, items rendered before a restart are kept
+        status["items_failed"] = 0
+        status["errors"] = []
+        pending = []
+        for item in items:
+            if "error" in item:
+                manifest[item["index"]] = {"index": item["index"], "name": item["name"], "error": item["error"]}
+                self._fail(status, item["index"], item["error"])
+                continue
+            file = f"{item['name']}.{item['response_format']}"
+            if os.path.exists(os.path.join(results, file)):
+                manifest[item["index"]] = {"index": item["index"], "name": item["name"], "file": file}
+            else:
+                pending.append(item)
+
+        status["status"] = "running"
+        status["started"] = status["started"] or time.time()
+        status["resumed_done"] = len(manifest) - status["items_failed"]
+        status["run_started"] = time.time()
+        self.store.save(status)
+
+        # Similar lengths per voice arrive at the scheduler together, so its
+        # batches carry little padding
+        pending.sort(
+            key=lambda item: (
+                item["speaker"],
+                item["language"],
+                item["instruct"] or "",
+                length_bucket(item["text"]),
+                len(item["text"]),
+            )
+        )
 
-    # Apply pitch shift (using resampling technique)
-    # Pitch factor > 1 means higher pitch, < 1 means lower pitch
-    if pitch != 1.0:
-        # Simple pitch shift using resampling
-        # Higher pitch = faster playback = shorter duration
-        # We need to preserve duration, so we resample and then stretch back
-        length = len(processed)
-
-        # Resample to change pitch
-        new_length = int(length / pitch)
-        indices = np.round(np.linspace(0, length - 1, new_length)).astype(int)
-        processed = processed[indices]
-
-        # Resample back to original length to preserve duration
-        indices = np.round(np.linspace(0, len(processed) - 1, length)).astype(int)
-        processed = processed[indices]
-
-    # Apply speed adjustment (simple resampling)
-    if speed != 1.0:
-        length = len(processed)
-        new_length = int(length / speed)
-        indices = np.round(np.linspace(0, length - 1, new_length)).astype(int)
-        processed = processed[indices]
-
-        # Resample back to original sample rate
-        indices = np.round(np.linspace(0, len(processed) - 1, length)).astype(int)
-        processed = processed[indices]
+        slots = asyncio.Semaphore(self.concurrency)
+        last_save = time.monotonic()
+
+        async def render_item(item: Dict[str, Any]) -> None:
+            nonlocal last_save
+            try:
+                file, duration = await self._render_item(item, results)
+                manifest[item["index"]] = {
+                    "index": item["index"],
+                    "name": item["name"],
+                    "file": file,
+                    "duration": duration,
+                }
+                status["items_done"] += 1
+                status["audio_seconds"] += duration
+            except Exception as e:
+                manifest[item["index"]] = {"index": item["index"], "name": item["name"], "error": str(e)}
+                self._fail(status, item["index"], str(e))
+            finally:
+                slots.release()
+            if time.monotonic() - last_save >= BULK_STATUS_INTERVAL:
+                last_save = time.monotonic()
+                await asyncio.to_thread(self.store.save, {**status, "errors": list(status["errors"])})
+
+        status["items_done"] = status["resumed_done"]
+        tasks = []
+        try:
+            for item in pending:
+                await slots.acquire()
+                tasks.append(asyncio.create_task(render_item(item)))
+            await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        entries = [manifest[index] for index in sorted(manifest)]
+        await asyncio.to_thread(self.store.pack, bulk_id, entries)
+        now = time.time()
+        status.update(status="completed", finished=now, expires=now + self.ttl)
+        self.store.save(status)
+        print(f"Bulk {bulk_id}: {status['items_done']} items, {status['items_failed']} failed")
+
+    async def _render_item(self, item: Dict[str, Any], results: str) -> Tuple[str, float]:
+        """Synthesize one item into results/, retrying while the server is saturated."""
+        set_metric_labels("/v1/bulk", item["speaker"], item["language"])
+        while True:
+            try:
+                ticket = _admission.admit("job", len(item["text"]))
+                try:
+                    wav, sr = await synthesize(
+                        item["text"],
+                        item["speaker"],
+                        item["language"],
+                        item["instruct"],
+                        item["speed"],
+                        item["pitch"],
+                        priority="job",
+                    )
+                finally:
+                    ticket.release()
+                break
+            except InferenceQueueFull:
+                await asyncio.sleep(1.0)
+
+        fmt = item["response_format"]
+        audio = await asyncio.to_thread(encode_audio, wav, sr, fmt)
+        file = f"{item['name']}.{fmt}"
+
+        def write() -> None:
+            path = os.path.join(results, file)
+            with open(path + ".tmp", "wb") as f:
+                f.write(audio)
+            os.replace(path + ".tmp", path)
+
+        await asyncio.to_thread(write)
+        return file, len(wav) / sr
+
+    def shutdown(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks = {}
+
+
+_bulk_runner = BulkRunner(BULK_DIR, BULK_CONCURRENCY, BULK_RESULT_TTL)
+
+
+def bulk_status(status: Dict[str, Any]) -> Dict[str, Any]:
+    """Public view of a bulk, with progress and throughput of the current run."""
+    total = status["items_total"]
+    finished = status["items_done"] + status["items_failed"]
+    body = {
+        key: status.get(key)
+        for key in (
+            "id",
+            "status",
+            "items_total",
+            "items_done",
+            "items_failed",
+            "audio_seconds",
+            "errors",
+            "error",
+        )
+    }
+    body.update(
+        created_at=status["created"],
+        started_at=status["started"],
+        finished_at=status["finished"],
+        expires_at=status["expires"],
+        progress=finished / total if total else 0.0,
+        archive_url=f"/v1/bulk/{status['id']}/archive" if status["status"] == "completed" else None,
+    )
 
-    return processed, sr
+    run_started = status.get("run_started")
+    if run_started:
+        elapsed = (status["finished"] or time.time()) - run_started
+        rendered = status["items_done"] - status.get("resumed_done", 0)
+        rate = rendered / elapsed if elapsed > 0 else 0.0
+        body["throughput"] = {
+            "elapsed_seconds": elapsed,
+            "items_per_second": rate,
+            "audio_seconds_per_second": status["audio_seconds"] / elapsed if elapsed > 0 else 0.0,
+            "eta_seconds": (total - finished) / rate if rate and status["status"] == "running" else None,
+        }
+    return body
 
 
 # ============ Endpoints ============
@@ -273,7 +4229,32 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {"status": "healthy", "model_loaded": _model_loaded, "device": get_device()}
+    return {
+        "status": "healthy",
+        "model_loaded": _executor.model_loaded,
+        "ready": _startup_state == "ready",
+        "device": model_device(),
+        "precision": MODEL_PRECISION,
+        "compiled": MODEL_COMPILE,
+    }
+
+
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is up and serving requests."""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness probe: 200 only once the model is loaded and warmed up."""
+    body = {"status": _startup_state, "model_loaded": _executor.model_loaded}
+    unavailable = _executor.unavailable_reason
+    if _startup_error or unavailable:
+        body["error"] = _startup_error or unavailable
+    if _startup_state != "ready" or unavailable:
+        return JSONResponse(status_code=503, content=body)
+    return body
 
 
 @app.get("/v1/models")
@@ -331,8 +4312,32 @@ async def list_languages():
     return {"languages": LANGUAGES}
 
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: per-stage latency histograms, RTF, memory and queue gauges."""
+    return Response(
+        content=_metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/v1/queue/stats")
+async def queue_stats():
+    """Admission queue depth, estimated wait and shed counts per class."""
+    return _admission.stats()
+
+
+@app.get("/v1/cache/stats")
+async def cache_stats():
+    """Synthesized-audio and segment cache hit/miss counters and sizes."""
+    return {**_audio_cache.stats(), "segments": _segment_cache.stats()}
+
+
 @app.post("/v1/audio/speech")
-async def create_speech(request: SpeechRequest):
+async def create_speech(
+    request: SpeechRequest,
+    raw_request: Request,
+    if_none_match: Optional[str] = Header(default=None),
+):
     """
     OpenAI-compatible /v1/audio/speech endpoint.
     Generates speech audio from text.
@@ -351,40 +4356,75 @@ async def create_speech(request: SpeechRequest):
 
     # Use default language based on speaker
     language = "English"
-
-    # Load model if needed
-    model = load_model()
+    set_metric_labels("/v1/audio/speech", speaker, language)
 
     try:
-        import soundfile as sf
-
-        # Generate speech
-        wavs, sr = model.generate_custom_voice(
-            text=request.input,
-            language=language,
-            speaker=speaker,
-            instruct=None,
-        )
+        fmt = check_format(request.response_format)
+    except UnsupportedFormat as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        # Convert to bytes
-        audio_buffer = io.BytesIO()
-        sf.write(audio_buffer, wavs[0], sr, format="WAV")
-        audio_buffer.seek(0)
+    key = audio_cache_key(request.input, speaker, language, None, 1.0, 1.0, fmt)
+    etag = f'"{key}"'
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
 
+    trace = start_trace()
+    status = 500
+    try:
+        start = time.perf_counter()
+        audio = await _audio_cache.fetch(key)
+        trace_span("cache", start)
+        cache_status = "HIT"
+        if audio is None:
+            cache_status = "MISS"
+
+            # Generate speech, abandoning it if the client disconnects
+            ticket = _admission.admit("single", len(request.input))
+            try:
+                wav, sr = await unless_disconnected(
+                    raw_request, synthesize(request.input, speaker, language)
+                )
+            finally:
+                ticket.release()
+
+            # Encode in the requested format
+            audio = await asyncio.to_thread(encode_audio, wav, sr, fmt)
+            await _audio_cache.store(key, audio)
+
+        RESPONSE_BYTES.observe(len(audio), format=fmt, **_metric_labels.get())
+        status = 200
         return Response(
-            content=audio_buffer.read(),
-            media_type="audio/wav",
-            headers={"X-Content-Type-Options": "nosniff"},
+            content=audio,
+            media_type=media_type_for(fmt),
+            headers={
+                "X-Content-Type-Options": "nosniff",
+                "ETag": etag,
+                "X-Cache": cache_status,
+                **trace.headers(),
+            },
         )
 
+    except InferenceQueueFull as e:
+        error = overload_error(e)
+        status = error.status_code
+        raise error
+    except ClientDisconnected:
+        status = CLIENT_CLOSED_REQUEST
+        return Response(status_code=status)
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to generate speech: {str(e)}"
         )
+    finally:
+        finish_trace(trace, status)
 
 
 @app.post("/tts")
-async def create_tts(request: TTSRequest):
+async def create_tts(
+    request: TTSRequest,
+    raw_request: Request,
+    if_none_match: Optional[str] = Header(default=None),
+):
     """
     Extended TTS endpoint with full control options.
     """
@@ -402,88 +4442,203 @@ async def create_tts(request: TTSRequest):
             detail=f"Invalid language. Available: {', '.join(LANGUAGES)}",
         )
 
-    # Load model if needed
-    model = load_model()
-
     try:
-        import soundfile as sf
-
-        # Generate speech
-        wavs, sr = model.generate_custom_voice(
-            text=request.text,
-            language=request.language,
-            speaker=request.speaker,
-            instruct=request.instruct,
-        )
-
-        # Apply speed and pitch processing
-        if request.speed != 1.0 or request.pitch != 1.0:
-            wavs[0], sr = process_audio(wavs[0], sr, request.speed, request.pitch)
-
-        # Convert to bytes
-        audio_buffer = io.BytesIO()
-        sf.write(audio_buffer, wavs[0], sr, format="WAV")
-        audio_buffer.seek(0)
+        fmt = check_format(request.response_format)
+    except UnsupportedFormat as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    set_metric_labels("/tts", request.speaker, request.language)
+    key = audio_cache_key(
+        request.text,
+        request.speaker,
+        request.language,
+        request.instruct,
+        request.speed,
+        request.pitch,
+        fmt,
+    )
+    etag = f'"{key}"'
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
 
+    trace = start_trace()
+    status = 500
+    try:
+        start = time.perf_counter()
+        audio = await _audio_cache.fetch(key)
+        trace_span("cache", start)
+        cache_status = "HIT"
+        if audio is None:
+            cache_status = "MISS"
+
+            # Generate speech with speed and pitch processing
+            ticket = _admission.admit("single", len(request.text))
+            try:
+                wav, sr = await unless_disconnected(
+                    raw_request,
+                    synthesize(
+                        request.text,
+                        request.speaker,
+                        request.language,
+                        request.instruct,
+                        request.speed,
+                        request.pitch,
+                    ),
+                )
+            finally:
+                ticket.release()
+
+            # Encode in the requested format
+            audio = await asyncio.to_thread(encode_audio, wav, sr, fmt)
+            await _audio_cache.store(key, audio)
+
+        RESPONSE_BYTES.observe(len(audio), format=fmt, **_metric_labels.get())
+        status = 200
         return Response(
-            content=audio_buffer.read(),
-            media_type="audio/wav",
-            headers={"X-Content-Type-Options": "nosniff"},
+            content=audio,
+            media_type=media_type_for(fmt),
+            headers={
+                "X-Content-Type-Options": "nosniff",
+                "ETag": etag,
+                "X-Cache": cache_status,
+                **trace.headers(),
+            },
         )
 
+    except InferenceQueueFull as e:
+        error = overload_error(e)
+        status = error.status_code
+        raise error
+    except ClientDisconnected:
+        status = CLIENT_CLOSED_REQUEST
+        return Response(status_code=status)
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to generate speech: {str(e)}"
         )
+    finally:
+        finish_trace(trace, status)
 
 
-async def generate_audio_stream(
-    request: TTSStreamRequest,
-) -> AsyncGenerator[bytes, None]:
+class GuardedStreamingResponse(StreamingResponse):
     """
-    Generate audio in chunks for streaming playback.
+    StreamingResponse whose cleanup runs however the response ends.
 
-    Yields 8KB chunks of WAV data.
+    A body generator frees its resources in its own finally, but that never
+    runs when the client leaves before the first chunk: the generator was
+    never started. The body is closed here in every case, then on_close runs
+    to free whatever an unstarted body still holds.
     """
-    import soundfile as sf
 
-    # Load model if needed
-    model = load_model()
-
-    # Generate speech
-    wavs, sr = model.generate_custom_voice(
-        text=request.text,
-        language=request.language,
-        speaker=request.speaker,
-        instruct=request.instruct,
-    )
+    def __init__(self, content: AsyncGenerator[bytes, None], on_close: Callable[[], None], **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
 
-    # Apply speed and pitch processing
-    if request.speed != 1.0 or request.pitch != 1.0:
-        wavs[0], sr = process_audio(wavs[0], sr, request.speed, request.pitch)
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+            self.on_close()
 
-    # Convert to WAV bytes
-    audio_buffer = io.BytesIO()
-    sf.write(audio_buffer, wavs[0], sr, format="WAV")
-    audio_buffer.seek(0)
-    audio_bytes = audio_buffer.read()
 
-    # Yield WAV header first (44 bytes)
-    yield audio_bytes[:44]
-    await asyncio.sleep(0)
+async def generate_audio_stream(
+    request: TTSStreamRequest,
+    raw_request: Request,
+    fmt: str,
+    segments: List[str],
+    first: "asyncio.Task[Tuple[np.ndarray, int]]",
+    ticket: AdmissionTicket,
+    trace: Trace,
+) -> AsyncGenerator[bytes, None]:
+    """
+    Generate audio segment by segment for streaming playback.
 
-    # Yield chunks of 8KB
+    Each segment is encoded incrementally in the requested format (WAV uses
+    an unknown-length header) and yielded as soon as it is synthesized. The
+    next segment is already being generated while the current one is sent.
+    Later segments are scaled toward the speech level of the first one.
+    Generation stops when the client disconnects.
+    """
+    current = first
+    reference = None
+    encoder = None
     chunk_size = 8192
-    for i in range(44, len(audio_bytes), chunk_size):
-        yield audio_bytes[i : i + chunk_size]
-        await asyncio.sleep(0)
+    audio_seconds = 0.0
+    sent = 0
+    encode_time = 0.0
+    status = 500
+    try:
+        for index in range(len(segments)):
+            try:
+                wav, sr = await unless_disconnected(raw_request, current)
+            except ClientDisconnected:
+                status = CLIENT_CLOSED_REQUEST
+                return
+
+            # Start the next segment before handing this one to the client
+            if index + 1 < len(segments):
+                current = asyncio.ensure_future(
+                    synthesize_segment(
+                        segments[index + 1],
+                        request.speaker,
+                        request.language,
+                        request.instruct,
+                        "stream",
+                    )
+                )
+
+            level = speech_level(wav, sr)
+            if reference is None:
+                reference = level
+            else:
+                wav = level_gain(wav, level, reference)
+            wav, sr = await postprocess(wav, sr, request.speed, request.pitch)
+            audio_seconds += len(wav) / sr
+
+            start = time.perf_counter()
+            if encoder is None:
+                encoder = _encoder_pool.acquire(fmt, sr)
+            data = await asyncio.to_thread(encoder.write, wav)
+            encode_time += time.perf_counter() - start
+            trace_span("encode", start)
+            sent += len(data)
+
+            # Yield chunks of 8KB
+            for i in range(0, len(data), chunk_size):
+                yield data[i : i + chunk_size]
+                await asyncio.sleep(0)
+
+        if encoder is not None:
+            start = time.perf_counter()
+            data = await asyncio.to_thread(encoder.close)
+            encode_time += time.perf_counter() - start
+            trace_span("encode", start)
+            encoder = None
+            sent += len(data)
+            for i in range(0, len(data), chunk_size):
+                yield data[i : i + chunk_size]
+
+        labels = _metric_labels.get()
+        ENCODE_SECONDS.observe(encode_time, format=fmt, **labels)
+        RESPONSE_BYTES.observe(sent, format=fmt, **labels)
+        REALTIME_FACTOR.observe(audio_seconds / (time.perf_counter() - trace.started), **labels)
+        status = 200
+    finally:
+        finish_trace(trace, status)
+        ticket.release()
+        if not current.done():
+            current.cancel()
+        if isinstance(encoder, FFmpegEncoder):
+            encoder.abort()
 
 
 @app.post("/tts/stream")
-async def stream_tts(request: TTSStreamRequest):
+async def stream_tts(request: TTSStreamRequest, raw_request: Request):
     """
     Streaming TTS endpoint.
-    Returns audio in chunks as it's generated using StreamingResponse.
+    Splits the text into segments and streams each one's audio as soon as
+    it is generated using StreamingResponse.
     """
     # Validate input
     if not request.text:
@@ -500,63 +4655,243 @@ async def stream_tts(request: TTSStreamRequest):
             detail=f"Invalid language. Available: {', '.join(LANGUAGES)}",
         )
 
-    return StreamingResponse(
-        generate_audio_stream(request),
-        media_type="audio/wav",
-        headers={"Transfer-Encoding": "chunked"},
+    try:
+        fmt = check_format(request.response_format)
+    except UnsupportedFormat as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    segments = text_segments(request.text, request.language)
+    if not segments:
+        raise HTTPException(status_code=400, detail="Text is required")
+
+    set_metric_labels("/tts/stream", request.speaker, request.language)
+    trace = start_trace()
+    try:
+        ticket = _admission.admit("stream", len(request.text))
+    except InferenceQueueFull as e:
+        error = overload_error(e)
+        finish_trace(trace, error.status_code)
+        raise error
+
+    # Synthesize the first segment before responding so errors still map to
+    # a proper status code; the rest is generated while streaming.
+    first = asyncio.ensure_future(
+        synthesize_segment(
+            segments[0],
+            request.speaker,
+            request.language,
+            request.instruct,
+            "stream",
+        )
+    )
+    try:
+        await unless_disconnected(raw_request, first)
+    except InferenceQueueFull as e:
+        ticket.release()
+        error = overload_error(e)
+        finish_trace(trace, error.status_code)
+        raise error
+    except ClientDisconnected:
+        ticket.release()
+        finish_trace(trace, CLIENT_CLOSED_REQUEST)
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except Exception as e:
+        ticket.release()
+        finish_trace(trace, 500)
+        raise HTTPException(
+            status_code=500, detail=f"Failed to generate speech: {str(e)}"
+        )
+
+    def on_close() -> None:
+        # Only left to do if the client went away before the stream started
+        if not ticket.released:
+            ticket.release()
+            finish_trace(trace, CLIENT_CLOSED_REQUEST)
+
+    # Server-Timing covers the first segment (time to first audio); the full
+    # stream is in the sampled trace dump.
+    return GuardedStreamingResponse(
+        generate_audio_stream(request, raw_request, fmt, segments, first, ticket, trace),
+        on_close,
+        media_type=media_type_for(fmt),
+        headers={"Transfer-Encoding": "chunked", **trace.headers()},
     )
 
 
-# Semaphore for limiting concurrent GPU operations
-_batch_semaphore = asyncio.Semaphore(2)
+async def synthesize_batch_item(
+    request: TTSStreamRequest,
+) -> Tuple[Union[bytes, memoryview], int, str, Dict[str, float]]:
+    """
+    Synthesize and encode one batch item through the shared batch scheduler.
+    Returns (audio, sample rate, format, stage timings in ms).
+    """
+    fmt = check_format(request.response_format)
+    set_metric_labels("/tts/batch", request.speaker, request.language)
+    trace = start_trace(parent=_current_trace.get())
+
+    # Generate speech with speed and pitch processing
+    wav, sr = await synthesize(
+        request.text,
+        request.speaker,
+        request.language,
+        request.instruct,
+        request.speed,
+        request.pitch,
+        priority="batch",
+    )
+
+    audio = await asyncio.to_thread(encode_audio, wav, sr, fmt)
+    RESPONSE_BYTES.observe(len(audio), format=fmt, **_metric_labels.get())
+    return audio, sr, fmt, trace.timings_ms()
 
 
 async def process_single_tts(request: TTSStreamRequest) -> BatchTTSResult:
-    """Process a single TTS request with timeout."""
-    async with _batch_semaphore:
-        try:
-            import soundfile as sf
-            import base64
-
-            # Load model if needed
-            model = load_model()
-
-            # Generate speech
-            wavs, sr = model.generate_custom_voice(
-                text=request.text,
-                language=request.language,
-                speaker=request.speaker,
-                instruct=request.instruct,
-            )
+    """Process a single batch item into a JSON result with base64 audio."""
+    try:
+        import base64
 
-            # Apply speed and pitch processing
-            if request.speed != 1.0 or request.pitch != 1.0:
-                wavs[0], sr = process_audio(wavs[0], sr, request.speed, request.pitch)
+        audio, sr, fmt, timings = await synthesize_batch_item(request)
+        audio_b64 = base64.b64encode(audio).decode("utf-8")
 
-            # Convert to WAV bytes and then to base64
-            audio_buffer = io.BytesIO()
-            sf.write(audio_buffer, wavs[0], sr, format="WAV")
-            audio_buffer.seek(0)
-            audio_b64 = base64.b64encode(audio_buffer.read()).decode("utf-8")
+        return BatchTTSResult(
+            success=True,
+            audio=audio_b64,
+            sample_rate=sr,
+            format=fmt,
+            timings=timings,
+        )
 
-            return BatchTTSResult(
-                success=True,
-                audio=audio_b64,
-                sample_rate=sr,
-            )
+    except Exception as e:
+        return BatchTTSResult(
+            success=False,
+            error=str(e),
+        )
 
-        except Exception as e:
-            return BatchTTSResult(
-                success=False,
-                error=str(e),
-            )
+
+# Streamed /tts/batch response types, chosen by the Accept header
+BATCH_STREAM_TYPES = ("multipart/mixed", "application/x-ndjson")
+
+
+def batch_stream_type(accept: Optional[str]) -> Optional[str]:
+    """The streamed batch response type a client accepts, if any."""
+    for media_type in BATCH_STREAM_TYPES:
+        if accept and media_type in accept:
+            return media_type
+    return None
+
+
+def _server_timing(timings: Dict[str, float]) -> str:
+    return ", ".join(f"{name};dur={ms}" for name, ms in timings.items())
+
+
+def multipart_item(
+    boundary: str, index: int, item: Optional[Tuple], error: Optional[BaseException]
+) -> List[Union[bytes, memoryview]]:
+    """One part of a multipart/mixed batch stream: the item's audio, or a JSON error."""
+    if item is not None:
+        audio, sr, fmt, timings = item
+        headers = {
+            "Content-Type": media_type_for(fmt),
+            "X-Item-Index": str(index),
+            "X-Sample-Rate": str(sr),
+            "Server-Timing": _server_timing(timings),
+        }
+        body: Union[bytes, memoryview] = audio
+    else:
+        headers = {"Content-Type": "application/json", "X-Item-Index": str(index)}
+        body = json.dumps({"index": index, "success": False, "error": str(error)}).encode()
+    headers["Content-Length"] = str(len(body))
+    head = f"--{boundary}\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+    return [(head + "\r\n").encode(), body, b"\r\n"]
+
+
+def ndjson_item(index: int, item: Optional[Tuple], error: Optional[BaseException]) -> bytes:
+    """One application/x-ndjson batch event (audio in base64)."""
+    import base64
+
+    if item is not None:
+        audio, sr, fmt, timings = item
+        event = {
+            "index": index,
+            "success": True,
+            "format": fmt,
+            "sample_rate": sr,
+            "timings": timings,
+            "audio": base64.b64encode(audio).decode("ascii"),
+        }
+    else:
+        event = {"index": index, "success": False, "error": str(error)}
+    return (json.dumps(event) + "\n").encode()
+
+
+async def stream_batch_results(
+    tasks: "List[asyncio.Task]",
+    media_type: str,
+    boundary: str,
+    ticket: AdmissionTicket,
+    trace: Trace,
+) -> AsyncGenerator[Union[bytes, memoryview], None]:
+    """
+    Yield batch items in completion order, then a JSON summary.
+
+    Each task resolves to (index, item, error). Items are dropped once sent,
+    so memory holds only finished-but-unsent audio.
+    """
+    completed_count = failed_count = 0
+    status = 500
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, item, error = await next_done
+            if item is not None:
+                completed_count += 1
+            else:
+                failed_count += 1
+            if media_type == "multipart/mixed":
+                for chunk in multipart_item(boundary, index, item, error):
+                    yield chunk
+            else:
+                yield ndjson_item(index, item, error)
+            item = None
+
+        summary = {
+            "done": True,
+            "completed_count": completed_count,
+            "failed_count": failed_count,
+            "timings": trace.timings_ms(),
+        }
+        if media_type == "multipart/mixed":
+            body = json.dumps(summary).encode()
+            yield (
+                f"--{boundary}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n"
+            ).encode() + body + f"\r\n--{boundary}--\r\n".encode()
+        else:
+            yield (json.dumps(summary) + "\n").encode()
+        status = 200
+    except (asyncio.CancelledError, GeneratorExit):
+        status = CLIENT_CLOSED_REQUEST
+        raise
+    finally:
+        # A client that goes away cancels whatever is still synthesizing
+        for task in tasks:
+            task.cancel()
+        ticket.release()
+        finish_trace(trace, status)
 
 
 @app.post("/tts/batch")
-async def batch_tts(request: BatchTTSRequest):
+async def batch_tts(
+    request: BatchTTSRequest, raw_request: Request, accept: Optional[str] = Header(None)
+):
     """
     Batch TTS endpoint.
-    Processes multiple TTS requests with concurrency limits.
+    Processes multiple TTS requests through the batch scheduler.
+
+    By default all results are returned together as JSON with base64 audio.
+    With "Accept: multipart/mixed" each item is streamed as a binary part as
+    soon as it finishes (X-Item-Index gives its position in the request);
+    with "Accept: application/x-ndjson" each finished item is one JSON line.
+    Both end with a JSON summary of completed and failed counts.
     """
     # Validate batch size
     if len(request.requests) > 10:
@@ -573,25 +4908,68 @@ async def batch_tts(request: BatchTTSRequest):
 
     # Validate each request
     for i, req in enumerate(request.requests):
-        if not req.text:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Request {i + 1}: Text is required",
-            )
-        if req.speaker not in SPEAKERS:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Request {i + 1}: Invalid speaker '{req.speaker}'. Available: {', '.join(SPEAKERS)}",
-            )
-        if req.language not in LANGUAGES:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Request {i + 1}: Invalid language '{req.language}'. Available: {', '.join(LANGUAGES)}",
-            )
+        try:
+            check_tts_item(req)
+        except (ValueError, UnsupportedFormat) as e:
+            raise HTTPException(status_code=400, detail=f"Request {i + 1}: {e}")
+
+    # Items label their own stages; the batch trace spans all of them
+    set_metric_labels("/tts/batch", "", "")
+    trace = start_trace()
+    try:
+        ticket = _admission.admit("batch", sum(len(req.text) for req in request.requests))
+    except InferenceQueueFull as e:
+        error = overload_error(e)
+        finish_trace(trace, error.status_code)
+        raise error
+
+    stream_type = batch_stream_type(accept)
+    if stream_type is not None:
+
+        async def run_item(
+            index: int, req: TTSStreamRequest
+        ) -> Tuple[int, Optional[Tuple], Optional[BaseException]]:
+            try:
+                return index, await synthesize_batch_item(req), None
+            except Exception as e:
+                return index, None, e
+
+        item_tasks = [
+            asyncio.create_task(run_item(i, req)) for i, req in enumerate(request.requests)
+        ]
+        boundary = os.urandom(12).hex()
+        media_type = (
+            f"multipart/mixed; boundary={boundary}"
+            if stream_type == "multipart/mixed"
+            else stream_type
+        )
+        def on_close() -> None:
+            # Only left to do if the client went away before the stream started
+            if not ticket.released:
+                for task in item_tasks:
+                    task.cancel()
+                ticket.release()
+                finish_trace(trace, CLIENT_CLOSED_REQUEST)
+
+        return GuardedStreamingResponse(
+            stream_batch_results(item_tasks, stream_type, boundary, ticket, trace),
+            on_close,
+            media_type=media_type,
+            headers={"X-Trace-Id": trace.id},
+        )
 
-    # Process all requests concurrently (limited by semaphore)
+    # Submit all requests at once so the scheduler can fuse them into batches;
+    # each item records its own trace and forwards its spans to this one
     tasks = [process_single_tts(req) for req in request.requests]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
+    try:
+        results = await unless_disconnected(
+            raw_request, asyncio.gather(*tasks, return_exceptions=True)
+        )
+    except ClientDisconnected:
+        finish_trace(trace, CLIENT_CLOSED_REQUEST)
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    finally:
+        ticket.release()
 
     # Process results
     batch_results = []
@@ -610,19 +4988,205 @@ async def batch_tts(request: BatchTTSRequest):
             else:
                 failed_count += 1
 
-    return BatchTTSResponse(
+    finish_trace(trace, 200)
+    response = BatchTTSResponse(
         results=batch_results,
         completed_count=completed_count,
         failed_count=failed_count,
     )
+    return JSONResponse(response.model_dump(), headers=trace.headers())
+
+
+@app.post("/v1/jobs", status_code=202)
+async def create_job(request: JobRequest):
+    """
+    Submit a synthesis job.
+    Returns immediately with the job id; poll GET /v1/jobs/{id} for progress.
+    """
+    if not request.text:
+        raise HTTPException(status_code=400, detail="Text is required")
+    if request.speaker not in SPEAKERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid speaker. Available: {', '.join(SPEAKERS)}",
+        )
+    if request.language not in LANGUAGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid language. Available: {', '.join(LANGUAGES)}",
+        )
+    try:
+        fmt = check_format(request.response_format)
+        if request.callback_url:
+            check_callback_url(request.callback_url)
+    except (UnsupportedFormat, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    job_request = request.model_dump(exclude={"priority"})
+    job_request["response_format"] = fmt
+    segments_total = len(text_segments(request.text, request.language)) or 1
+    job_id = await _job_queue.submit(job_request, request.priority, segments_total)
+    return job_status(await _job_queue.get(job_id))
+
+
+@app.get("/v1/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Job status and progress (segments done / total)."""
+    job = await _job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_status(job)
+
+
+@app.get("/v1/jobs/{job_id}/audio")
+async def get_job_audio(job_id: str):
+    """Audio of a completed job."""
+    job = await _job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+
+    request = json.loads(job["request"])
+    fmt = request["response_format"]
+    path = _job_queue.store.result_path(job_id, fmt)
+    RESPONSE_BYTES.observe(
+        os.path.getsize(path),
+        endpoint="/v1/jobs",
+        speaker=request["speaker"],
+        language=request["language"],
+        format=fmt,
+    )
+    return FileResponse(
+        path,
+        media_type=media_type_for(fmt),
+        filename=f"{job_id}.{fmt}",
+    )
+
+
+@app.delete("/v1/jobs/{job_id}")
+async def delete_job(job_id: str):
+    """Cancel a queued job or delete a finished one and its audio."""
+    job = await _job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not await _job_queue.delete(job_id):
+        raise HTTPException(status_code=409, detail="Job is running")
+    return {"id": job_id, "deleted": True}
+
+
+async def ndjson_lines(raw_request: Request) -> AsyncGenerator[bytes, None]:
+    """
+    Lines of a streamed request body, without holding the whole body. Only
+    the current line is buffered, up to BULK_MAX_LINE_BYTES (else 413).
+    """
+    pending = bytearray()
+    async for chunk in raw_request.stream():
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            pending += chunk[start:] if end < 0 else chunk[start:end]
+            if len(pending) > BULK_MAX_LINE_BYTES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Bulk lines are limited to {BULK_MAX_LINE_BYTES} bytes",
+                )
+            if end < 0:
+                break
+            yield bytes(pending)
+            pending.clear()
+            start = end + 1
+    if pending:
+        yield bytes(pending)
+
+
+@app.post("/v1/bulk", status_code=202)
+async def create_bulk(raw_request: Request):
+    """
+    Submit a bulk rendering run.
+
+    The body is NDJSON, one /tts/batch item per line plus an optional "id"
+    naming its file in the archive. Returns once the upload is stored; poll
+    GET /v1/bulk/{id} for progress and throughput.
+    """
+    status = await _bulk_runner.ingest(ndjson_lines(raw_request))
+    return bulk_status(status)
+
+
+@app.get("/v1/bulk/{bulk_id}")
+async def get_bulk(bulk_id: str):
+    """Bulk progress, item errors and throughput."""
+    status = _bulk_runner.get(bulk_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Bulk not found")
+    return bulk_status(status)
+
+
+@app.get("/v1/bulk/{bulk_id}/archive")
+async def get_bulk_archive(bulk_id: str):
+    """Zip of a completed bulk's audio plus manifest.jsonl (index, name, file, duration or error)."""
+    status = _bulk_runner.get(bulk_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Bulk not found")
+    if status["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Bulk is {status['status']}")
+    return FileResponse(
+        _bulk_runner.store.path(bulk_id, "results.zip"),
+        media_type="application/zip",
+        filename=f"{bulk_id}.zip",
+    )
+
+
+@app.delete("/v1/bulk/{bulk_id}")
+async def delete_bulk(bulk_id: str):
+    """Cancel a bulk and delete its results."""
+    if _bulk_runner.get(bulk_id) is None:
+        raise HTTPException(status_code=404, detail="Bulk not found")
+    _bulk_runner.delete(bulk_id)
+    return {"id": bulk_id, "deleted": True}
 
 
 # ============ Main ============
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Qwen TTS API server")
+    parser.add_argument("--host", type=str, default="0.0.0.0", help="Bind address")
+    parser.add_argument("--port", type=int, default=8000, help="Bind port")
+    parser.add_argument(
+        "--model-workers",
+        type=int,
+        default=MODEL_WORKERS,
+        help="Model worker processes, one replica each (0 = in-process)",
+    )
+    parser.add_argument(
+        "--precision",
+        choices=PRECISIONS,
+        default=MODEL_PRECISION,
+        help="Model loading mode (see TTS_PRECISION)",
+    )
+    parser.add_argument(
+        "--compile",
+        action="store_true",
+        default=MODEL_COMPILE,
+        help="torch.compile the talker's forward pass",
+    )
+    args = parser.parse_args()
+
+    # Worker processes read the loading mode from the environment
+    MODEL_PRECISION = args.precision
+    MODEL_COMPILE = args.compile
+    os.environ["TTS_PRECISION"] = MODEL_PRECISION
+    os.environ["TTS_COMPILE"] = "1" if MODEL_COMPILE else "0"
+
+    if args.model_workers != MODEL_WORKERS:
+        _executor = create_executor(args.model_workers)
+        _scheduler.executor = _executor
+
     uvicorn.run(
         app,
-        host="0.0.0.0",
-        port=8000,
+        host=args.host,
+        port=args.port,
         reload=False,
     )
@@ -0,0 +1,99 @@
+"""
+Model setup shared by the server (main.py) and the offline runner
+(scripts/run_tts.py): device and precision choice, post-load optimization,
+and placement of model replicas on devices and CPU cores.
+"""
+
+import os
+from typing import Any, List, Optional, Tuple
+
+
+def get_device() -> str:
+    """Determine the best available device (TTS_DEVICE overrides)."""
+    if os.environ.get("TTS_DEVICE"):
+        return os.environ["TTS_DEVICE"]
+
+    import torch
+
+    if torch.cuda.is_available():
+        return "cuda"
+    elif hasattr(torch.backends, "mps") and torch.backends.mps.is_available():
+        return "mps"
+    else:
+        return "cpu"
+
+
+# Loading modes: "auto" (float16, float32 on the CPU fallback), "fp32",
+# "fp16", "bf16" or "int8" (dynamic int8 quantization of linear layers,
+# CPU only).
+PRECISIONS = ("auto", "fp32", "fp16", "bf16", "int8")
+
+
+def model_dtype(precision: str, fallback: bool = False) -> Any:
+    """Weight dtype for a loading mode (fallback: the CPU retry after a failed load)."""
+    import torch
+
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision {precision!r}; choose from {', '.join(PRECISIONS)}")
+    if precision == "bf16":
+        return torch.bfloat16
+    if precision in ("auto", "fp16") and not fallback:
+        return torch.float16
+    return torch.float32
+
+
+def optimize_model(model: Any, precision: str, compile_model: bool) -> None:
+    """Quantize and/or compile a loaded model in place."""
+    import torch
+
+    module = getattr(model, "model", None)
+    if not isinstance(module, torch.nn.Module):
+        if precision == "int8" or compile_model:
+            raise RuntimeError("Model does not expose its torch module")
+        return
+
+    if precision == "int8":
+        torch.ao.quantization.quantize_dynamic(
+            module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+    if compile_model:
+        target = getattr(module, "talker", None) or module
+        target.forward = torch.compile(target.forward, dynamic=True)
+
+
+def parse_core_set(spec: str) -> List[int]:
+    """Parse a core list like "0-3,8,10-11"."""
+    cores = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        cores.extend(range(int(start), int(end or start) + 1))
+    return cores
+
+
+def plan_worker_placement(
+    workers: int, devices_spec: str, cores_spec: str
+) -> List[Tuple[Optional[str], List[int]]]:
+    """Decide the (device, cores) each worker process runs on."""
+    devices = [d.strip() for d in devices_spec.split(",") if d.strip()]
+    core_sets = [parse_core_set(c) for c in cores_spec.split(";") if c.strip()]
+
+    if not core_sets and hasattr(os, "sched_getaffinity"):
+        available = sorted(os.sched_getaffinity(0))
+        if len(available) >= workers and all(
+            d == "cpu" for d in devices or ["cpu"]
+        ):
+            per_worker = len(available) // workers
+            core_sets = [
+                available[i * per_worker : (i + 1) * per_worker]
+                for i in range(workers)
+            ]
+
+    placement = []
+    for i in range(workers):
+        device = devices[i % len(devices)] if devices else None
+        cores = core_sets[i % len(core_sets)] if core_sets else []
+        placement.append((device, cores))
+    return placement
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Compare Qwen3 TTS loading modes
+Usage: python bench_precision.py [--modes fp32,bf16,int8,int8+compile] [--device cpu] [--output precision.json]
+
+Each mode (a run_tts.py --precision, optionally "+compile") is loaded in a
+fresh process so its memory is measured alone. Reported per mode: load time,
+peak resident memory, weight bytes, real-time factor (generation time /
+audio time) and similarity to the first mode's output. Generation samples,
+so waveforms cannot be compared sample by sample; similarity is the cosine
+between long-term average log spectra, plus the ratio of durations.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from run_tts import PRECISIONS, load_model  # noqa: E402
+
+TEXTS = [
+    "Hello, this is a short test sentence.",
+    "The quick brown fox jumps over the lazy dog, and then it runs back into the forest.",
+    "Reduced precision should make synthesis faster and smaller without changing how the voice sounds.",
+]
+
+
+def parse_mode(mode):
+    precision, _, option = mode.partition("+")
+    if precision not in PRECISIONS or option not in ("", "compile"):
+        raise ValueError(f"Unknown mode {mode!r}: use <precision>[+compile], precision one of {', '.join(PRECISIONS)}")
+    return precision, option == "compile"
+
+
+def weight_bytes(module):
+    """Bytes of a module's weights, including packed quantized params."""
+
+    def size(value):
+        if isinstance(value, (tuple, list)):
+            return sum(size(v) for v in value)
+        if hasattr(value, "element_size"):
+            return value.numel() * value.element_size()
+        return 0
+
+    return sum(size(v) for v in module.state_dict().values())
+
+
+def measure(mode, device, texts, speaker, language, seed, results):
+    """Child process: load one mode, synthesize texts, report timings and audio."""
+    try:
+        import torch
+
+        precision, compile_model = parse_mode(mode)
+        start = time.time()
+        model = load_model(device, precision, compile_model)
+        load_time = time.time() - start
+
+        # Warm up (and compile) before timing
+        model.generate_custom_voice(text=texts[0], language=language, speaker=speaker)
+
+        outputs = []
+        for text in texts:
+            torch.manual_seed(seed)
+            start = time.time()
+            wavs, sr = model.generate_custom_voice(text=text, language=language, speaker=speaker)
+            elapsed = time.time() - start
+            wav = np.asarray(wavs[0], dtype=np.float32)
+            outputs.append({"seconds": elapsed, "audio_seconds": len(wav) / sr, "wav": wav, "sr": sr})
+
+        result = {
+            "mode": mode,
+            "load_seconds": load_time,
+            # ru_maxrss is in kilobytes on Linux
+            "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+            "weight_bytes": weight_bytes(model.model),
+            "outputs": outputs,
+        }
+        if torch.cuda.is_available() and torch.cuda.max_memory_allocated():
+            result["peak_cuda_bytes"] = torch.cuda.max_memory_allocated()
+        results.put(result)
+    except Exception as e:
+        results.put({"mode": mode, "error": str(e)})
+
+
+def average_log_spectrum(wav, n_fft=1024, hop=256):
+    if len(wav) < n_fft:
+        wav = np.pad(wav, (0, n_fft - len(wav)))
+    frames = np.lib.stride_tricks.sliding_window_view(wav, n_fft)[::hop] * np.hanning(n_fft)
+    return np.log(np.abs(np.fft.rfft(frames, axis=1)).mean(axis=0) + 1e-6)
+
+
+def spectral_similarity(a, b):
+    """Cosine similarity of the mean-removed long-term log spectra of two clips."""
+    x = average_log_spectrum(a)
+    y = average_log_spectrum(b)
+    x, y = x - x.mean(), y - y.mean()
+    return float(np.dot(x, y) / (np.linalg.norm(x) * np.linalg.norm(y) + 1e-12))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Qwen3 TTS loading modes")
+    parser.add_argument("--modes", type=str, default="fp32,bf16,int8",
+                        help="Comma-separated <precision>[+compile]; the first is the reference")
+    parser.add_argument("--device", type=str, default="cpu", help="Device for non-int8 modes")
+    parser.add_argument("--speaker", type=str, default="Ryan", help="Speaker name")
+    parser.add_argument("--language", type=str, default="English", help="Language")
+    parser.add_argument("--text", action="append", default=None, help="Text to synthesize (repeatable)")
+    parser.add_argument("--seed", type=int, default=0, help="Sampling seed per text")
+    parser.add_argument("--output", type=str, default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    try:
+        for mode in modes:
+            parse_mode(mode)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    texts = args.text or TEXTS
+
+    ctx = multiprocessing.get_context("spawn")
+    measured = []
+    for mode in modes:
+        print(f"\n=== {mode} ===")
+        results = ctx.Queue()
+        process = ctx.Process(
+            target=measure,
+            args=(mode, args.device, texts, args.speaker, args.language, args.seed, results),
+        )
+        process.start()
+        result = results.get()
+        process.join()
+        if "error" in result:
+            print(f"Failed: {result['error']}")
+        measured.append(result)
+
+    reference = next((r for r in measured if "error" not in r), None)
+    report = []
+    print(f"\n{'mode':<14} {'load s':>7} {'peak RSS':>9} {'weights':>9} {'RTF':>7} {'similarity':>10} {'duration':>9}")
+    for result in measured:
+        if "error" in result:
+            report.append({"mode": result["mode"], "error": result["error"]})
+            print(f"{result['mode']:<14} failed: {result['error']}")
+            continue
+
+        outputs = result["outputs"]
+        rtf = sum(o["seconds"] for o in outputs) / max(sum(o["audio_seconds"] for o in outputs), 1e-9)
+        pairs = list(zip(outputs, reference["outputs"]))
+        similarity = float(np.mean([spectral_similarity(o["wav"], r["wav"]) for o, r in pairs]))
+        duration_ratio = float(np.mean([o["audio_seconds"] / max(r["audio_seconds"], 1e-9) for o, r in pairs]))
+
+        row = {
+            "mode": result["mode"],
+            "load_seconds": result["load_seconds"],
+            "peak_rss_bytes": result["peak_rss_bytes"],
+            "weight_bytes": result["weight_bytes"],
+            "real_time_factor": rtf,
+            "spectral_similarity": similarity,
+            "duration_ratio": duration_ratio,
+            "per_text": [
+                {"text": text, "seconds": o["seconds"], "audio_seconds": o["audio_seconds"]}
+                for text, o in zip(texts, outputs)
+            ],
+        }
+        if "peak_cuda_bytes" in result:
+            row["peak_cuda_bytes"] = result["peak_cuda_bytes"]
+        report.append(row)
+        print(
+            f"{row['mode']:<14} {row['load_seconds']:7.1f} {row['peak_rss_bytes'] / 2**30:8.2f}G"
+            f" {row['weight_bytes'] / 2**30:8.2f}G {rtf:7.3f} {similarity:10.3f} {duration_ratio:9.2f}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"reference": reference["mode"] if reference else None, "modes": report}, f, indent=2)
+        print(f"\nSaved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
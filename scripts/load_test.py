@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Load generator for the Qwen TTS server
+Usage: python load_test.py --concurrency 8 --duration 60
+       python load_test.py --rps 2 --duration 300 --mix tts:0.5,stream:0.3,batch:0.1,speech:0.1
+       python load_test.py --replay traffic.jsonl --concurrency 4 --output report.json
+
+With --concurrency, N clients each send their next request as soon as the
+previous one finishes (closed loop). With --rps, requests start at the target
+rate (Poisson arrivals) with at most --max-in-flight outstanding; arrivals
+beyond that are counted as dropped, meaning the client could not keep up.
+
+A replay file has one JSON object per line: {"endpoint": "/tts", "body": {...}}.
+Without one, requests are synthesized from --mix, --lengths, --speakers and
+--languages. Every request asks for WAV so the audio duration (and so the
+real-time factor, processing time / audio time) can be measured.
+"""
+
+import argparse
+import base64
+import json
+import random
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ENDPOINTS = {
+    "tts": "/tts",
+    "stream": "/tts/stream",
+    "batch": "/tts/batch",
+    "speech": "/v1/audio/speech",
+}
+
+SENTENCES = {
+    "English": "The quick brown fox jumps over the lazy dog.",
+    "Chinese": "今天天气很好，我们一起去公园散步吧。",
+    "Japanese": "今日はとても良い天気なので、公園を散歩しましょう。",
+    "Korean": "오늘은 날씨가 좋아서 공원에 산책하러 갑시다.",
+    "German": "Der schnelle braune Fuchs springt über den faulen Hund.",
+    "French": "Le renard brun rapide saute par-dessus le chien paresseux.",
+    "Russian": "Быстрая коричневая лиса прыгает через ленивую собаку.",
+    "Portuguese": "A rápida raposa marrom pula sobre o cão preguiçoso.",
+    "Spanish": "El rápido zorro marrón salta sobre el perro perezoso.",
+    "Italian": "La veloce volpe marrone salta sopra il cane pigro.",
+}
+
+
+def parse_weights(spec: str, cast=str) -> list:
+    """Parse "a:0.5,b:0.3,c" into [(a, 0.5), (b, 0.3), (c, 1.0)]."""
+    pairs = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, weight = item.partition(":")
+        pairs.append((cast(name.strip()), float(weight) if weight else 1.0))
+    if not pairs:
+        raise ValueError(f"Empty weight list: {spec!r}")
+    return pairs
+
+
+def choose(rng: random.Random, pairs: list):
+    return rng.choices([name for name, _ in pairs], weights=[w for _, w in pairs])[0]
+
+
+class SyntheticTraffic:
+    """Draws requests from the configured endpoint, length, voice and language mix."""
+
+    def __init__(self, args):
+        self.rng = random.Random(args.seed)
+        self.mix = parse_weights(args.mix)
+        for name, _ in self.mix:
+            if name not in ENDPOINTS:
+                raise ValueError(f"Unknown endpoint {name!r}; choose from {', '.join(ENDPOINTS)}")
+        self.lengths = parse_weights(args.lengths, int)
+        self.speakers = parse_weights(args.speakers)
+        self.languages = parse_weights(args.languages)
+        self.batch_size = args.batch_size
+        self.repeat_ratio = args.repeat_ratio
+        self.recent = []
+        self.count = 0
+
+    def text(self, language: str) -> str:
+        if self.recent and self.rng.random() < self.repeat_ratio:
+            return self.rng.choice(self.recent)
+
+        # Lengths vary ±25% around the drawn bucket; a unique prefix keeps
+        # the server's caches from answering
+        self.count += 1
+        target = int(choose(self.rng, self.lengths) * self.rng.uniform(0.75, 1.25))
+        sentence = SENTENCES.get(language, SENTENCES["English"])
+        text = f"{self.count}. {sentence}"
+        while len(text) + len(sentence) < target:
+            text += " " + sentence
+        self.recent = (self.recent + [text])[-100:]
+        return text
+
+    def item(self) -> dict:
+        language = choose(self.rng, self.languages)
+        return {
+            "text": self.text(language),
+            "speaker": choose(self.rng, self.speakers),
+            "language": language,
+        }
+
+    def next(self) -> tuple:
+        endpoint = ENDPOINTS[choose(self.rng, self.mix)]
+        if endpoint == "/tts/batch":
+            return endpoint, {"requests": [self.item() for _ in range(self.batch_size)]}
+        item = self.item()
+        if endpoint == "/v1/audio/speech":
+            return endpoint, {"input": item["text"], "voice": item["speaker"]}
+        return endpoint, item
+
+
+class ReplayTraffic:
+    """Cycles through recorded requests from a JSONL file."""
+
+    def __init__(self, path: str):
+        self.entries = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.entries.append((entry["endpoint"], entry["body"]))
+        if not self.entries:
+            raise ValueError(f"No requests in {path}")
+        self.position = 0
+
+    def next(self) -> tuple:
+        entry = self.entries[self.position % len(self.entries)]
+        self.position += 1
+        return entry
+
+
+def force_wav(endpoint: str, body: dict) -> dict:
+    body = dict(body)
+    if endpoint == "/tts/batch":
+        body["requests"] = [dict(item, response_format="wav") for item in body["requests"]]
+    else:
+        body["response_format"] = "wav"
+    return body
+
+
+def wav_seconds(data: bytes) -> float:
+    """Duration of 16-bit mono WAV bytes (a streamed WAV has no length in its header)."""
+    if len(data) < 44:
+        return 0.0
+    sample_rate = struct.unpack("<I", data[24:28])[0]
+    return (len(data) - 44) / 2 / sample_rate if sample_rate else 0.0
+
+
+def send(session: requests.Session, url: str, endpoint: str, body: dict, timeout: float) -> dict:
+    """Send one request and measure it."""
+    record = {"endpoint": endpoint, "start": time.time()}
+    start = time.perf_counter()
+    ttfb = None
+    try:
+        with session.post(url + endpoint, json=body, stream=True, timeout=timeout) as r:
+            chunks = []
+            for chunk in r.iter_content(chunk_size=None):
+                if ttfb is None:
+                    ttfb = time.perf_counter() - start
+                chunks.append(chunk)
+            latency = time.perf_counter() - start
+            data = b"".join(chunks)
+            record["status"] = r.status_code
+    except requests.RequestException as e:
+        record.update(status=None, error=type(e).__name__, latency=time.perf_counter() - start)
+        return record
+
+    record.update(latency=latency, ttfb=ttfb if ttfb is not None else latency)
+    if record["status"] != 200:
+        record["error"] = data[:200].decode("utf-8", "replace")
+        return record
+
+    if endpoint == "/tts/batch":
+        result = json.loads(data)
+        record["audio_seconds"] = sum(
+            wav_seconds(base64.b64decode(item["audio"])) for item in result["results"] if item["success"]
+        )
+        record["item_errors"] = result["failed_count"]
+    else:
+        record["audio_seconds"] = wav_seconds(data)
+    return record
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def at(q):
+        return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+    return {
+        "mean": sum(values) / len(values),
+        "p50": at(50),
+        "p90": at(90),
+        "p99": at(99),
+        "max": values[-1],
+    }
+
+
+def summarize(records: list, elapsed: float, dropped: int = 0) -> dict:
+    ok = [r for r in records if r.get("status") == 200]
+    errors = {}
+    for r in records:
+        if r.get("status") != 200:
+            key = str(r.get("status") or r.get("error"))
+            errors[key] = errors.get(key, 0) + 1
+
+    audio_seconds = sum(r.get("audio_seconds", 0.0) for r in ok)
+    return {
+        "requests": len(records),
+        "succeeded": len(ok),
+        "errors": errors,
+        "error_rate": (len(records) - len(ok)) / len(records) if records else 0.0,
+        "item_errors": sum(r.get("item_errors", 0) for r in ok),
+        "dropped": dropped,
+        "throughput_rps": len(ok) / elapsed if elapsed else 0.0,
+        "audio_seconds_per_second": audio_seconds / elapsed if elapsed else 0.0,
+        "latency_s": percentiles([r["latency"] for r in ok]),
+        "ttfb_s": percentiles([r["ttfb"] for r in ok]),
+        "rtf": percentiles([r["latency"] / r["audio_seconds"] for r in ok if r.get("audio_seconds")]),
+    }
+
+
+def print_summary(name: str, summary: dict) -> None:
+    print(f"\n{name}: {summary['succeeded']}/{summary['requests']} ok", end="")
+    if summary["errors"]:
+        print(f", errors {summary['errors']}", end="")
+    if summary["item_errors"]:
+        print(f", failed batch items {summary['item_errors']}", end="")
+    if summary["dropped"]:
+        print(f", dropped {summary['dropped']}", end="")
+    print(
+        f"\n  throughput {summary['throughput_rps']:.2f} req/s,"
+        f" {summary['audio_seconds_per_second']:.2f} audio s/s"
+    )
+    for label, key, scale, unit in (
+        ("latency", "latency_s", 1000, "ms"),
+        ("ttfb", "ttfb_s", 1000, "ms"),
+        ("rtf", "rtf", 1, ""),
+    ):
+        stats = summary[key]
+        if stats:
+            print(
+                f"  {label:<8}"
+                + "".join(f"  {q} {stats[q] * scale:8.2f}{unit}" for q in ("p50", "p90", "p99", "max"))
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Qwen TTS load generator")
+    parser.add_argument("--url", type=str, default="http://localhost:8000", help="Server base URL")
+    parser.add_argument("--concurrency", type=int, default=4, help="Closed-loop clients (ignored with --rps)")
+    parser.add_argument("--rps", type=float, default=None, help="Target request rate (open loop)")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="Outstanding request cap with --rps")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds to send requests")
+    parser.add_argument("--requests", type=int, default=None, help="Stop after this many requests")
+    parser.add_argument("--replay", type=str, default=None, help="JSONL file of recorded requests")
+    parser.add_argument("--mix", type=str, default="tts:0.5,stream:0.3,batch:0.1,speech:0.1",
+                        help="Endpoint weights (tts, stream, batch, speech)")
+    parser.add_argument("--lengths", type=str, default="40:0.4,150:0.4,600:0.2",
+                        help="Text length buckets in characters with weights")
+    parser.add_argument("--speakers", type=str, default="Ryan:0.5,Vivian:0.3,Serena:0.2", help="Speaker weights")
+    parser.add_argument("--languages", type=str, default="English:0.7,Chinese:0.2,Spanish:0.1",
+                        help="Language weights")
+    parser.add_argument("--batch-size", type=int, default=4, help="Items per /tts/batch request")
+    parser.add_argument("--repeat-ratio", type=float, default=0.0,
+                        help="Fraction of requests repeating a recent text (cache hits)")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic mix")
+    parser.add_argument("--output", type=str, default=None, help="Write the report (and raw records) as JSON")
+
+    args = parser.parse_args()
+
+    try:
+        traffic = ReplayTraffic(args.replay) if args.replay else SyntheticTraffic(args)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    records = []
+    lock = threading.Lock()
+    sent = 0
+    dropped = 0
+    deadline = time.perf_counter() + args.duration
+
+    def take():
+        """Next request to send, or None when the run is over."""
+        nonlocal sent
+        with lock:
+            if time.perf_counter() >= deadline or (args.requests is not None and sent >= args.requests):
+                return None
+            sent += 1
+            endpoint, body = traffic.next()
+        return endpoint, force_wav(endpoint, body)
+
+    local = threading.local()
+
+    def run(request):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        record = send(local.session, args.url, *request, args.timeout)
+        with lock:
+            records.append(record)
+
+    mode = f"{args.rps:g} req/s" if args.rps else f"{args.concurrency} clients"
+    print(f"Load test against {args.url}: {mode} for up to {args.duration:g}s")
+    started = time.perf_counter()
+
+    if args.rps:
+        rng = random.Random(args.seed + 1)
+        in_flight = threading.BoundedSemaphore(args.max_in_flight)
+
+        def run_and_release(request):
+            try:
+                run(request)
+            finally:
+                in_flight.release()
+
+        with ThreadPoolExecutor(max_workers=args.max_in_flight) as pool:
+            next_start = time.perf_counter()
+            while True:
+                next_start += rng.expovariate(args.rps)
+                time.sleep(max(0.0, next_start - time.perf_counter()))
+                request = take()
+                if request is None:
+                    break
+                if not in_flight.acquire(blocking=False):
+                    dropped += 1
+                    continue
+                pool.submit(run_and_release, request)
+    else:
+
+        def client():
+            while (request := take()) is not None:
+                run(request)
+
+        threads = [threading.Thread(target=client) for _ in range(args.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    elapsed = time.perf_counter() - started
+
+    report = {"config": vars(args), "elapsed_s": elapsed, "overall": summarize(records, elapsed, dropped)}
+    report["endpoints"] = {
+        endpoint: summarize([r for r in records if r["endpoint"] == endpoint], elapsed)
+        for endpoint in sorted({r["endpoint"] for r in records})
+    }
+
+    print(f"\nRan {elapsed:.1f}s")
+    print_summary("Overall", report["overall"])
+    for endpoint, summary in report["endpoints"].items():
+        print_summary(endpoint, summary)
+
+    if args.output:
+        report["records"] = records
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,75 +2,399 @@
 """
 Qwen3 TTS Runner
 Usage: python run_tts.py --text "Hello world" --output hello.wav [--speaker Ryan] [--language English]
+       python run_tts.py --manifest lines.jsonl [--output-dir out/] [--batch-size 8]
+       python run_tts.py --manifest lines.jsonl --workers 4 [--devices cuda:0,cuda:1] [--cores "0-15;16-31"]
+
+A manifest is JSONL or CSV (by extension) with one item per line/row:
+text, and optionally output, speaker, language and instruct (defaulting to
+--speaker/--language/--instruct; output to <output-dir>/<line number>.wav).
+The model is loaded once, items sharing speaker/language/instruct are
+generated in batches, and files are written by a background thread.
+Items whose output already exists are skipped, so an interrupted run can
+simply be restarted (--overwrite renders everything again).
+
+With --workers N the manifest is rendered by N processes, each holding its
+own model replica on its --devices entry (round robin) and --cores set
+(";"-separated; CPU-only runs split the available cores evenly by default).
+Batches are handed out longest first from one shared queue, so a worker
+that finishes early takes the next batch instead of idling behind a fixed
+shard of long texts.
 """
 
 import argparse
+import csv
+import json
+import multiprocessing
 import os
+import queue
 import sys
+import threading
 import time
 
-def get_device():
-    """Determine the best available device."""
-    import torch
-    if torch.cuda.is_available():
-        return "cuda"
-    elif hasattr(torch.backends, 'mps') and torch.backends.mps.is_available():
-        return "mps"
-    else:
-        return "cpu"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from model_setup import PRECISIONS, get_device, model_dtype, optimize_model, plan_worker_placement  # noqa: E402
+
+
+def load_model(device, precision="auto", compile_model=False):
+    """
+    Load Qwen3-TTS on device ("auto" picks one), falling back to the CPU.
+
+    precision "auto" is float16 (float32 on the CPU fallback); "int8" loads
+    float32 on the CPU and quantizes the linear layers.
+    """
+    from qwen_tts import Qwen3TTSModel
+
+    if precision == "int8":
+        device = "cpu"
+    elif device == "auto":
+        device = get_device()
+    print(f"Using device: {device} (precision {precision})")
+
+    try:
+        model = Qwen3TTSModel.from_pretrained(
+            "Qwen/Qwen3-TTS-12Hz-1.7B-CustomVoice",
+            device_map=device,
+            dtype=model_dtype(precision),
+        )
+    except Exception as e:
+        print(f"Error loading model: {e}")
+        print("Trying with CPU fallback...")
+        model = Qwen3TTSModel.from_pretrained(
+            "Qwen/Qwen3-TTS-12Hz-1.7B-CustomVoice",
+            device_map="cpu",
+            dtype=model_dtype(precision, fallback=True),
+        )
+    optimize_model(model, precision, compile_model)
+    return model
+
+
+def read_manifest(path, args):
+    """Load manifest items, filling in defaults and output paths."""
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    output_dir = args.output_dir or os.path.dirname(os.path.abspath(path))
+    items = []
+    for number, row in enumerate(rows, 1):
+        text = (row.get("text") or "").strip()
+        if not text:
+            print(f"Skipping manifest item {number}: no text")
+            continue
+        output = row.get("output") or f"{number:06d}.wav"
+        items.append({
+            "number": number,
+            "text": text,
+            "speaker": row.get("speaker") or args.speaker,
+            "language": row.get("language") or args.language,
+            "instruct": row.get("instruct") or args.instruct or None,
+            "output": output if os.path.isabs(output) else os.path.join(output_dir, output),
+        })
+    return items
+
+
+def plan_batches(items, batch_size):
+    """
+    Group items sharing speaker/language/instruct into batches of similar
+    text length, so little of each batch is padding.
+    """
+    groups = {}
+    for item in items:
+        groups.setdefault((item["speaker"], item["language"], item["instruct"]), []).append(item)
+
+    batches = []
+    for group in groups.values():
+        group.sort(key=lambda item: len(item["text"]))
+        batches.extend(group[i:i + batch_size] for i in range(0, len(group), batch_size))
+    return batches
+
+
+class OutputWriter:
+    """Writes generated audio on a background thread while the model keeps generating."""
+
+    def __init__(self, max_pending=64):
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.errors = []
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def write(self, path, wav, sr):
+        self.queue.put((path, wav, sr))
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def _run(self):
+        import soundfile as sf
+
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            path, wav, sr = job
+            try:
+                output_dir = os.path.dirname(path)
+                if output_dir:
+                    os.makedirs(output_dir, exist_ok=True)
+                # Write under a temporary name so a resumed run never sees a partial file
+                ext = os.path.splitext(path)[1]
+                tmp = path[:len(path) - len(ext)] + ".part" + ext
+                sf.write(tmp, wav, sr)
+                os.replace(tmp, path)
+            except Exception as e:
+                self.errors.append((path, str(e)))
+                print(f"Error writing {path}: {e}")
+
+
+def render_batch(model, batch, writer):
+    """Generate one batch and queue its files; returns seconds of audio."""
+    first = batch[0]
+    wavs, sr = model.generate_custom_voice(
+        text=[item["text"] for item in batch],
+        language=first["language"],
+        speaker=first["speaker"],
+        instruct=first["instruct"],
+    )
+    audio_seconds = 0.0
+    for item, wav in zip(batch, wavs):
+        writer.write(item["output"], wav, sr)
+        audio_seconds += len(wav) / sr
+    return audio_seconds
+
+
+class Progress:
+    """Aggregate progress and throughput of a manifest run."""
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.audio_seconds = 0.0
+        self.start = time.time()
+
+    def update(self, done=0, failed=0, audio_seconds=0.0, note=""):
+        self.done += done
+        self.failed += failed
+        self.audio_seconds += audio_seconds
+        elapsed = time.time() - self.start
+        finished = self.done + self.failed
+        bar = "#" * (30 * finished // self.total) if self.total else ""
+        print(
+            f"[{bar:<30}] {finished}/{self.total}  {self.done / elapsed:.2f} items/s,"
+            f" {self.audio_seconds / elapsed:.2f} audio s/s{note}"
+        )
+
+    def report(self):
+        elapsed = time.time() - self.start
+        print(f"\nRendered {self.done} items ({self.audio_seconds:.1f}s of audio) in {elapsed:.2f}s")
+        print(f"Throughput: {self.done / elapsed:.2f} items/s, {self.audio_seconds / elapsed:.2f} audio s/s"
+              f" (RTF {elapsed / self.audio_seconds if self.audio_seconds else 0:.3f})")
+        if self.failed:
+            print(f"Failed: {self.failed} items (rerun to retry them)")
+
+
+def pending_items(args):
+    """Manifest items still to render."""
+    items = read_manifest(args.manifest, args)
+    pending = items if args.overwrite else [item for item in items if not os.path.exists(item["output"])]
+    print(f"Manifest: {len(items)} items, {len(items) - len(pending)} already rendered, {len(pending)} to go")
+    return pending
+
+
+def run_manifest(model, args):
+    """Render every pending manifest item; returns the number of failures."""
+    pending = pending_items(args)
+    if not pending:
+        return 0
+
+    writer = OutputWriter()
+    progress = Progress(len(pending))
+
+    for batch in plan_batches(pending, args.batch_size):
+        try:
+            progress.update(done=len(batch), audio_seconds=render_batch(model, batch, writer))
+        except Exception as e:
+            print(f"Error generating items {[item['number'] for item in batch]}: {e}")
+            progress.update(failed=len(batch))
+
+    writer.close()
+    progress.done -= len(writer.errors)
+    progress.failed += len(writer.errors)
+    progress.report()
+    return progress.failed
+
+
+def worker_main(index, device, cores, precision, compile_model, tasks, results):
+    """Worker process: load a model replica, then render batches from the shared queue."""
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    try:
+        import torch
+
+        if cores:
+            torch.set_num_threads(len(cores))
+        model = load_model(device, precision, compile_model)
+    except Exception as e:
+        results.put(("failed", index, str(e)))
+        return
+    results.put(("ready", index, None))
+
+    writer = OutputWriter()
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        number, batch = task
+        results.put(("taken", index, number))
+        try:
+            results.put(("done", index, (number, render_batch(model, batch, writer))))
+        except Exception as e:
+            results.put(("error", index, (number, str(e))))
+    writer.close()
+    results.put(("exit", index, [path for path, _ in writer.errors]))
+
+
+def run_manifest_parallel(args):
+    """Render the manifest with --workers model replicas; returns the number of failures."""
+    pending = pending_items(args)
+    if not pending:
+        return 0
+
+    # Longest batches first: the stragglers at the end of the run are short
+    batches = plan_batches(pending, args.batch_size)
+    batches.sort(key=lambda batch: -sum(len(item["text"]) for item in batch))
+
+    placement = plan_worker_placement(args.workers, args.devices or args.device, args.cores)
+    ctx = multiprocessing.get_context("spawn")
+    tasks = ctx.Queue()
+    results = ctx.Queue()
+    for task in enumerate(batches):
+        tasks.put(task)
+    for _ in placement:
+        tasks.put(None)
+
+    workers = []
+    for index, (device, cores) in enumerate(placement):
+        print(f"Worker {index}: device {device}" + (f", cores {cores[0]}-{cores[-1]}" if cores else ""))
+        process = ctx.Process(
+            target=worker_main,
+            args=(index, device, cores, args.precision, args.compile, tasks, results),
+            daemon=True,
+        )
+        process.start()
+        workers.append(process)
+
+    progress = Progress(len(pending))
+    running = {}  # worker index -> batch number
+    exited = set()
+    per_worker = [0] * len(workers)
+
+    while len(exited) < len(workers):
+        try:
+            kind, index, value = results.get(timeout=1.0)
+        except queue.Empty:
+            # A worker that died without saying goodbye loses its current batch
+            for index, process in enumerate(workers):
+                if index not in exited and not process.is_alive():
+                    exited.add(index)
+                    number = running.pop(index, None)
+                    print(f"Worker {index} died (exit code {process.exitcode})")
+                    if number is not None:
+                        progress.update(failed=len(batches[number]))
+            continue
+
+        if kind == "ready":
+            print(f"Worker {index} ready")
+        elif kind == "failed":
+            print(f"Worker {index} failed to load the model: {value}")
+            exited.add(index)
+        elif kind == "taken":
+            running[index] = value
+        elif kind == "done":
+            number, audio_seconds = value
+            running.pop(index, None)
+            per_worker[index] += len(batches[number])
+            progress.update(done=len(batches[number]), audio_seconds=audio_seconds, note=f"  (worker {index})")
+        elif kind == "error":
+            number, error = value
+            running.pop(index, None)
+            batch = batches[number]
+            print(f"Worker {index}: error generating items {[item['number'] for item in batch]}: {error}")
+            progress.update(failed=len(batch))
+        elif kind == "exit":
+            exited.add(index)
+            progress.done -= len(value)
+            progress.failed += len(value)
+
+    for process in workers:
+        process.join(timeout=5)
+
+    # Workers that could not load a model leave their share of the queue behind
+    leftover = 0
+    while True:
+        try:
+            task = tasks.get_nowait()
+        except queue.Empty:
+            break
+        if task is not None:
+            leftover += len(task[1])
+    if leftover:
+        progress.update(failed=leftover)
+
+    progress.report()
+    print("Items per worker: " + ", ".join(f"{i}: {n}" for i, n in enumerate(per_worker)))
+    return progress.failed
+
 
 def main():
     parser = argparse.ArgumentParser(description="Qwen3 TTS - Text to Speech")
-    parser.add_argument("--text", type=str, required=True, help="Text to synthesize")
+    parser.add_argument("--text", type=str, default=None, help="Text to synthesize")
     parser.add_argument("--output", type=str, default="output.wav", help="Output audio file")
+    parser.add_argument("--manifest", type=str, default=None, help="JSONL/CSV manifest of items to render")
+    parser.add_argument("--output-dir", type=str, default=None,
+                        help="Directory for relative manifest outputs (default: next to the manifest)")
+    parser.add_argument("--batch-size", type=int, default=8, help="Manifest items per generation call")
+    parser.add_argument("--overwrite", action="store_true", help="Re-render manifest items whose output exists")
+    parser.add_argument("--workers", type=int, default=1, help="Model replicas rendering the manifest in parallel")
+    parser.add_argument("--devices", type=str, default="", help="Comma-separated devices for --workers (round robin)")
+    parser.add_argument("--cores", type=str, default="",
+                        help="CPU core sets for --workers, e.g. \"0-15;16-31\"")
     parser.add_argument("--speaker", type=str, default="Ryan", help="Speaker name")
     parser.add_argument("--language", type=str, default="English", help="Language")
     parser.add_argument("--instruct", type=str, default="", help="Style instruction")
     parser.add_argument("--list-speakers", action="store_true", help="List available speakers")
     parser.add_argument("--device", type=str, default="auto", help="Device: auto, cpu, mps, cuda")
+    parser.add_argument("--precision", choices=PRECISIONS, default="auto",
+                        help="Weights: auto (fp16, fp32 on CPU fallback), fp32, fp16, bf16, int8 (CPU)")
+    parser.add_argument("--compile", action="store_true", help="torch.compile the talker's forward pass")
     
     args = parser.parse_args()
+    if not (args.text or args.manifest or args.list_speakers):
+        parser.error("one of --text, --manifest or --list-speakers is required")
     
-    # Handle auto device selection
-    if args.device == "auto":
-        import torch
-        if torch.cuda.is_available():
-            device = "cuda"
-        elif hasattr(torch.backends, 'mps') and torch.backends.mps.is_available():
-            device = "mps"
-        else:
-            device = "cpu"
-    else:
-        device = args.device
-    print(f"Using device: {device}")
-    
-    # Import here to show clear error if not installed
+    # Import here to show clear error if not installed; the model itself is
+    # loaded by load_model (in each worker process with --workers)
     try:
-        import torch
         import soundfile as sf
-        from qwen_tts import Qwen3TTSModel
+        import qwen_tts  # noqa: F401 (dependency check only)
     except ImportError as e:
         print(f"Error: Missing dependency - {e}")
         print("Please install: pip install -r requirements.txt")
         sys.exit(1)
     
+    if args.manifest and args.workers > 1:
+        if args.device == "auto" and not args.devices:
+            args.device = get_device()
+        sys.exit(1 if run_manifest_parallel(args) else 0)
+    
     print("Loading model...")
     start_load = time.time()
     
-    try:
-        model = Qwen3TTSModel.from_pretrained(
-            "Qwen/Qwen3-TTS-12Hz-1.7B-CustomVoice",
-            device_map=device,
-            dtype=torch.float16,
-        )
-    except Exception as e:
-        print(f"Error loading model: {e}")
-        print("Trying with CPU fallback...")
-        model = Qwen3TTSModel.from_pretrained(
-            "Qwen/Qwen3-TTS-12Hz-1.7B-CustomVoice",
-            device_map="cpu",
-            dtype=torch.float32,
-        )
+    model = load_model(args.device, args.precision, args.compile)
     
     load_time = time.time() - start_load
     print(f"Model loaded in {load_time:.2f}s")
@@ -84,6 +408,9 @@ def main():
             print(f"  - {lang}")
         return
     
+    if args.manifest:
+        sys.exit(1 if run_manifest(model, args) else 0)
+    
     print(f"Generating speech for: '{args.text}'")
     print(f"Speaker: {args.speaker}, Language: {args.language}")
     
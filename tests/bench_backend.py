@@ -0,0 +1,554 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Qwen TTS backend that do not need the model.
+
+Micro-benchmarks time process_audio and the encoders; endpoint benchmarks
+serve the real app with load_model swapped for a deterministic FakeModel,
+so they measure everything but the model (scheduling, DSP, encoding, HTTP).
+Compare two runs with --compare:
+
+    python tests/bench_backend.py --output before.json
+    python tests/bench_backend.py --output after.json --compare before.json
+"""
+
+import argparse
+import asyncio
+import functools
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+# Every request must reach the (fake) model, and jobs must not touch the repo
+os.environ.setdefault("TTS_CACHE_MAX_BYTES", "0")
+os.environ.setdefault("TTS_SEGMENT_CACHE_MAX_BYTES", "0")
+os.environ.setdefault("TTS_JOBS_DIR", os.path.join(tempfile.gettempdir(), "tts-bench-jobs"))
+# Seed admission control near the fake model's cost instead of the real one's
+os.environ.setdefault("TTS_SECONDS_PER_CHAR", "0.002")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import main  # noqa: E402
+
+SAMPLE_RATE = 24000
+
+SENTENCES = [
+    "The quick brown fox jumps over the lazy dog.",
+    "Benchmarks should measure the code, not the model.",
+    "Streaming audio starts playing before the whole text is synthesized.",
+    "A short one.",
+    "Latency percentiles tell you more than averages ever will, especially under load.",
+    "Each request in this run carries a slightly different text.",
+]
+
+ENDPOINTS = ["/tts", "/tts/stream", "/tts/batch", "/v1/audio/speech"]
+BATCH_ITEMS = 4
+
+
+def speech_like(seconds: float, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """Deterministic voiced signal: a gliding harmonic stack with syllable-rate AM."""
+    t = np.arange(int(seconds * sr)) / sr
+    f0 = 120 + 30 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    wav = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t)
+    return (0.2 * wav * envelope).astype(np.float32)
+
+
+class FakeModel:
+    """
+    Deterministic stand-in for Qwen3TTSModel.
+
+    A call sleeps latency_ms plus ms_per_char for its longest text, since
+    every item is padded to that length, and returns speech_like audio of
+    seconds_per_char per input character. padding_cost is the extra cost of
+    each further item in the batch as a fraction of the first: 0 when the
+    device runs the batch fully in parallel, 1 when it computes every padded
+    item in turn (a saturated CPU).
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 50.0,
+        ms_per_char: float = 1.0,
+        seconds_per_char: float = 0.06,
+        padding_cost: float = 0.0,
+    ):
+        self.latency_ms = latency_ms
+        self.ms_per_char = ms_per_char
+        self.seconds_per_char = seconds_per_char
+        self.padding_cost = padding_cost
+        self.calls = 0
+        self.items = 0
+
+    @functools.lru_cache(maxsize=256)
+    def _audio(self, chars: int) -> np.ndarray:
+        return speech_like(max(chars * self.seconds_per_char, 0.1))
+
+    def generate_custom_voice(self, text, language=None, speaker=None, instruct=None, **kwargs):
+        texts = text if isinstance(text, list) else [text]
+        self.calls += 1
+        self.items += len(texts)
+        padded = self.ms_per_char * max(len(t) for t in texts) * (1 + self.padding_cost * (len(texts) - 1))
+        time.sleep((self.latency_ms + padded) / 1000)
+        return [self._audio(len(t)).copy() for t in texts], SAMPLE_RATE
+
+    def get_supported_speakers(self):
+        return list(main.SPEAKERS)
+
+    def get_supported_languages(self):
+        return list(main.LANGUAGES)
+
+
+def install_fake_model(model: FakeModel) -> None:
+    """Make the backend serve model instead of loading Qwen3-TTS."""
+    main.load_model = lambda: model
+    main._model = model
+    main._model_loaded = True
+
+
+def best_of(fn, repeat: int) -> float:
+    """Best wall time of repeat runs, in seconds."""
+    fn()  # warm up imports and FFT plans
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def bench_dsp(seconds: float, repeat: int) -> list:
+    """Cost of process_audio per second of input audio."""
+    wav = speech_like(seconds)
+    cases = [
+        ("speed 1.5", 1.5, 1.0),
+        ("speed 0.75", 0.75, 1.0),
+        ("pitch 1.25", 1.0, 1.25),
+        ("pitch 0.8", 1.0, 0.8),
+        ("speed 1.25 + pitch 0.9", 1.25, 0.9),
+    ]
+
+    results = []
+    for name, speed, pitch in cases:
+        elapsed = best_of(lambda: main.process_audio(wav, SAMPLE_RATE, speed, pitch), repeat)
+        results.append(
+            {
+                "case": name,
+                "audio_seconds": seconds,
+                "ms_per_audio_second": elapsed / seconds * 1000,
+                "real_time_factor": elapsed / seconds,
+            }
+        )
+        print(f"  {name:<24} {elapsed / seconds * 1000:7.2f} ms per audio second")
+    return results
+
+
+def bench_encode(seconds: float, repeat: int) -> list:
+    """Cost and size of each response_format, one-shot and streamed per second."""
+    wav = speech_like(seconds)
+    wav_bytes = len(main.encode_audio(wav, SAMPLE_RATE, "wav"))
+    chunk = SAMPLE_RATE  # stream in one-second segments
+
+    def stream(fmt):
+        encoder = main._encoder_pool.acquire(fmt, SAMPLE_RATE)
+        size = 0
+        for i in range(0, len(wav), chunk):
+            size += len(encoder.write(wav[i : i + chunk]))
+        return size + len(encoder.close())
+
+    results = []
+    for fmt in main.AUDIO_FORMATS:
+        try:
+            main.check_format(fmt)
+        except main.UnsupportedFormat as e:
+            print(f"  {fmt:<5} skipped ({e})")
+            continue
+
+        size = len(main.encode_audio(wav, SAMPLE_RATE, fmt))
+        oneshot = best_of(lambda: main.encode_audio(wav, SAMPLE_RATE, fmt), repeat)
+        streamed = best_of(lambda: stream(fmt), repeat)
+        results.append(
+            {
+                "format": fmt,
+                "audio_seconds": seconds,
+                "ms_per_audio_second": oneshot / seconds * 1000,
+                "stream_ms_per_audio_second": streamed / seconds * 1000,
+                "bytes_per_audio_second": size / seconds,
+                "size_ratio_vs_wav": size / wav_bytes,
+            }
+        )
+        print(
+            f"  {fmt:<5} {oneshot / seconds * 1000:7.2f} ms/s one-shot"
+            f"  {streamed / seconds * 1000:7.2f} ms/s streamed"
+            f"  {size / seconds / 1024:7.1f} KB/s  ({size / wav_bytes:.1%} of wav)"
+        )
+    return results
+
+
+class BenchServer:
+    """Serves the app with uvicorn on a background thread and a free port."""
+
+    def __init__(self):
+        import uvicorn
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        config = uvicorn.Config(main.app, host="127.0.0.1", port=self.port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "BenchServer":
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("Benchmark server failed to start")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def bench_text(i: int) -> str:
+    """Text of request i: two to four corpus sentences, unique per request."""
+    count = 2 + i % 3
+    return f"Request {i}. " + " ".join(SENTENCES[(i + k) % len(SENTENCES)] for k in range(count))
+
+
+def request_body(endpoint: str, i: int) -> dict:
+    if endpoint == "/v1/audio/speech":
+        return {"input": bench_text(i), "voice": "Ryan"}
+    if endpoint == "/tts/batch":
+        return {
+            "requests": [
+                {"text": bench_text(i * BATCH_ITEMS + k), "speaker": "Ryan", "language": "English"}
+                for k in range(BATCH_ITEMS)
+            ]
+        }
+    return {"text": bench_text(i), "speaker": "Ryan", "language": "English"}
+
+
+def percentile(values: list, q: float) -> float:
+    return float(np.percentile(values, q)) if values else float("nan")
+
+
+async def run_load(url: str, endpoint: str, concurrency: int, total: int) -> dict:
+    """Send total requests from concurrency closed-loop clients."""
+    import httpx
+
+    latencies, ttfbs = [], []
+    errors = item_errors = 0
+    counter = itertools.count()
+
+    async def client_loop(client) -> None:
+        nonlocal errors, item_errors
+        while (i := next(counter)) < total:
+            start = time.perf_counter()
+            first = None
+            try:
+                async with client.stream("POST", endpoint, json=request_body(endpoint, i)) as r:
+                    body = []
+                    async for chunk in r.aiter_raw():
+                        if first is None:
+                            first = time.perf_counter()
+                        if endpoint == "/tts/batch":
+                            body.append(chunk)
+                    status = r.status_code
+            except httpx.HTTPError:
+                status = None
+            end = time.perf_counter()
+            if status != 200:
+                errors += 1
+                continue
+            if body:
+                item_errors += json.loads(b"".join(body))["failed_count"]
+            latencies.append(end - start)
+            ttfbs.append((first or end) - start)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=300, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    items = BATCH_ITEMS if endpoint == "/tts/batch" else 1
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "item_errors": item_errors,
+        "requests_per_second": len(latencies) / elapsed,
+        "items_per_second": len(latencies) * items / elapsed,
+        "latency_ms": {
+            "mean": float(np.mean(latencies)) * 1000 if latencies else float("nan"),
+            "p50": percentile(latencies, 50) * 1000,
+            "p90": percentile(latencies, 90) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+        },
+        "ttfb_ms": {
+            "p50": percentile(ttfbs, 50) * 1000,
+            "p99": percentile(ttfbs, 99) * 1000,
+        },
+    }
+
+
+def bench_endpoints(model: FakeModel, endpoints: list, levels: list, total: int) -> list:
+    """Latency percentiles and throughput per endpoint and concurrency level."""
+    install_fake_model(model)
+    results = []
+    with BenchServer() as server:
+        for endpoint in endpoints:
+            for concurrency in levels:
+                result = asyncio.run(run_load(server.url, endpoint, concurrency, total))
+                results.append(result)
+                latency, ttfb = result["latency_ms"], result["ttfb_ms"]
+                print(
+                    f"  {endpoint:<17} c={concurrency:<3} {result['requests_per_second']:7.2f} req/s"
+                    f"  p50 {latency['p50']:7.1f} ms  p90 {latency['p90']:7.1f} ms"
+                    f"  p99 {latency['p99']:7.1f} ms  ttfb p50 {ttfb['p50']:7.1f} ms"
+                    f"  errors {result['errors'] + result['item_errors']}"
+                )
+    return results
+
+
+def bench_bucketing(model: FakeModel, batches: int, items: int, seed: int = 0) -> list:
+    """
+    Mixed-length /tts/batch load with and without length bucketing.
+
+    batches requests of items each, lengths drawn from short prompts to
+    full segments, run concurrently through process_single_tts exactly as
+    batch_tts does; measures item throughput and per-item latency.
+    """
+    install_fake_model(model)
+    rng = np.random.default_rng(seed)
+    lengths = rng.choice([12, 30, 60, 120, 190], size=(batches, items))
+    requests = [
+        [main.TTSStreamRequest(text=("x" * int(n))) for n in row]
+        for row in lengths
+    ]
+
+    async def timed(request):
+        start = time.perf_counter()
+        result = await main.process_single_tts(request)
+        return time.perf_counter() - start, result.success
+
+    async def run():
+        start = time.perf_counter()
+        rows = await asyncio.gather(
+            *(asyncio.gather(*(timed(r) for r in row)) for row in requests)
+        )
+        return time.perf_counter() - start, [item for row in rows for item in row]
+
+    results = []
+    baseline = None
+    for name, ratio in (("unbucketed", 0.0), (f"bucketed (ratio {main.BATCH_LENGTH_RATIO:g})", main.BATCH_LENGTH_RATIO)):
+        main._scheduler.length_ratio = ratio
+        model.calls = model.items = 0
+        elapsed, timings = asyncio.run(run())
+        latencies = [t for t, ok in timings if ok]
+        row = {
+            "case": name,
+            "length_ratio": ratio,
+            "items": len(timings),
+            "failed": sum(1 for _, ok in timings if not ok),
+            "items_per_second": len(latencies) / elapsed,
+            "model_calls": model.calls,
+            "mean_batch_size": model.items / model.calls if model.calls else 0.0,
+            "latency_ms": {
+                "p50": percentile(latencies, 50) * 1000,
+                "p90": percentile(latencies, 90) * 1000,
+            },
+        }
+        baseline = baseline or row["items_per_second"]
+        results.append(row)
+        print(
+            f"  {name:<24} {row['items_per_second']:7.2f} items/s ({row['items_per_second'] / baseline:.2f}x)"
+            f"  p50 {row['latency_ms']['p50']:7.1f} ms  p90 {row['latency_ms']['p90']:7.1f} ms"
+            f"  {row['model_calls']} calls of {row['mean_batch_size']:.1f}"
+        )
+    main._scheduler.length_ratio = main.BATCH_LENGTH_RATIO
+    return results
+
+
+def long_text(chars: int) -> str:
+    """Corpus sentences repeated up to about chars characters."""
+    sentences = itertools.cycle(SENTENCES)
+    text = ""
+    while len(text) < chars:
+        text += next(sentences) + " "
+    return text.strip()
+
+
+def bench_long_request(model: FakeModel, chars: int, workers: list, repeat: int) -> list:
+    """
+    Latency of one long /tts synthesis with nothing else running.
+
+    The baseline renders the whole text in a single model call; segmented
+    runs go through the text front-end and synthesize segments concurrently
+    on 1..N workers (each its own thread, as with TTS_INFERENCE_WORKERS).
+    """
+    install_fake_model(model)
+    text = long_text(chars)
+    executor = main._scheduler.executor
+    text_segments = main.text_segments
+    cases = [("one call", 1, lambda text, language: [text])] + [
+        (f"segmented, {n} worker{'s' if n > 1 else ''}", n, text_segments) for n in workers
+    ]
+
+    results = []
+    baseline = None
+    try:
+        for name, count, segmenter in cases:
+            main.text_segments = segmenter
+            main._scheduler.executor = main.InferenceExecutor(count, main.INFERENCE_QUEUE_DEPTH)
+            model.calls = model.items = 0
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                wav, sr = asyncio.run(main.synthesize(text, "Ryan", "English"))
+                times.append(time.perf_counter() - start)
+            main._scheduler.executor.shutdown()
+            row = {
+                "case": name,
+                "workers": count,
+                "chars": len(text),
+                "segments": len(segmenter(text, "English")),
+                "seconds": min(times),
+                "audio_seconds": len(wav) / sr,
+                "model_calls": model.calls // repeat,
+            }
+            baseline = baseline or row["seconds"]
+            results.append(row)
+            print(
+                f"  {name:<24} {row['seconds'] * 1000:8.1f} ms ({baseline / row['seconds']:.2f}x)"
+                f"  {row['segments']} segments in {row['model_calls']} calls"
+            )
+    finally:
+        main.text_segments = text_segments
+        main._scheduler.executor = executor
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def comparable(results: dict) -> dict:
+    """Flatten results into {name: (value, lower_is_better)}."""
+    values = {}
+    for row in results.get("dsp", []):
+        values[f"dsp {row['case']}"] = (row["ms_per_audio_second"], True)
+    for row in results.get("encode", []):
+        values[f"encode {row['format']}"] = (row["ms_per_audio_second"], True)
+    for row in results.get("bucketing", []):
+        values[f"bucketing {row['case']} items/s"] = (row["items_per_second"], False)
+    for row in results.get("long_request", []):
+        values[f"long request {row['case']}"] = (row["seconds"] * 1000, True)
+    for row in results.get("endpoints", []):
+        name = f"{row['endpoint']} c={row['concurrency']}"
+        values[f"{name} p50"] = (row["latency_ms"]["p50"], True)
+        values[f"{name} p99"] = (row["latency_ms"]["p99"], True)
+        values[f"{name} req/s"] = (row["requests_per_second"], False)
+    return values
+
+
+def print_comparison(baseline: dict, results: dict) -> None:
+    before, after = comparable(baseline), comparable(results)
+    print(f"\nCompared with {baseline.get('commit', 'baseline')}:")
+    for name, (value, lower_is_better) in after.items():
+        if name not in before or not before[name][0]:
+            continue
+        change = value / before[name][0] - 1
+        better = change < 0 if lower_is_better else change > 0
+        marker = " " if abs(change) <= 0.05 else "+" if better else "-"
+        print(f"  {marker} {name:<32} {before[name][0]:10.2f} -> {value:10.2f}  ({change:+.1%})")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Qwen TTS backend benchmarks")
+    parser.add_argument("--seconds", type=float, default=30.0, help="Audio length for micro-benchmarks")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per case (best is reported)")
+    parser.add_argument("--output", type=str, default=None, help="Write results as JSON")
+    parser.add_argument("--compare", type=str, default=None, help="Print changes against a previous JSON result")
+    parser.add_argument("--skip-endpoints", action="store_true", help="Only run the micro-benchmarks")
+    parser.add_argument("--endpoints", type=str, default=",".join(ENDPOINTS), help="Comma-separated endpoints")
+    parser.add_argument("--concurrency", type=str, default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=32, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--fake-latency-ms", type=float, default=50.0, help="Fixed cost of a fake model call")
+    parser.add_argument("--fake-ms-per-char", type=float, default=1.0, help="Fake model cost per character")
+    parser.add_argument("--padding-cost", type=float, default=0.5,
+                        help="Fake model cost of each extra padded batch item, for the bucketing benchmark")
+    parser.add_argument("--skip-bucketing", action="store_true", help="Skip the length bucketing benchmark")
+    parser.add_argument("--long-chars", type=int, default=5000, help="Text length of the long-request benchmark")
+    parser.add_argument("--long-workers", type=str, default="1,4",
+                        help="Comma-separated worker counts for the long-request benchmark")
+    parser.add_argument("--skip-long", action="store_true", help="Skip the long-request benchmark")
+    args = parser.parse_args()
+
+    results = {"commit": git_commit(), "time": time.time(), "config": vars(args)}
+
+    print("DSP (process_audio):")
+    results["dsp"] = bench_dsp(args.seconds, args.repeat)
+
+    print("\nEncoding (encode_audio / streaming encoders):")
+    results["encode"] = bench_encode(args.seconds, args.repeat)
+
+    if not args.skip_bucketing:
+        print(f"\nLength bucketing (mixed-length /tts/batch, padding cost {args.padding_cost:g}):")
+        model = FakeModel(args.fake_latency_ms, args.fake_ms_per_char, padding_cost=args.padding_cost)
+        results["bucketing"] = bench_bucketing(model, batches=8, items=8)
+
+    if not args.skip_long:
+        print(f"\nLong request ({args.long_chars} characters, padding cost {args.padding_cost:g}):")
+        model = FakeModel(args.fake_latency_ms, args.fake_ms_per_char, padding_cost=args.padding_cost)
+        results["long_request"] = bench_long_request(
+            model, args.long_chars, [int(n) for n in args.long_workers.split(",")], max(1, args.repeat // 2)
+        )
+
+    if not args.skip_endpoints:
+        print(f"\nEndpoints (fake model: {args.fake_latency_ms:g} ms + {args.fake_ms_per_char:g} ms/char):")
+        model = FakeModel(args.fake_latency_ms, args.fake_ms_per_char)
+        results["endpoints"] = bench_endpoints(
+            model,
+            [e.strip() for e in args.endpoints.split(",") if e.strip()],
+            [int(c) for c in args.concurrency.split(",")],
+            args.requests,
+        )
+        results["model_calls"] = model.calls
+    main._encoder_pool.shutdown()
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main_cli()
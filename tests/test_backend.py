@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 """Simple API tests for Qwen TTS backend."""
 
+import json
 import requests
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 BASE_URL = "http://localhost:8000"
 
@@ -15,6 +18,15 @@ def test_health():
     print("✓ Health check passed")
 
 
+def test_ready():
+    r = requests.get(f"{BASE_URL}/health/ready")
+    assert r.status_code == 200
+    data = r.json()
+    assert data["status"] == "ready"
+    assert data["model_loaded"]
+    print("✓ Readiness check passed")
+
+
 def test_speakers():
     r = requests.get(f"{BASE_URL}/v1/speakers")
     assert r.status_code == 200
@@ -43,6 +55,31 @@ def test_tts():
     print(f"✓ TTS endpoint works (audio size: {len(r.content)} bytes)")
 
 
+def test_long_text():
+    # Far more segments than one batch; all come back joined in one response
+    text = " ".join(f"Sentence number {i} of a long request." for i in range(120))
+    r = requests.post(f"{BASE_URL}/tts", json={"text": text, "speaker": "Ryan", "language": "English"})
+    assert r.status_code == 200
+    assert len(r.content) > 44
+
+    # Long batch items and concurrent long requests share the scheduler queue;
+    # admitted work waits for room instead of failing partway through
+    item = {"text": text[:1000], "speaker": "Ryan", "language": "English"}
+    r = requests.post(f"{BASE_URL}/tts/batch", json={"requests": [item] * 10})
+    assert all(result["success"] for result in r.json()["results"])
+
+    def post(i):
+        payload = {"text": f"Request {i}. {text}", "speaker": "Ryan", "language": "English"}
+        return requests.post(f"{BASE_URL}/tts", json=payload).status_code
+
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        statuses = list(pool.map(post, range(12)))
+    # Overload is only ever refused up front by admission control (429)
+    assert set(statuses) <= {200, 429}, statuses
+    assert 200 in statuses
+    print(f"✓ Long text works ({len(text)} characters)")
+
+
 def test_stream():
     r = requests.post(
         f"{BASE_URL}/tts/stream",
@@ -69,15 +106,181 @@ def test_batch():
     print(f"✓ Batch endpoint works ({data['completed_count']} completed)")
 
 
+def test_batch_stream():
+    payload = {
+        "requests": [
+            {"text": "One", "speaker": "Ryan", "language": "English"},
+            {"text": "Two", "speaker": "Vivian", "language": "English", "response_format": "mp3"},
+        ]
+    }
+    r = requests.post(
+        f"{BASE_URL}/tts/batch", json=payload, headers={"Accept": "application/x-ndjson"}, stream=True
+    )
+    assert r.status_code == 200
+    events = [json.loads(line) for line in r.iter_lines() if line]
+    assert sorted(e["index"] for e in events[:-1]) == [0, 1]
+    assert events[-1]["done"] and events[-1]["completed_count"] == 2
+
+    r = requests.post(f"{BASE_URL}/tts/batch", json=payload, headers={"Accept": "multipart/mixed"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("multipart/mixed; boundary=")
+    assert b"X-Item-Index: 1" in r.content
+    print("✓ Streamed batch works")
+
+
+def test_cache():
+    payload = {"text": "Cache me", "speaker": "Ryan", "language": "English"}
+    first = requests.post(f"{BASE_URL}/tts", json=payload)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    second = requests.post(f"{BASE_URL}/tts", json=payload)
+    assert second.status_code == 200
+    assert second.headers["x-cache"] == "HIT"
+    assert second.content == first.content
+
+    r = requests.post(f"{BASE_URL}/tts", json=payload, headers={"If-None-Match": etag})
+    assert r.status_code == 304
+
+    # "*" must not answer 304 for audio that was never sent
+    uncached = {**payload, "text": "Never sent before"}
+    r = requests.post(f"{BASE_URL}/tts", json=uncached, headers={"If-None-Match": "*"})
+    assert r.status_code == 200 and len(r.content) > 44
+
+    stats = requests.get(f"{BASE_URL}/v1/cache/stats").json()
+    assert stats["hits"] >= 1
+    print(f"✓ Cache works (hit rate: {stats['hit_rate']:.2f})")
+
+
+def test_formats():
+    for fmt, media_type in [("mp3", "audio/mpeg"), ("flac", "audio/flac"), ("opus", "audio/ogg")]:
+        payload = {"text": "Format test", "speaker": "Ryan", "language": "English", "response_format": fmt}
+        r = requests.post(f"{BASE_URL}/tts", json=payload)
+        assert r.status_code == 200
+        assert r.headers["content-type"] == media_type
+        assert len(r.content) > 0
+
+    r = requests.post(f"{BASE_URL}/tts", json={"text": "x", "response_format": "xyz"})
+    assert r.status_code == 400
+    print("✓ Response formats work")
+
+
+def test_jobs():
+    payload = {"text": "Hello from a job. It has two sentences.", "speaker": "Ryan", "language": "English"}
+    r = requests.post(f"{BASE_URL}/v1/jobs", json=payload)
+    assert r.status_code == 202
+    job = r.json()
+    assert job["status"] == "queued"
+    assert job["segments_total"] >= 1
+
+    for _ in range(600):
+        job = requests.get(f"{BASE_URL}/v1/jobs/{job['id']}").json()
+        if job["status"] in ("completed", "failed"):
+            break
+        time.sleep(0.5)
+    assert job["status"] == "completed"
+    assert job["progress"] == 1.0
+
+    r = requests.get(f"{BASE_URL}{job['audio_url']}")
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "audio/wav"
+
+    assert requests.get(f"{BASE_URL}/v1/jobs/missing").status_code == 404
+    print(f"✓ Jobs work ({job['duration']:.2f}s of audio)")
+
+
+def test_text_front_end():
+    # Abbreviations and initials do not end sentences; CJK punctuation does
+    cases = [
+        ("Dr. J. Smith arrived on 2024-05-01. He sat down.", "English", 2),
+        ("你好。今天天气很好！我们走吧。", "Chinese", 3),
+    ]
+    for text, language, expected in cases:
+        payload = {"text": text, "speaker": "Ryan", "language": language}
+        r = requests.post(f"{BASE_URL}/v1/jobs", json=payload)
+        assert r.status_code == 202
+        assert r.json()["segments_total"] == expected
+    print("✓ Text front-end works")
+
+
+def test_bulk():
+    items = [{"text": f"Bulk item {i}.", "id": f"item-{i}"} for i in range(5)]
+    body = "".join(json.dumps(item) + "\n" for item in items) + "not json\n"
+    r = requests.post(f"{BASE_URL}/v1/bulk", data=body, headers={"Content-Type": "application/x-ndjson"})
+    assert r.status_code == 202
+    bulk = r.json()
+    assert bulk["items_total"] == 6 and bulk["items_failed"] == 1
+
+    for _ in range(600):
+        bulk = requests.get(f"{BASE_URL}/v1/bulk/{bulk['id']}").json()
+        if bulk["status"] in ("completed", "failed"):
+            break
+        time.sleep(0.5)
+    assert bulk["status"] == "completed"
+    assert bulk["items_done"] == 5
+    assert bulk["throughput"]["items_per_second"] > 0
+
+    r = requests.get(f"{BASE_URL}{bulk['archive_url']}")
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/zip"
+
+    # A line is only buffered up to the line limit
+    body = json.dumps({"text": "x" * 100}) + "\n" + "y" * (1 << 20)
+    r = requests.post(f"{BASE_URL}/v1/bulk", data=body, headers={"Content-Type": "application/x-ndjson"})
+    assert r.status_code == 413
+    print(f"✓ Bulk works ({bulk['audio_seconds']:.2f}s of audio)")
+
+
+def test_queue_stats():
+    r = requests.get(f"{BASE_URL}/v1/queue/stats")
+    assert r.status_code == 200
+    data = r.json()
+    assert set(data["classes"]) == {"stream", "single", "batch", "job"}
+    assert data["seconds_per_char"] > 0
+    assert data["scheduler_waiting"] >= 0
+    print(f"✓ Queue stats work ({data['queued']} queued)")
+
+
+def test_metrics():
+    requests.post(f"{BASE_URL}/tts", json={"text": "Metrics test", "speaker": "Ryan", "language": "English"})
+    r = requests.get(f"{BASE_URL}/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    assert "# TYPE tts_generate_seconds histogram" in r.text
+    assert 'tts_response_bytes_count{endpoint="/tts"' in r.text
+    print("✓ Metrics work")
+
+
+def test_tracing():
+    r = requests.post(f"{BASE_URL}/tts", json={"text": "Tracing test", "speaker": "Ryan", "language": "English"})
+    assert r.status_code == 200
+    assert "total;dur=" in r.headers["Server-Timing"]
+    assert r.headers["X-Trace-Id"]
+    r = requests.post(f"{BASE_URL}/tts/batch", json={"requests": [{"text": "Traced item"}]})
+    assert "generate" in r.json()["results"][0]["timings"]
+    print("✓ Tracing works")
+
+
 if __name__ == "__main__":
     print("Testing Qwen TTS Backend...\n")
     try:
         test_health()
+        test_ready()
         test_speakers()
         test_languages()
         test_tts()
+        test_long_text()
         test_stream()
         test_batch()
+        test_batch_stream()
+        test_cache()
+        test_formats()
+        test_jobs()
+        test_text_front_end()
+        test_bulk()
+        test_queue_stats()
+        test_metrics()
+        test_tracing()
         print("\n✅ All tests passed!")
     except Exception as e:
         print(f"\n❌ Test failed: {e}")
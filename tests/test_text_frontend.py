@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Tests for the backend text front-end (normalization and segmentation); no server needed."""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from main import normalize_for_speech, split_text_segments, text_segments  # noqa: E402
+
+
+def test_abbreviations():
+    assert normalize_for_speech("Dr. Smith arrived.", "English") == "Doctor Smith arrived."
+    # A sentence-final abbreviation keeps the sentence's full stop
+    assert normalize_for_speech("Apples, pears, etc. Then we left.", "English") == (
+        "Apples, pears, et cetera. Then we left."
+    )
+    assert normalize_for_speech("Äpfel usw. Dann z.B. Birnen.", "German") == (
+        "Äpfel und so weiter. Dann zum Beispiel Birnen."
+    )
+    # French titles are written with or without a period; neither stays behind
+    assert normalize_for_speech("Le Dr. Who et Mme Martin, etc. Voilà.", "French") == (
+        "Le Docteur Who et Madame Martin, et cetera. Voilà."
+    )
+    assert normalize_for_speech("Le Dr Who arrive.", "French") == "Le Docteur Who arrive."
+    print("✓ Abbreviations work")
+
+
+def test_numbers():
+    cases = [
+        ("It costs 1,234.5 or 15%.", "It costs one thousand two hundred thirty-four point five or fifteen percent."),
+        ("Meet at 10:30, 10:05 or 9:00.", "Meet at ten thirty, ten oh five or nine o'clock."),
+        ("Call 555-1234.", "Call five five five, one two three four."),
+        ("Read pages 1-10 and 100-200.", "Read pages one to ten and one hundred to two hundred."),
+        ("It was -5 outside.", "It was minus five outside."),
+        ("In 1999 and the 1990s, 2024 people.", "In nineteen ninety-nine and the nineteen nineties, two thousand twenty-four people."),
+        ("On 2024-05-01 and 12/25/2023.", "On May first, twenty twenty-four and December twenty-fifth, twenty twenty-three."),
+        ("He was 21st with an MP3 and 4K.", "He was twenty-first with an MP3 and 4K."),
+    ]
+    for text, expected in cases:
+        assert normalize_for_speech(text, "English") == expected, normalize_for_speech(text, "English")
+    print("✓ English numbers work")
+
+
+def test_cjk_numbers():
+    cases = [
+        ("我有2个苹果。", "Chinese", "我有两个苹果。"),
+        ("2024年是10010元。", "Chinese", "二零二四年是一万零一十元。"),
+        ("2:05开会，涨了15%。", "Chinese", "两点零五分开会，涨了百分之十五。"),
+        ("10000人が2024年に来た。", "Japanese", "一万人が二千二十四年に来た。"),
+        ("사과 3개와 학생 20명, 10개월.", "Korean", "사과 세 개와 학생 스무 명, 십개월."),
+        ("3:30에 만나요.", "Korean", "세 시 삼십 분에 만나요."),
+    ]
+    for text, language, expected in cases:
+        assert normalize_for_speech(text, language) == expected, normalize_for_speech(text, language)
+    print("✓ CJK numbers work")
+
+
+def test_split_text_segments():
+    assert split_text_segments("Mr. J. Smith left. Then U.S. Army came! Why?") == [
+        "Mr. J. Smith left.",
+        "Then U.S. Army came!",
+        "Why?",
+    ]
+    assert split_text_segments("Am 3. Oktober kamen sie. Gut.") == ["Am 3. Oktober kamen sie.", "Gut."]
+    assert split_text_segments('He said "Hi." Then left.') == ['He said "Hi."', "Then left."]
+    assert split_text_segments("你好。今天天气很好！「走吧。」我们走。") == [
+        "你好。",
+        "今天天气很好！",
+        "「走吧。」",
+        "我们走。",
+    ]
+
+    # Long sentences are packed by clause, then wrapped on words
+    text = "one two three, " * 20
+    segments = split_text_segments(text, 40)
+    assert all(len(segment) <= 40 for segment in segments)
+    assert " ".join(segments).replace(",", "").split() == text.replace(",", "").split()
+    assert split_text_segments("x" * 25, 10) == ["x" * 10, "x" * 10, "x" * 5]
+    print("✓ Segmentation works")
+
+
+def test_text_segments_bounds():
+    # The segment limit is in speaking time: Chinese segments hold fewer characters
+    english = text_segments("word " * 200, "English")
+    chinese = text_segments("很" * 600, "Chinese")
+    assert max(map(len, english)) <= 200
+    assert max(map(len, chinese)) < max(map(len, english))
+    print("✓ Segment limits work")
+
+
+if __name__ == "__main__":
+    print("Testing text front-end...\n")
+    try:
+        test_abbreviations()
+        test_numbers()
+        test_cjk_numbers()
+        test_split_text_segments()
+        test_text_segments_bounds()
+        print("\n✅ All tests passed!")
+    except Exception as e:
+        print(f"\n❌ Test failed: {e}")
+        sys.exit(1)